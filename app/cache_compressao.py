@@ -0,0 +1,143 @@
+import hashlib
+import struct
+from contextlib import ExitStack
+from os import makedirs, remove, replace, scandir, utime
+from os.path import join
+from tempfile import mkstemp
+from typing import BinaryIO, NamedTuple
+
+from app.zipfileparallel import CHUNK_SIZE, compress_stream
+
+# CRC, tamanho e tamanho comprimido, antes do fluxo comprimido
+CABECALHO_CACHE = struct.Struct("<LQQ")
+EXTENSAO_CACHE = ".bin"
+
+
+class EntradaCache(NamedTuple):
+    crc: int
+    tamanho: int
+    tamanho_comprimido: int
+    # Aberto no início do fluxo comprimido
+    dados: BinaryIO
+
+
+class CacheCompressao:
+    """
+    Cache em disco, compartilhado entre casos, do fluxo comprimido de
+    arquivos, endereçado pelo hash do conteúdo, codec e nível. Cada
+    entrada guarda o CRC e os tamanhos, para ser copiada diretamente em
+    um zip, e o cache é limitado a `tamanho_maximo` bytes, descartando
+    as entradas usadas há mais tempo. As entradas e o tamanho total são
+    lidos do diretório uma única vez e acompanhados a cada uso, de modo
+    que entradas criadas por outros casos ao mesmo tempo só são contadas
+    quando usadas.
+    """
+
+    def __init__(self, diretorio: str, tamanho_maximo: int):
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        makedirs(diretorio, exist_ok=True)
+        # Tamanho de cada entrada, da usada há mais tempo para a mais
+        # recente, e a soma dos tamanhos
+        self._entradas: dict[str, int] = {}
+        self.total = 0
+        self._varre()
+
+    def _varre(self):
+        entradas: list[tuple[float, int, str]] = []
+        with scandir(self.diretorio) as it:
+            for e in it:
+                if not e.name.endswith(EXTENSAO_CACHE):
+                    continue
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, e.path))
+        for _, tamanho, caminho in sorted(entradas):
+            self._usa(caminho, tamanho)
+
+    def _usa(self, caminho: str, tamanho: int):
+        self.total += tamanho - self._entradas.pop(caminho, 0)
+        self._entradas[caminho] = tamanho
+
+    def chave(self, caminho: str, compress_type: int, nivel: int | None) -> str:
+        h = hashlib.sha256()
+        with open(caminho, "rb") as arq:
+            while bloco := arq.read(CHUNK_SIZE):
+                h.update(bloco)
+        return f"{h.hexdigest()}_{compress_type}_{nivel}"
+
+    def _caminho(self, chave: str) -> str:
+        return join(self.diretorio, chave + EXTENSAO_CACHE)
+
+    def _abre(self, chave: str) -> EntradaCache:
+        with ExitStack() as pilha:
+            arq = pilha.enter_context(open(self._caminho(chave), "rb"))
+            crc, tamanho, tamanho_comprimido = CABECALHO_CACHE.unpack(
+                arq.read(CABECALHO_CACHE.size)
+            )
+            pilha.pop_all()
+        return EntradaCache(crc, tamanho, tamanho_comprimido, arq)
+
+    def busca(self, chave: str) -> EntradaCache | None:
+        try:
+            entrada = self._abre(chave)
+        except (FileNotFoundError, struct.error):
+            return None
+        try:
+            # A data de modificação marca o último uso
+            utime(self._caminho(chave))
+        except FileNotFoundError:
+            # Descartada por outro caso após ser aberta
+            entrada.dados.close()
+            return None
+        self._usa(
+            self._caminho(chave),
+            CABECALHO_CACHE.size + entrada.tamanho_comprimido,
+        )
+        return entrada
+
+    def armazena(
+        self,
+        chave: str,
+        caminho: str,
+        compress_type: int,
+        nivel: int | None,
+    ) -> EntradaCache:
+        """
+        Comprime o arquivo para o cache e retorna a entrada criada. A
+        entrada só se torna visível para outros casos após ser escrita
+        por completo.
+        """
+        descritor, temporario = mkstemp(dir=self.diretorio, suffix=".tmp")
+        try:
+            with open(descritor, "wb") as destino, open(caminho, "rb") as src:
+                destino.write(bytes(CABECALHO_CACHE.size))
+                crc, tamanho, tamanho_comprimido = compress_stream(
+                    src, destino, compress_type, nivel, CHUNK_SIZE
+                )
+                destino.seek(0)
+                destino.write(
+                    CABECALHO_CACHE.pack(crc, tamanho, tamanho_comprimido)
+                )
+            replace(temporario, self._caminho(chave))
+        except BaseException:
+            remove(temporario)
+            raise
+        self._usa(
+            self._caminho(chave), CABECALHO_CACHE.size + tamanho_comprimido
+        )
+        entrada = self._abre(chave)
+        self._limita()
+        return entrada
+
+    def _limita(self):
+        # A entrada mais recente, recém armazenada, é sempre mantida
+        while self.total > self.tamanho_maximo and len(self._entradas) > 1:
+            caminho = next(iter(self._entradas))
+            self.total -= self._entradas.pop(caminho)
+            try:
+                remove(caminho)
+            except FileNotFoundError:
+                pass
@@ -1,13 +1,38 @@
+from importlib import import_module
+
 import click
 
-from app.decomp.pos_processa_decomp import pos_processa_decomp
-from app.dessem.pos_processa_dessem import pos_processa_dessem
-from app.dessem.pre_processa_dessem import pre_processa_dessem
-from app.newave.pos_processa_newave import pos_processa_newave
-from app.newave.programas_auxiliares_newave import programas_auxiliares_newave
+# Módulo e nome de cada comando. Os módulos só são importados quando o
+# comando é usado, pois as bibliotecas dos modelos atrasam o início de
+# todas as chamadas do job script.
+COMANDOS = {
+    "pos_processa_newave": "app.newave.pos_processa_newave",
+    "monitora": "app.newave.monitora_newave",
+    "programas_auxiliares_newave": "app.newave.programas_auxiliares_newave",
+    "pos_processa_decomp": "app.decomp.pos_processa_decomp",
+    "pre_processa_dessem": "app.dessem.pre_processa_dessem",
+    "pos_processa_dessem": "app.dessem.pos_processa_dessem",
+    "executa_job": "app.job",
+    "extrai": "app.extracao",
+    "extrai_paralelo": "app.extracao",
+}
+
+
+class GrupoComandos(click.Group):
+    def __init__(self, *args, comandos: dict[str, str], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.comandos = comandos
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return list(self.comandos)
 
+    def get_command(self, ctx: click.Context, cmd_name: str):
+        if cmd_name not in self.comandos:
+            return None
+        return getattr(import_module(self.comandos[cmd_name]), cmd_name)
 
-@click.group()
+
+@click.group(cls=GrupoComandos, comandos=COMANDOS)
 def cli():
     """
     Aplicação para realizar etapas do job script
@@ -15,10 +40,3 @@ def cli():
     HPC.
     """
     pass
-
-
-cli.add_command(pos_processa_newave)
-cli.add_command(programas_auxiliares_newave)
-cli.add_command(pos_processa_decomp)
-cli.add_command(pre_processa_dessem)
-cli.add_command(pos_processa_dessem)
@@ -0,0 +1,34 @@
+from os import stat
+from os.path import join
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class ContextoDeck:
+    """
+    Arquivos do deck de um caso, lidos sob demanda e no máximo uma vez
+    enquanto não forem modificados. Cada modelo expõe os seus arquivos
+    como propriedades de uma subclasse, e o mesmo contexto é passado a
+    todas as etapas de um comando.
+    """
+
+    def __init__(self, diretorio: str = "."):
+        self.diretorio = diretorio
+        # (classe, caminho) -> ((mtime, tamanho), objeto lido)
+        self._lidos: dict[tuple[type, str], tuple[tuple[int, int], Any]] = {}
+
+    def le(self, classe: type[T], nome: str) -> T:
+        """
+        Retorna o arquivo `nome` lido com `classe.read`, lendo-o
+        novamente apenas se a data de modificação ou o tamanho mudaram
+        desde a última leitura.
+        """
+        caminho = join(self.diretorio, nome)
+        st = stat(caminho)
+        versao = (st.st_mtime_ns, st.st_size)
+        lido = self._lidos.get((classe, caminho))
+        if lido is None or lido[0] != versao:
+            lido = (versao, classe.read(caminho))  # type: ignore
+            self._lidos[(classe, caminho)] = lido
+        return lido[1]
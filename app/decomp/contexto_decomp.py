@@ -0,0 +1,30 @@
+from typing import TYPE_CHECKING
+
+from app.contexto_deck import ContextoDeck
+
+# A idecomp só é importada ao ler um arquivo, para não atrasar o início
+# dos comandos que não leem o deck
+if TYPE_CHECKING:
+    from idecomp.decomp.arquivos import Arquivos
+    from idecomp.decomp.caso import Caso
+    from idecomp.decomp.dadger import Dadger
+
+
+class ContextoDecomp(ContextoDeck):
+    @property
+    def caso(self) -> "Caso":
+        from idecomp.decomp.caso import Caso
+
+        return self.le(Caso, "caso.dat")
+
+    @property
+    def arquivos(self) -> "Arquivos":
+        from idecomp.decomp.arquivos import Arquivos
+
+        return self.le(Arquivos, self.caso.arquivos)
+
+    @property
+    def dadger(self) -> "Dadger":
+        from idecomp.decomp.dadger import Dadger
+
+        return self.le(Dadger, self.arquivos.dadger)
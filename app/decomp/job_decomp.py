@@ -0,0 +1,124 @@
+import shlex
+
+import click
+
+from app.decomp.pos_processa_decomp import pos_processa_decomp
+from app.job import (
+    comando_modelo,
+    etapa_comando,
+    etapa_externa,
+    etapa_licencas,
+    executa_grafo,
+)
+
+
+@click.command("decomp")
+@click.argument("numero_processadores", type=int)
+@click.option("--executavel", required=True, help="Executável do DECOMP")
+@click.option(
+    "--conversor",
+    default=None,
+    help="Conversor de nomes de arquivos, executado antes do modelo",
+)
+@click.option(
+    "--licenca",
+    multiple=True,
+    help="Arquivo de licença copiado para o caso (pode ser repetido)",
+)
+@click.option("--mpiexec", default="mpiexec", help="Lançador MPI do modelo")
+@click.option(
+    "--sintetizador",
+    default="sintetizador-decomp completa",
+    help="Comando do sintetizador",
+)
+@click.option(
+    "--plotador",
+    default="plotador report",
+    help="Comando do plotador (vazio para não executar)",
+)
+@click.option(
+    "--args-posproc",
+    default="",
+    help="Argumentos adicionais do pos_processa_decomp",
+)
+@click.option(
+    "--slots",
+    type=int,
+    default=None,
+    help="Slots de CPU compartilhados pelas etapas (padrão: número de "
+    + "processadores mais um, para as etapas leves que acompanham o modelo)",
+)
+def decomp(
+    numero_processadores,
+    executavel,
+    conversor,
+    licenca,
+    mpiexec,
+    sintetizador,
+    plotador,
+    args_posproc,
+    slots,
+):
+    """
+    Executa o job do DECOMP: conversão de nomes, modelo, sintetizador,
+    plotador e pós-processamento. O deck é zipado enquanto o modelo
+    executa. Como no job script, cada etapa é executada mesmo que as
+    anteriores tenham falhado.
+    """
+    n = numero_processadores
+    args_posproc = ["--numero-processadores", str(n)] + shlex.split(
+        args_posproc
+    )
+    preparo = ["licenca"]
+    etapas = [etapa_licencas(list(licenca))]
+    if conversor is not None:
+        etapas.append(etapa_externa("conversor", [conversor]))
+        preparo.append("conversor")
+    etapas += [
+        etapa_comando(
+            "deck",
+            pos_processa_decomp,
+            args_posproc + ["--apenas-deck"],
+            dependencias=preparo[1:],
+            mesmo_com_falha=True,
+        ),
+        etapa_externa(
+            "decomp",
+            comando_modelo(executavel, n, mpiexec),
+            n,
+            preparo,
+            mesmo_com_falha=True,
+        ),
+        etapa_externa(
+            "sintetizador",
+            shlex.split(sintetizador),
+            n,
+            ["decomp"],
+            mesmo_com_falha=True,
+        ),
+    ]
+    # O plotador lê as saídas do caso, que o pós-processamento move e
+    # apaga, e por isso termina antes dele
+    plotagem = []
+    if len(plotador) > 0:
+        etapas.append(
+            etapa_externa(
+                "plotador",
+                shlex.split(plotador),
+                1,
+                ["sintetizador"],
+                mesmo_com_falha=True,
+            )
+        )
+        plotagem.append("plotador")
+    etapas.append(
+        etapa_comando(
+            "pos_processamento",
+            pos_processa_decomp,
+            args_posproc + ["--sem-deck"],
+            n,
+            ["sintetizador", "deck"] + plotagem,
+            mesmo_com_falha=True,
+        )
+    )
+    executa_grafo(etapas, slots if slots is not None else n + 1)
@@ -1,27 +1,37 @@
 from time import time
 
 import click
-import pandas as pd  # type: ignore
-from idecomp.decomp.arquivos import Arquivos
-from idecomp.decomp.caso import Caso
-from idecomp.decomp.dadger import Dadger
 
+from app.decomp.contexto_decomp import ContextoDecomp
+from app.indice_diretorio import ClassificadorArquivos, IndiceDiretorio
+from app.metricas import Metricas
+from app.opcoes_compressao import opcoes_compressao
 from app.utils import (
-    identifica_arquivos_via_regex,
+    le_arquivos_indice,
     limpa_arquivos_saida,
     traz_conteudo_para_raiz,
     zip_arquivos,
+    zip_categorias,
 )
 
 
 @click.command("pos_processa_decomp")
-def pos_processa_decomp():
-    EXTENSAO: str = Caso.read("./caso.dat").arquivos
+@click.option(
+    "--numero-processadores",
+    type=int,
+    default=1,
+    help="Processadores usados na compressão das saídas",
+)
+@opcoes_compressao
+def pos_processa_decomp(numero_processadores, compressao):
+    contexto = ContextoDecomp()
+    EXTENSAO: str = contexto.caso.arquivos
 
     ti = time()
+    metricas = Metricas("pos_processa_decomp")
 
     def identifica_arquivos_entrada() -> list[str]:
-        arquivos = Arquivos.read("./" + EXTENSAO)
+        arquivos = contexto.arquivos
         arquivos_gerais = [
             arquivos.dadger,
             arquivos.vazoes,
@@ -30,7 +40,7 @@ def pos_processa_decomp():
             arquivos.perdas,
             arquivos.dadgnl,
         ]
-        dadger = Dadger.read("./" + arquivos.dadger)
+        dadger = contexto.dadger
         arquivo_indice = [dadger.fa.arquivo] if dadger.fa is not None else []
         arquivo_polinjusdat = (
             [dadger.fj.arquivo] if dadger.fj is not None else []
@@ -39,11 +49,7 @@ def pos_processa_decomp():
             [dadger.vt.arquivo] if dadger.vt is not None else []
         )
         arquivos_libs = (
-            pd.read_csv(
-                arquivo_indice[0], delimiter=";", comment="&", header=None
-            )[2]
-            .unique()
-            .tolist()
+            le_arquivos_indice(arquivo_indice[0])
             if len(arquivo_indice) == 1
             else []
         )
@@ -54,7 +60,7 @@ def pos_processa_decomp():
             + arquivo_polinjusdat
             + arquivo_velocidade
             + ["caso.dat", EXTENSAO]
-            + [a.strip() for a in arquivos_libs]
+            + arquivos_libs
         )
 
         arquivos_entrada = [a for a in arquivos_entrada if a is not None]
@@ -63,12 +69,25 @@ def pos_processa_decomp():
 
     # Zipar deck de entrada
     arquivos_entrada = identifica_arquivos_entrada()
-    zip_arquivos(arquivos_entrada, "deck")
+    if not compressao.sem_deck:
+        with metricas.etapa("deck") as metrica:
+            metrica.mede_zip(
+                zip_arquivos(
+                    arquivos_entrada,
+                    "deck",
+                    compressao.politica,
+                    compressao.cache,
+                )
+            )
+    if compressao.apenas_deck:
+        metricas.salva()
+        return
 
     # Traz arquivos LIBS para a raiz
-    traz_conteudo_para_raiz("out")
+    with metricas.etapa("traz_para_raiz"):
+        traz_conteudo_para_raiz("out")
 
-    # Zipar csvs de saida com resultados da operação
+    # Identifica csvs de saida com resultados da operação
     regex_arquivos_saida_csv = [
         r"^bengnl.*\.csv$",
         r"^dec_oper.*\.csv$",
@@ -92,12 +111,8 @@ def pos_processa_decomp():
         r"^vutil.*\.csv$",
         r"^oper_.*\.csv$",
     ]
-    arquivos_saida_operacao = identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_saida_csv
-    )
-    zip_arquivos(arquivos_saida_operacao, "operacao")
 
-    # Zipar demais relatorios de saída
+    # Identifica demais relatorios de saída
     arquivos_saida_relatorios = [
         "decomp.tim",
         "relato." + EXTENSAO,
@@ -140,20 +155,39 @@ def pos_processa_decomp():
         r"^avl_desvfpha_v_q_.*$",
         r"^avl_desvfpha_s_.*$",
     ]
-    arquivos_saida_relatorios += identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_relatorios
-    )
-    zip_arquivos(arquivos_saida_relatorios, "relatorios")
 
-    # Zipar cortdeco e mapcut
+    # Identifica cortdeco e mapcut
     arquivos_saida_cortes = [
         "cortdeco." + EXTENSAO,
         "mapcut." + EXTENSAO,
     ]
-    zip_arquivos(arquivos_saida_cortes, "cortes")
 
-    # Apagar arquivos para limpar diretório pós execução com sucesso
-    arquivos_manter = arquivos_entrada + [
+    # Arquivos temporários, apagados mesmo que não tenham sido zipados
+    arquivos_apagar_regex = [
+        r"^dimpl_.*$",
+        r"^cad.*$",
+        r"^debug.*$",
+        r"^inviab_0.*$",
+        r"^svc.*$",
+        r"^deco_.*\.msg$",
+        r"^SAIDA_MENSAGENS.*$",
+        r"^vazmsg.*$",
+    ]
+
+    # Classifica os arquivos do diretório em uma única passada, na primeira
+    # categoria cujas regex casam com o nome
+    classificados = ClassificadorArquivos(
+        {
+            "operacao": regex_arquivos_saida_csv,
+            "relatorios": regex_arquivos_relatorios,
+            "apagar": arquivos_apagar_regex,
+        }
+    ).classifica(IndiceDiretorio(), arquivos_entrada)
+    arquivos_saida_operacao = classificados["operacao"]
+    arquivos_saida_relatorios += classificados["relatorios"]
+
+    # Arquivos a apagar para limpar diretório pós execução com sucesso
+    arquivos_manter = set(arquivos_entrada) | {
         "decomp.tim",
         "relato." + EXTENSAO,
         "sumario." + EXTENSAO,
@@ -165,7 +199,7 @@ def pos_processa_decomp():
         "dec_oper_usih.csv",
         "dec_oper_usit.csv",
         "dec_oper_ree.csv",
-    ]
+    }
     arquivos_zipados = (
         arquivos_entrada
         + arquivos_saida_operacao
@@ -173,28 +207,44 @@ def pos_processa_decomp():
         + arquivos_saida_cortes
     )
     arquivos_limpar = [a for a in arquivos_zipados if a not in arquivos_manter]
-    limpa_arquivos_saida(arquivos_limpar)
+
+    # Zipar as saídas e limpar os arquivos zipados
+    diario = compressao.diario()
+    with (
+        compressao.rastreador() as rastreador,
+        metricas.etapa("saidas", numero_processadores),
+    ):
+        zip_categorias(
+            {
+                "operacao": arquivos_saida_operacao,
+                "relatorios": arquivos_saida_relatorios,
+                "cortes": arquivos_saida_cortes,
+            },
+            numero_processadores,
+            arquivos_limpar,
+            compressao.politica,
+            compressao.remocao_incremental,
+            compressao.max_memoria,
+            compressao.ordem_deterministica,
+            diario,
+            metricas=metricas,
+            rastreamento=rastreador,
+            partes=compressao.partes,
+        )
 
     # Apagar arquivos temporários para limpar diretório pós execução incompleta/inviavel
-    arquivos_apagar_regex = [
-        r"^dimpl_.*$",
-        r"^cad.*$",
-        r"^debug.*$",
-        r"^inviab_0.*$",
-        r"^svc.*$",
-        r"^deco_.*\.msg$",
-        r"^SAIDA_MENSAGENS.*$",
-        r"^vazmsg.*$",
-    ]
-    arquivos_apagar = identifica_arquivos_via_regex(
-        arquivos_entrada, arquivos_apagar_regex
-    ) + [
+    arquivos_apagar = classificados["apagar"] + [
         "decomp.lic",
         "cusfut." + EXTENSAO,
         "deconf." + EXTENSAO,
         "CONVERG.TMP",
     ]
-    limpa_arquivos_saida(arquivos_apagar)
+    with metricas.etapa("limpeza") as metrica:
+        metrica.arquivos = len(arquivos_apagar)
+        limpa_arquivos_saida(arquivos_apagar)
+    if diario is not None:
+        diario.remove()
 
     tf = time()
     print(f"Pós-processamento do DECOMP feito em {tf - ti:.2f} segundos!")
+    metricas.salva()
@@ -0,0 +1,34 @@
+from typing import TYPE_CHECKING, Optional
+
+from app.contexto_deck import ContextoDeck
+
+# A idessem só é importada ao ler um arquivo, para não atrasar o início
+# dos comandos que não leem o deck
+if TYPE_CHECKING:
+    from idessem.dessem.dessemarq import DessemArq
+    from idessem.dessem.dessopc import Dessopc
+    from idessem.dessem.operut import Operut
+
+
+class ContextoDessem(ContextoDeck):
+    @property
+    def dessem_arq(self) -> "DessemArq":
+        from idessem.dessem.dessemarq import DessemArq
+
+        DessemArq.ENCODING = "ISO-8859-1"
+        return self.le(DessemArq, "dessem.arq")
+
+    @property
+    def dessopc(self) -> Optional["Dessopc"]:
+        from idessem.dessem.dessopc import Dessopc
+
+        registro = self.dessem_arq.dessopc
+        if registro is None:
+            return None
+        return self.le(Dessopc, registro.valor)
+
+    @property
+    def operut(self) -> "Operut":
+        from idessem.dessem.operut import Operut
+
+        return self.le(Operut, self.dessem_arq.operut.valor)
@@ -0,0 +1,67 @@
+import shlex
+
+import click
+
+from app.dessem.pos_processa_dessem import pos_processa_dessem
+from app.dessem.pre_processa_dessem import pre_processa_dessem
+from app.job import etapa_comando, etapa_externa, executa_grafo
+
+
+@click.command("dessem")
+@click.argument("numero_processadores", type=int)
+@click.option("--executavel", required=True, help="Executável do DESSEM")
+@click.option(
+    "--sintetizador",
+    default="sintetizador-dessem completa",
+    help="Comando do sintetizador",
+)
+@click.option(
+    "--args-posproc",
+    default="",
+    help="Argumentos adicionais do pos_processa_dessem",
+)
+@click.option(
+    "--slots",
+    type=int,
+    default=None,
+    help="Slots de CPU compartilhados pelas etapas (padrão: número de "
+    + "processadores mais um, para as etapas leves que acompanham o modelo)",
+)
+def dessem(numero_processadores, executavel, sintetizador, args_posproc, slots):
+    """
+    Executa o job do DESSEM: configuração do número de processadores,
+    modelo, sintetizador e pós-processamento. Como no job script, o deck
+    só é zipado, junto com o sintetizador, e o pós-processamento só é
+    executado se o modelo terminar com sucesso.
+    """
+    n = numero_processadores
+    args_posproc = ["--numero-processadores", str(n)] + shlex.split(
+        args_posproc
+    )
+    etapas = [
+        etapa_comando("pre_processamento", pre_processa_dessem, [str(n)]),
+        etapa_externa(
+            "dessem",
+            [executavel],
+            n,
+            ["pre_processamento"],
+            mesmo_com_falha=True,
+        ),
+        etapa_comando(
+            "deck",
+            pos_processa_dessem,
+            args_posproc + ["--apenas-deck"],
+            dependencias=["dessem"],
+        ),
+        etapa_externa("sintetizador", shlex.split(sintetizador), n, ["dessem"]),
+        etapa_comando(
+            "pos_processamento",
+            pos_processa_dessem,
+            args_posproc + ["--sem-deck"],
+            n,
+            ["sintetizador", "deck"],
+            mesmo_com_falha=True,
+            requer_sucesso=["deck"],
+        ),
+    ]
+    executa_grafo(etapas, slots if slots is not None else n + 1)
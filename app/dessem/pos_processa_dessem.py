@@ -1,23 +1,35 @@
-import os
 from time import time
 
 import click
-import pandas as pd  # type: ignore
-from idessem.dessem.dessemarq import DessemArq
 
+from app.dessem.contexto_dessem import ContextoDessem
+from app.indice_diretorio import ClassificadorArquivos, IndiceDiretorio
+from app.metricas import Metricas
+from app.opcoes_compressao import opcoes_compressao
 from app.utils import (
-    identifica_arquivos_via_regex,
+    le_arquivos_indice,
     limpa_arquivos_saida,
     zip_arquivos,
+    zip_categorias,
 )
 
 
 @click.command("pos_processa_dessem")
-def pos_processa_dessem():
+@click.option(
+    "--numero-processadores",
+    type=int,
+    default=1,
+    help="Processadores usados na compressão das saídas",
+)
+@opcoes_compressao
+def pos_processa_dessem(numero_processadores, compressao):
     ti = time()
+    metricas = Metricas("pos_processa_dessem")
 
-    dessem_arq = DessemArq.read("./dessem.arq")
+    contexto = ContextoDessem()
+    dessem_arq = contexto.dessem_arq
     EXTENSAO = dessem_arq.caso.valor
+    indice = IndiceDiretorio()
 
     def identifica_arquivos_entrada() -> list[str]:
         registros_arquivos_gerais = [
@@ -58,24 +70,20 @@ def pos_processa_dessem():
         )
 
         arquivos_libs = (
-            pd.read_csv(
-                arquivo_indice[0], delimiter=";", comment="&", header=None
-            )[2]
-            .unique()
-            .tolist()
+            le_arquivos_indice(arquivo_indice[0])
             if len(arquivo_indice) == 1
             else []
         )
         # TODO - obter os arquivos de rede de maneira dinâmica
         arquivos_rede = [
-            a for a in os.listdir(os.curdir) if all(["pat" in a, ".afp" in a])
-        ] + [a for a in os.listdir(os.curdir) if ".pwf" in a]
+            a for a in indice if ("pat" in a and ".afp" in a) or ".pwf" in a
+        ]
 
         arquivos_entrada = (
             [a for a in arquivos_gerais if len(a) > 0]
             + arquivo_indice
             + ["dessem.arq"]
-            + [a.strip() for a in arquivos_libs]
+            + arquivos_libs
             + arquivos_rede
         )
 
@@ -86,9 +94,21 @@ def pos_processa_dessem():
 
     # Zipar deck de entrada
     arquivos_entrada = identifica_arquivos_entrada()
-    zip_arquivos(arquivos_entrada, "deck")
-
-    # Zipar csvs de saida com resultados da operação
+    if not compressao.sem_deck:
+        with metricas.etapa("deck") as metrica:
+            metrica.mede_zip(
+                zip_arquivos(
+                    arquivos_entrada,
+                    "deck",
+                    compressao.politica,
+                    compressao.cache,
+                )
+            )
+    if compressao.apenas_deck:
+        metricas.salva()
+        return
+
+    # Identifica csvs de saida com resultados da operação
     regex_arquivos_saida_csv = [
         r"^PDO_OPER.*$",
         r"^PDO_AVAL_.*$",
@@ -111,13 +131,9 @@ def pos_processa_dessem():
         r"^PDO_VAGUA.*$",
         r"^PDO_VERT.*$",
     ]
-    arquivos_saida_operacao = identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_saida_csv
-    )
-    zip_arquivos(arquivos_saida_operacao, "operacao")
 
-    # Zipar demais relatorios de saída
-    regex_arquivos_saida_csv = [
+    # Identifica demais relatorios de saída
+    regex_arquivos_saida_relatorios = [
         r"AVL_.*$",
         r"DES_.*$",
         r"LOG_.*$",
@@ -125,13 +141,32 @@ def pos_processa_dessem():
         r"PDO_ECO.*$",
         r"PTOPER.*\.PWF$",
     ]
-    arquivos_saida_relatorios = identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_saida_csv
-    )
-    zip_arquivos(arquivos_saida_relatorios, "relatorios")
 
-    # Apagar arquivos para limpar diretório pós execução com sucesso
-    arquivos_manter = arquivos_entrada + [
+    # Arquivos temporários, apagados mesmo que não tenham sido zipados
+    arquivos_apagar_regex = [
+        r"^fort.*$",
+        r"^fpha_.*$",
+        r"^SAVERADIAL.*$",
+        r"^SIM_ECO.*$",
+        r"^SVC_.*$",
+    ]
+
+    # Classifica os arquivos do diretório em uma única passada, em todas
+    # as categorias cujas regex casam com o nome: os PDO_AVAL_* vão para
+    # os zips de operação e de relatórios
+    classificados = ClassificadorArquivos(
+        {
+            "operacao": regex_arquivos_saida_csv,
+            "relatorios": regex_arquivos_saida_relatorios,
+            "apagar": arquivos_apagar_regex,
+        },
+        todas=True,
+    ).classifica(indice, arquivos_entrada)
+    arquivos_saida_operacao = classificados["operacao"]
+    arquivos_saida_relatorios = classificados["relatorios"]
+
+    # Arquivos a apagar para limpar diretório pós execução com sucesso
+    arquivos_manter = set(arquivos_entrada) | {
         "DES_LOG_RELATO." + EXTENSAO,
         "PDO_CMOBAR." + EXTENSAO,
         "PDO_CMOSIST." + EXTENSAO,
@@ -150,26 +185,44 @@ def pos_processa_dessem():
         "LOG_MATRIZ." + EXTENSAO,
         "AVL_ESTATFPHA." + EXTENSAO,
         "LOG_INVIAB." + EXTENSAO,
-    ]
+    }
     arquivos_zipados = (
         arquivos_entrada + arquivos_saida_operacao + arquivos_saida_relatorios
     )
     arquivos_limpar = [a for a in arquivos_zipados if a not in arquivos_manter]
-    limpa_arquivos_saida(arquivos_limpar)
+
+    # Zipar as saídas e limpar os arquivos zipados
+    diario = compressao.diario()
+    with (
+        compressao.rastreador() as rastreador,
+        metricas.etapa("saidas", numero_processadores),
+    ):
+        zip_categorias(
+            {
+                "operacao": arquivos_saida_operacao,
+                "relatorios": arquivos_saida_relatorios,
+            },
+            numero_processadores,
+            arquivos_limpar,
+            compressao.politica,
+            compressao.remocao_incremental,
+            compressao.max_memoria,
+            compressao.ordem_deterministica,
+            diario,
+            metricas=metricas,
+            rastreamento=rastreador,
+            partes=compressao.partes,
+        )
 
     # Apagar arquivos temporários para limpar diretório pós execução incompleta/inviavel
     # mesmo que não tenham sido zipados.
-    arquivos_apagar_regex = [
-        r"^fort.*$",
-        r"^fpha_.*$",
-        r"^SAVERADIAL.*$",
-        r"^SIM_ECO.*$",
-        r"^SVC_.*$",
-    ]
-    arquivos_apagar = identifica_arquivos_via_regex(
-        arquivos_entrada, arquivos_apagar_regex
-    )
-    limpa_arquivos_saida(arquivos_apagar)
+    arquivos_apagar = classificados["apagar"]
+    with metricas.etapa("limpeza") as metrica:
+        metrica.arquivos = len(arquivos_apagar)
+        limpa_arquivos_saida(arquivos_apagar)
+    if diario is not None:
+        diario.remove()
 
     tf = time()
     print(f"Pós-processamento do DESSEM feito em {tf - ti:.2f} segundos!")
+    metricas.salva()
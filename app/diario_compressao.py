@@ -0,0 +1,225 @@
+import json
+from collections.abc import Iterable
+from os import curdir, fsync, remove, stat
+from os.path import getsize, isfile, join
+from threading import Lock
+from typing import NamedTuple
+from zipfile import ZipInfo
+
+from app.zipfileparallel import read_local_header
+
+ARQUIVO_DIARIO = ".diario_compressao.jsonl"
+
+
+class Retomada(NamedTuple):
+    entradas: list[ZipInfo]
+    # Fim dos dados da última entrada mantida
+    fim: int
+    # O zip foi concluído e não foi alterado desde então
+    concluido: bool
+
+
+def _chave_zip(caminho_zip: str) -> tuple[int, int]:
+    st = stat(caminho_zip)
+    return st.st_size, st.st_mtime_ns
+
+
+class DiarioCompressao:
+    """
+    Diário, em JSON por linha, das entradas gravadas e sincronizadas em
+    disco em cada zip do caso e dos zips concluídos, para que uma
+    execução interrompida possa ser retomada mantendo as entradas
+    válidas dos zips incompletos e comprimindo apenas o que falta.
+    """
+
+    def __init__(self, diretorio: str = curdir):
+        self.caminho = join(diretorio, ARQUIVO_DIARIO)
+        self._entradas: dict[str, list[dict]] = {}
+        self._concluidos: dict[str, int] = {}
+        # Entradas de cada zip mantidas na última retomada ou registradas
+        # desde então, e a chave (tamanho, mtime) dos zips concluídos por
+        # esta instância, que não precisam ser validados novamente
+        self._zinfos: dict[str, list[ZipInfo]] = {}
+        self._validados: dict[str, tuple[int, int]] = {}
+        self._alterados: set[str] = set()
+        self._lock = Lock()
+        self._le()
+        self._arquivo = open(self.caminho, "a")  # noqa: SIM115
+
+    def _le(self):
+        if not isfile(self.caminho):
+            return
+        with open(self.caminho, "r") as arq:
+            for linha in arq:
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha cortada pela interrupção
+                    break
+                self._aplica(registro)
+
+    def _aplica(self, registro: dict):
+        nome_zip = registro["zip"]
+        if "retomado" in registro:
+            entradas = self._entradas.get(nome_zip, [])
+            self._entradas[nome_zip] = entradas[: registro["retomado"]]
+            self._concluidos.pop(nome_zip, None)
+        elif "concluido" in registro:
+            self._concluidos[nome_zip] = registro["concluido"]
+        else:
+            self._entradas.setdefault(nome_zip, []).append(registro)
+
+    def _escreve(self, registros: list[dict], duravel: bool = False):
+        with self._lock:
+            for r in registros:
+                self._aplica(r)
+                self._arquivo.write(json.dumps(r) + "\n")
+            self._arquivo.flush()
+            if duravel:
+                fsync(self._arquivo.fileno())
+
+    def _valida(self, caminho_zip: str) -> tuple[Retomada, list[dict]]:
+        entradas: list[ZipInfo] = []
+        registros: list[dict] = []
+        fim = 0
+        tamanho_zip = getsize(caminho_zip)
+        with open(caminho_zip, "rb") as arq:
+            for r in self._entradas.get(caminho_zip, []):
+                # Arquivo alterado após ser zipado: a entrada deixa de
+                # constar no diretório central e é zipada novamente
+                if isfile(r["nome"]):
+                    st = stat(r["nome"])
+                    if st.st_size != r["tamanho"] or st.st_mtime != r["mtime"]:
+                        continue
+                lido = read_local_header(arq, r["offset"])
+                if lido is None:
+                    break
+                zinfo, inicio_dados = lido
+                if zinfo.filename != r["nome"] or zinfo.CRC != r["crc"]:
+                    break
+                if inicio_dados + r["tamanho_comprimido"] > tamanho_zip:
+                    break
+                zinfo.file_size = r["tamanho"]
+                zinfo.compress_size = r["tamanho_comprimido"]
+                zinfo.external_attr = r["atributos"]
+                entradas.append(zinfo)
+                registros.append(r)
+                fim = inicio_dados + r["tamanho_comprimido"]
+        concluido = self._concluidos.get(caminho_zip) == tamanho_zip
+        return Retomada(entradas, fim, concluido), registros
+
+    def _retomada_validada(self, caminho_zip: str) -> Retomada:
+        # Apenas o fim da última entrada é lido do zip
+        entradas = self._zinfos.get(caminho_zip, [])
+        if len(entradas) == 0:
+            return Retomada([], 0, True)
+        ultima = max(entradas, key=lambda z: z.header_offset)
+        with open(caminho_zip, "rb") as arq:
+            lido = read_local_header(arq, ultima.header_offset)
+        if lido is None:
+            raise ValueError(f"Entrada {ultima.filename} ausente do zip")
+        return Retomada(list(entradas), lido[1] + ultima.compress_size, True)
+
+    def _algum_alterado(self, caminho_zip: str, nomes: Iterable[str]) -> bool:
+        registros = {r["nome"]: r for r in self._entradas.get(caminho_zip, [])}
+        for nome in nomes:
+            r = registros.get(nome)
+            if r is None or not isfile(nome):
+                continue
+            st = stat(nome)
+            if st.st_size != r["tamanho"] or st.st_mtime != r["mtime"]:
+                return True
+        return False
+
+    def retoma(self, caminho_zip: str, nomes: Iterable[str] = ()) -> Retomada:
+        """
+        Entradas do zip registradas no diário que ainda são válidas: em
+        sequência desde o início do zip até o primeiro cabeçalho local ou
+        dado ausente, e com o arquivo de origem inalterado ou já removido.
+        O diário passa a considerar apenas estas entradas, com o zip em
+        construção. Um zip concluído por esta instância e não alterado
+        desde então não é validado novamente, o que mantém constante o
+        custo de cada retomada do `monitora`, a menos que um dos arquivos
+        em `nomes`, a zipar agora, tenha sido alterado depois de zipado.
+        """
+        retomada, registros = Retomada([], 0, False), []
+        anteriores = self._entradas.get(caminho_zip, [])
+        if isfile(caminho_zip):
+            validado = self._validados.get(caminho_zip) == _chave_zip(
+                caminho_zip
+            )
+            if validado and not self._algum_alterado(caminho_zip, nomes):
+                retomada = self._retomada_validada(caminho_zip)
+                registros = anteriores
+            else:
+                retomada, registros = self._valida(caminho_zip)
+        # Apenas os registros após os que já estão no diário são escritos
+        mantidos = 0
+        for r, anterior in zip(registros, anteriores):
+            if r is not anterior:
+                break
+            mantidos += 1
+        self._escreve(
+            [{"zip": caminho_zip, "retomado": mantidos}] + registros[mantidos:]
+        )
+        with self._lock:
+            self._zinfos[caminho_zip] = list(retomada.entradas)
+            self._validados.pop(caminho_zip, None)
+            self._alterados.discard(caminho_zip)
+        return retomada
+
+    def registra(
+        self, caminho_zip: str, entradas: list[ZipInfo], duravel: bool = False
+    ):
+        """
+        Registra entradas gravadas no zip. Com `duravel`, o diário é
+        sincronizado em disco antes de retornar, para que os arquivos de
+        origem possam ser removidos.
+        """
+        registros: list[dict] = []
+        alterado = False
+        for zinfo in entradas:
+            # Um arquivo alterado durante a compressão é registrado sem
+            # data, para ser zipado novamente na retomada
+            try:
+                st = stat(zinfo.filename)
+                mtime: float | None = (
+                    st.st_mtime if st.st_size == zinfo.file_size else None
+                )
+                alterado = alterado or mtime is None
+            except FileNotFoundError:
+                mtime = None
+            registros.append(
+                {
+                    "zip": caminho_zip,
+                    "nome": zinfo.filename,
+                    "offset": zinfo.header_offset,
+                    "crc": zinfo.CRC,
+                    "tamanho": zinfo.file_size,
+                    "tamanho_comprimido": zinfo.compress_size,
+                    "atributos": zinfo.external_attr,
+                    "mtime": mtime,
+                }
+            )
+        self._escreve(registros, duravel)
+        with self._lock:
+            self._zinfos.setdefault(caminho_zip, []).extend(entradas)
+            if alterado:
+                self._alterados.add(caminho_zip)
+
+    def conclui(self, caminho_zip: str):
+        chave = _chave_zip(caminho_zip)
+        self._escreve([{"zip": caminho_zip, "concluido": chave[0]}], True)
+        with self._lock:
+            # Entradas de arquivos alterados durante a compressão são
+            # descartadas apenas pela validação completa
+            if caminho_zip not in self._alterados:
+                self._validados[caminho_zip] = chave
+
+    def remove(self):
+        """
+        Encerra o diário após o pós-processamento ser concluído.
+        """
+        self._arquivo.close()
+        if isfile(self.caminho):
+            remove(self.caminho)
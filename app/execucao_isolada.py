@@ -0,0 +1,195 @@
+import asyncio
+import re
+from collections.abc import Callable
+from os import curdir, listdir, remove, replace, symlink
+from os.path import abspath, isfile, islink, join, splitext
+from shutil import rmtree
+from tempfile import mkdtemp
+from typing import NamedTuple
+
+from app.metricas import MetricaEtapa, Metricas
+from app.terminal import TerminalResult, run_terminal_stream
+from app.utils import reporta_execucao
+
+# Prefixo dos diretórios de trabalho criados no diretório do caso
+PREFIXO_DIRETORIO_ISOLADO = ".auxiliar_"
+
+
+class ExecucaoAuxiliar(NamedTuple):
+    nome: str
+    executavel: str
+    timeout: float
+    # Escreve, no diretório de trabalho, os arquivos de controle gerados
+    gera: Callable[[str], None]
+    gerados: list[str]
+    # Nomes com que os arquivos gerados voltam para o caso
+    renomear: dict[str, str] | None = None
+    # Log das saídas do programa, no diretório do caso
+    log: str | None = None
+    # Regex dos arquivos escritos pelo programa, que não são ligados ao
+    # caso mesmo que já existam nele, para que não sejam sobrescritos
+    # através do link
+    saidas: list[str] | None = None
+    # Arquivos escritos pelo programa e descartados junto com o diretório
+    # de trabalho, que também não são ligados ao caso
+    temporarios: list[str] | None = None
+    # Acrescentado ao nome das saídas desta execução que outra execução
+    # posterior também produz, como em nwlistop_opcao2.rel
+    sufixo: str | None = None
+
+
+def _prepara_diretorio(execucao: ExecucaoAuxiliar) -> str:
+    diretorio = mkdtemp(dir=curdir, prefix=PREFIXO_DIRETORIO_ISOLADO)
+    saidas = [re.compile(r) for r in execucao.saidas or []]
+    temporarios = execucao.temporarios or []
+    for nome in listdir(curdir):
+        if nome.startswith(PREFIXO_DIRETORIO_ISOLADO):
+            continue
+        if nome in execucao.gerados or nome in temporarios:
+            continue
+        if any(r.search(nome) is not None for r in saidas):
+            continue
+        symlink(abspath(nome), join(diretorio, nome))
+    try:
+        execucao.gera(diretorio)
+    except BaseException:
+        rmtree(diretorio, ignore_errors=True)
+        raise
+    return diretorio
+
+
+def _saidas(execucao: ExecucaoAuxiliar, diretorio: str) -> list[str]:
+    # Os links que restaram são as entradas e os demais arquivos são as
+    # saídas e os arquivos gerados
+    temporarios = set(execucao.temporarios or [])
+    return sorted(
+        nome
+        for nome in listdir(diretorio)
+        if not islink(join(diretorio, nome)) and nome not in temporarios
+    )
+
+
+def _nome_com_sufixo(nome: str, sufixo: str) -> str:
+    raiz, extensao = splitext(nome)
+    return f"{raiz}_{sufixo}{extensao}"
+
+
+def _traz_saidas(
+    execucao: ExecucaoAuxiliar,
+    diretorio: str,
+    saidas: list[str],
+    posteriores: set[str],
+):
+    # Uma saída que uma execução posterior também produz é mantida com o
+    # sufixo desta execução, enquanto os arquivos de controle gerados (e
+    # as saídas sem sufixo) são descartados
+    renomear = execucao.renomear or {}
+    for nome in saidas:
+        destino = renomear.get(nome, nome)
+        if destino in posteriores:
+            if execucao.sufixo is None or nome in execucao.gerados:
+                remove(join(diretorio, nome))
+                continue
+            destino = _nome_com_sufixo(destino, execucao.sufixo)
+        try:
+            replace(join(diretorio, nome), join(curdir, destino))
+        except OSError as e:
+            print(f"Erro ao trazer {nome} da execução do {execucao.nome}: {e}")
+
+
+async def _executa_isolado(
+    execucao: ExecucaoAuxiliar, diretorio: str, semaforo: asyncio.Semaphore
+) -> TerminalResult:
+    # Executáveis dados por caminho relativo ao caso
+    executavel = execucao.executavel
+    if isfile(executavel):
+        executavel = abspath(executavel)
+    async with semaforo:
+        print(f"Executando: {execucao.executavel} ({execucao.nome})")
+        resultado = await run_terminal_stream(
+            [executavel],
+            execucao.timeout,
+            diretorio,
+            abspath(execucao.log) if execucao.log is not None else None,
+            f"[{execucao.nome}] ",
+        )
+    reporta_execucao([executavel], resultado, f"[{execucao.nome}] ")
+    if resultado.timed_out:
+        raise TimeoutError(
+            f"{execucao.nome} interrompido após {execucao.timeout} s"
+        )
+    return resultado
+
+
+def _registra_metrica(
+    metricas: Metricas, execucao: ExecucaoAuxiliar, resultado
+):
+    metrica = MetricaEtapa(execucao.nome)
+    if isinstance(resultado, TerminalResult):
+        metrica.tempo = resultado.wall_time
+        metrica.cpu = resultado.cpu_time
+        metrica.pico_rss = resultado.peak_rss
+        metrica.estado = "sucesso" if resultado.returncode == 0 else "falha"
+    else:
+        metrica.estado = "falha"
+    metricas.registra(metrica)
+
+
+def executa_auxiliares_isolados(
+    execucoes: list[ExecucaoAuxiliar],
+    numero_processadores: int,
+    metricas: Metricas | None = None,
+):
+    """
+    Executa os programas auxiliares ao mesmo tempo, até
+    `numero_processadores` por vez, cada um em um diretório de trabalho
+    próprio com links para os arquivos do caso e os seus arquivos de
+    controle. As saídas dos programas são exibidas à medida que são
+    produzidas, identificadas pelo nome da execução. As `saidas` de cada
+    execução nunca são ligadas ao caso, para que duas execuções não
+    escrevam no mesmo arquivo. Ao final, as saídas são trazidas para o
+    caso na ordem das `execucoes`: um nome produzido por mais de uma
+    fica com a última, como se tivessem sido feitas em sequência, e as
+    anteriores são mantidas com o seu `sufixo`. Com `metricas`, o tempo,
+    a CPU e o pico de memória de cada execução são registrados como uma
+    etapa.
+    """
+    preparadas: list[ExecucaoAuxiliar] = []
+    diretorios: list[str] = []
+    try:
+        for execucao in execucoes:
+            try:
+                diretorios.append(_prepara_diretorio(execucao))
+            except Exception as e:  # noqa: BLE001
+                print(f"Erro na execução do {execucao.nome}: {e}")
+                continue
+            preparadas.append(execucao)
+
+        async def executa():
+            semaforo = asyncio.Semaphore(max(1, numero_processadores))
+            return await asyncio.gather(
+                *[
+                    _executa_isolado(e, d, semaforo)
+                    for e, d in zip(preparadas, diretorios)
+                ],
+                return_exceptions=True,
+            )
+
+        resultados = asyncio.run(executa())
+        saidas = [_saidas(e, d) for e, d in zip(preparadas, diretorios)]
+        for i, (execucao, diretorio, resultado) in enumerate(
+            zip(preparadas, diretorios, resultados)
+        ):
+            if isinstance(resultado, BaseException):
+                print(f"Erro na execução do {execucao.nome}: {resultado}")
+            if metricas is not None:
+                _registra_metrica(metricas, execucao, resultado)
+            posteriores = {
+                (e.renomear or {}).get(n, n)
+                for e, nomes in zip(preparadas[i + 1 :], saidas[i + 1 :])
+                for n in nomes
+            }
+            _traz_saidas(execucao, diretorio, saidas[i], posteriores)
+    finally:
+        for diretorio in diretorios:
+            rmtree(diretorio, ignore_errors=True)
@@ -0,0 +1,221 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from time import time
+
+import click
+
+from app.indice_zip import (
+    EntradaIndice,
+    LeitorZip,
+    LeitorZipPartes,
+    abre_leitor,
+)
+
+Leitor = LeitorZip | LeitorZipPartes
+
+# Entradas menores que este limite (em bytes) são extraídas em lotes
+LIMITE_ENTRADAS_PEQUENAS = 1 << 20
+
+
+def _busca_entradas(leitor: Leitor, padroes: list[str]) -> list[EntradaIndice]:
+    encontradas: dict[str, EntradaIndice] = {}
+    for padrao in padroes:
+        if any(c in padrao for c in "*?["):
+            entradas = list(leitor.busca_padrao(padrao))
+        else:
+            entrada = leitor.busca(padrao)
+            entradas = [entrada] if entrada is not None else []
+        if len(entradas) == 0:
+            print(f"Nenhuma entrada de {leitor.caminho_zip} para {padrao}")
+        for e in entradas:
+            encontradas[e.nome] = e
+    return list(encontradas.values())
+
+
+def _agenda_extracao(
+    entradas: list[tuple[Leitor, EntradaIndice]],
+    limite_entradas_pequenas: int,
+) -> list[list[tuple[Leitor, EntradaIndice]]]:
+    """
+    Agrupa as entradas em tarefas para o pool de extração, como na
+    compressão: cada entrada grande é uma tarefa, as pequenas são
+    empacotadas em lotes de até `limite_entradas_pequenas` bytes, e as
+    tarefas seguem da maior para a menor (LPT).
+    """
+    tarefas: list[tuple[int, list[tuple[Leitor, EntradaIndice]]]] = []
+    lote: list[tuple[Leitor, EntradaIndice]] = []
+    tamanho_lote = 0
+    for leitor, entrada in sorted(
+        entradas, key=lambda e: e[1].tamanho, reverse=True
+    ):
+        if entrada.tamanho >= limite_entradas_pequenas:
+            tarefas.append((entrada.tamanho, [(leitor, entrada)]))
+            continue
+        lote.append((leitor, entrada))
+        tamanho_lote += entrada.tamanho
+        if tamanho_lote >= limite_entradas_pequenas:
+            tarefas.append((tamanho_lote, lote))
+            lote = []
+            tamanho_lote = 0
+    if len(lote) > 0:
+        tarefas.append((tamanho_lote, lote))
+    tarefas.sort(key=lambda t: t[0], reverse=True)
+    return [t[1] for t in tarefas]
+
+
+def _extrai_lote(
+    lote: list[tuple[Leitor, EntradaIndice]], diretorio: str
+) -> list[tuple[EntradaIndice, BaseException]]:
+    erros: list[tuple[EntradaIndice, BaseException]] = []
+    for leitor, entrada in lote:
+        try:
+            leitor.extrai(entrada, diretorio)
+        except Exception as e:  # noqa: BLE001
+            erros.append((entrada, e))
+    return erros
+
+
+def extrai_zips_paralelo(
+    arquivos_zip: list[str],
+    diretorio: str,
+    numero_processadores: int,
+    padroes: list[str] | None = None,
+    limite_entradas_pequenas: int = LIMITE_ENTRADAS_PEQUENAS,
+) -> list[EntradaIndice]:
+    """
+    Extrai as entradas dos zips, ou apenas as que casam com os `padroes`,
+    em um pool de `numero_processadores` threads compartilhado por todos
+    os zips. Cada entrada é descomprimida em trechos, direto para o
+    arquivo de saída já alocado no tamanho final, e tem o CRC verificado.
+    As entradas com erro são reportadas e o primeiro erro é levantado ao
+    final, após a extração das demais. Retorna as entradas extraídas.
+    """
+    with ExitStack() as pilha:
+        entradas: list[tuple[Leitor, EntradaIndice]] = []
+        nomes: set[str] = set()
+        for arquivo_zip in arquivos_zip:
+            leitor = pilha.enter_context(abre_leitor(arquivo_zip))
+            if padroes is None:
+                encontradas = list(leitor.entradas())
+            else:
+                encontradas = _busca_entradas(leitor, padroes)
+            for e in encontradas:
+                if e.nome in nomes:
+                    print(f"Entrada {e.nome} repetida em {arquivo_zip}")
+                    continue
+                nomes.add(e.nome)
+                entradas.append((leitor, e))
+        tarefas = _agenda_extracao(entradas, limite_entradas_pequenas)
+        with ThreadPoolExecutor(numero_processadores) as exe:
+            fs = [exe.submit(_extrai_lote, t, diretorio) for t in tarefas]
+        wait(fs)
+    erros = [erro for f in fs for erro in f.result()]
+    for entrada, erro in erros:
+        print(f"Erro ao extrair {entrada.nome}: {erro}")
+    if len(erros) > 0:
+        raise erros[0][1]
+    return [e for _, e in entradas]
+
+
+@click.command("extrai")
+@click.argument("arquivo_zip", type=click.Path(dir_okay=False))
+@click.argument("padroes", nargs=-1, required=True)
+@click.option(
+    "--destino",
+    type=click.Path(file_okay=False),
+    default=".",
+    help="Diretório onde as entradas são extraídas",
+)
+@click.option(
+    "--lista",
+    is_flag=True,
+    help="Apenas lista as entradas encontradas, sem extraí-las",
+)
+def extrai(arquivo_zip, padroes, destino, lista):
+    """
+    Extrai do ARQUIVO_ZIP as entradas com os nomes ou padrões glob dados
+    (ex: "*.csv"), localizadas pelo índice lateral do zip, sem ler o
+    diretório central. Um zip dividido em partes é dado pelo seu nome ou
+    pelo seu manifesto.
+    """
+    ti = time()
+    with abre_leitor(arquivo_zip) as leitor:
+        entradas = _busca_entradas(leitor, list(padroes))
+        for e in entradas:
+            if lista:
+                print(f"{e.tamanho:>14} {e.nome}")
+                continue
+            leitor.extrai(e, destino)
+    if not lista:
+        tf = time()
+        print(f"{len(entradas)} entradas extraídas em {tf - ti:.2f} segundos")
+    if len(entradas) == 0:
+        sys.exit(1)
+
+
+@click.command("extrai_paralelo")
+@click.argument(
+    "arquivos_zip",
+    nargs=-1,
+    required=True,
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--numero-processadores",
+    "-n",
+    type=int,
+    default=1,
+    help="Threads que descomprimem as entradas",
+)
+@click.option(
+    "--destino",
+    type=click.Path(file_okay=False),
+    default=".",
+    help="Diretório onde as entradas são extraídas",
+)
+@click.option(
+    "--padrao",
+    multiple=True,
+    help="Nome ou padrão glob das entradas a extrair (pode ser repetido). "
+    + "Por padrão, todas são extraídas",
+)
+@click.option(
+    "--limite-entradas-pequenas",
+    type=int,
+    default=LIMITE_ENTRADAS_PEQUENAS,
+    help="Tamanho (bytes) abaixo do qual as entradas são extraídas em lotes",
+)
+def extrai_paralelo(
+    arquivos_zip,
+    numero_processadores,
+    destino,
+    padrao,
+    limite_entradas_pequenas,
+):
+    """
+    Extrai os ARQUIVOS_ZIP em paralelo, com as entradas de todos os zips
+    distribuídas entre as threads, verificando o CRC de cada uma. Um zip
+    dividido em partes é dado pelo seu nome ou pelo seu manifesto.
+    """
+    ti = time()
+    print(
+        f"Extraindo {len(arquivos_zip)} zips em {numero_processadores} threads"
+    )
+    try:
+        entradas = extrai_zips_paralelo(
+            list(arquivos_zip),
+            destino,
+            numero_processadores,
+            list(padrao) if len(padrao) > 0 else None,
+            limite_entradas_pequenas,
+        )
+    except Exception as e:  # noqa: BLE001
+        print(f"Erro na extração: {e}")
+        sys.exit(1)
+    tf = time()
+    tamanho = sum(e.tamanho for e in entradas)
+    print(
+        f"{len(entradas)} entradas ({tamanho / (1 << 20):.1f} MB) extraídas "
+        + f"em {tf - ti:.2f} segundos"
+    )
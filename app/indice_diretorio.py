@@ -0,0 +1,127 @@
+import re
+from collections.abc import Iterable
+from os import curdir, scandir
+from typing import NamedTuple
+
+
+class EntradaDiretorio(NamedTuple):
+    nome: str
+    tamanho: int
+    mtime: float
+
+
+class IndiceDiretorio:
+    """
+    Nome, tamanho e data de modificação dos arquivos regulares de um
+    diretório, obtidos em uma única passada do `os.scandir`.
+    """
+
+    def __init__(self, diretorio: str = curdir):
+        self.diretorio = diretorio
+        self.entradas: dict[str, EntradaDiretorio] = {}
+        self.atualiza()
+
+    def atualiza(self):
+        entradas: dict[str, EntradaDiretorio] = {}
+        with scandir(self.diretorio) as it:
+            for e in it:
+                try:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                except OSError:
+                    continue
+                entradas[e.name] = EntradaDiretorio(
+                    e.name, st.st_size, st.st_mtime
+                )
+        self.entradas = entradas
+
+    def __contains__(self, nome: object) -> bool:
+        return nome in self.entradas
+
+    def __iter__(self):
+        return iter(self.entradas)
+
+
+class ClassificadorArquivos:
+    """
+    Classifica nomes de arquivos em categorias definidas por listas de
+    regex. As regex de cada categoria são compiladas em uma única
+    alternância e cada arquivo entra apenas na primeira categoria, na
+    ordem em que foram dadas, com alguma regex que case com o nome, ou,
+    com `todas`, em todas essas categorias.
+    """
+
+    def __init__(self, categorias: dict[str, list[str]], todas: bool = False):
+        self.nomes_categorias = list(categorias.keys())
+        self.todas = todas
+        self.regex = [
+            (c, re.compile("|".join(f"(?:{r})" for r in lista_regex)))
+            for c, lista_regex in categorias.items()
+            if len(lista_regex) > 0
+        ]
+
+    def categoria(self, nome: str) -> str | None:
+        for c, regex in self.regex:
+            if regex.search(nome) is not None:
+                return c
+        return None
+
+    def categorias(self, nome: str) -> list[str]:
+        if not self.todas:
+            c = self.categoria(nome)
+            return [c] if c is not None else []
+        return [c for c, regex in self.regex if regex.search(nome) is not None]
+
+    def classifica(
+        self, nomes: Iterable[str], ignorar: Iterable[str | None] = ()
+    ) -> dict[str, list[str]]:
+        ignorados = set(ignorar)
+        classificados: dict[str, list[str]] = {
+            c: [] for c in self.nomes_categorias
+        }
+        for nome in nomes:
+            if nome in ignorados:
+                continue
+            for c in self.categorias(nome):
+                classificados[c].append(nome)
+        return classificados
+
+
+class ArquivosEstaveis:
+    """
+    Acompanha os arquivos de um diretório entre indexações, considerando
+    finais os que mantêm o tamanho e a data de modificação por
+    `estabilidade` segundos, e os que já foram consumidos enquanto não
+    forem alterados.
+    """
+
+    def __init__(self, estabilidade: float):
+        self.estabilidade = estabilidade
+        self._desde: dict[str, tuple[EntradaDiretorio, float]] = {}
+        self._consumidos: dict[str, EntradaDiretorio] = {}
+
+    def finais(
+        self, indice: IndiceDiretorio, agora: float, todos: bool = False
+    ) -> set[str]:
+        """
+        Arquivos finais do `indice` ainda não consumidos. Com `todos`,
+        como ao término do processo que os produz, todos são finais.
+        """
+        desde: dict[str, tuple[EntradaDiretorio, float]] = {}
+        finais: set[str] = set()
+        for nome, entrada in indice.entradas.items():
+            anterior = self._desde.get(nome)
+            if anterior is None or anterior[0] != entrada:
+                anterior = (entrada, agora)
+            desde[nome] = anterior
+            if self._consumidos.get(nome) == entrada:
+                continue
+            if todos or agora - anterior[1] >= self.estabilidade:
+                finais.add(nome)
+        self._desde = desde
+        return finais
+
+    def consome(self, nomes: Iterable[str], indice: IndiceDiretorio):
+        for nome in nomes:
+            self._consumidos[nome] = indice.entradas[nome]
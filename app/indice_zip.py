@@ -0,0 +1,539 @@
+import json
+import struct
+from bisect import bisect_right
+from collections.abc import Iterator
+from contextlib import ExitStack
+from fnmatch import fnmatchcase
+from glob import escape, glob
+from heapq import merge
+from os import makedirs, posix_fallocate, pread, remove, replace, stat
+from os.path import basename, dirname, isfile, join
+from threading import Lock
+from typing import BinaryIO, NamedTuple
+from zipfile import BadZipFile, ZipFile, ZipInfo, _get_decompressor, crc32
+
+from app.zipfileparallel import CHUNK_SIZE, read_local_header
+
+# Índice lateral escrito ao lado de cada zip, como <zip>.idx
+EXTENSAO_INDICE = ".idx"
+MAGICO_INDICE = b"ZIDX"
+VERSAO_INDICE = 2
+# Entradas por bloco: uma busca lê o sumário dos blocos e um único bloco
+ENTRADAS_POR_BLOCO = 64
+
+# Mágico, versão, entradas por bloco, número de entradas, tamanho e data
+# de modificação (ns) do zip e tamanho do sumário, que vem logo após o
+# cabeçalho
+_CABECALHO = struct.Struct("<4sHHIQQI")
+# Tamanho do nome, seguido do nome, e da entrada
+_NOME = struct.Struct("<H")
+_ENTRADA = struct.Struct("<QQQIH")
+# Após o nome, a posição e o tamanho do bloco de cada item do sumário
+_BLOCO = struct.Struct("<QI")
+
+# Zip dividido em partes, como <zip sem extensão>.manifesto.json
+EXTENSAO_MANIFESTO = ".manifesto.json"
+# Regra, registrada no manifesto, que dá a parte de cada entrada
+REGRA_PARTES = "crc32(nome) % partes"
+
+
+class EntradaIndice(NamedTuple):
+    nome: str
+    # Posição do cabeçalho local da entrada no zip
+    posicao: int
+    tamanho_comprimido: int
+    tamanho: int
+    crc: int
+    compress_type: int
+
+
+def caminho_indice(caminho_zip: str) -> str:
+    return caminho_zip + EXTENSAO_INDICE
+
+
+def caminho_manifesto(caminho_zip: str) -> str:
+    return caminho_zip.removesuffix(".zip") + EXTENSAO_MANIFESTO
+
+
+def caminhos_partes(caminho_zip: str, partes: int) -> list[str]:
+    base = caminho_zip.removesuffix(".zip")
+    largura = len(str(partes))
+    return [f"{base}.parte{i + 1:0{largura}d}.zip" for i in range(partes)]
+
+
+def partes_existentes(caminho_zip: str) -> list[str]:
+    """
+    Partes do zip lógico `caminho_zip` presentes em disco, com qualquer
+    número de partes.
+    """
+    base = caminho_zip.removesuffix(".zip")
+    return sorted(
+        p
+        for p in glob(escape(base) + ".parte*.zip")
+        if p[len(base) + len(".parte") : -len(".zip")].isdigit()
+    )
+
+
+def parte_da_entrada(nome: str, partes: int) -> int:
+    """
+    Parte do zip onde fica a entrada: depende apenas do nome, de modo que
+    uma busca lê o índice de uma única parte e execuções retomadas
+    mantêm cada arquivo na mesma parte.
+    """
+    return crc32(nome.encode("utf-8")) % partes
+
+
+def escreve_manifesto(caminho_zip: str, partes: list[str]):
+    """
+    Escreve o manifesto do zip lógico `caminho_zip`, dividido nas
+    `partes`, cujos caminhos são registrados relativos ao manifesto.
+    """
+    caminho = caminho_manifesto(caminho_zip)
+    temporario = caminho + ".tmp"
+    try:
+        with open(temporario, "w") as arq:
+            json.dump(
+                {
+                    "zip": basename(caminho_zip),
+                    "regra": REGRA_PARTES,
+                    "partes": [basename(p) for p in partes],
+                },
+                arq,
+                indent=4,
+            )
+        replace(temporario, caminho)
+    except BaseException:
+        remove(temporario)
+        raise
+
+
+def _nome(info: ZipInfo) -> str:
+    return info.filename
+
+
+def _empacota_nome(nome: str) -> bytes:
+    dados = nome.encode("utf-8")
+    return _NOME.pack(len(dados)) + dados
+
+
+def _assinatura_zip(caminho_zip: str) -> tuple[int, int]:
+    """
+    Tamanho e data de modificação do zip, registrados no índice para
+    detectar um zip alterado ou substituído depois dele.
+    """
+    estado = stat(caminho_zip)
+    return estado.st_size, estado.st_mtime_ns
+
+
+def escreve_indice_zip(caminho_zip: str, infos: list[ZipInfo]):
+    """
+    Escreve o índice lateral de um zip já fechado, a partir das entradas
+    do seu diretório central em memória: as entradas, ordenadas pelo
+    nome, em blocos de `ENTRADAS_POR_BLOCO`, precedidas de um sumário com
+    o primeiro nome de cada bloco.
+    """
+    entradas = sorted({i.filename: i for i in infos}.values(), key=_nome)
+    blocos: list[bytes] = []
+    primeiros: list[str] = []
+    for inicio in range(0, len(entradas), ENTRADAS_POR_BLOCO):
+        bloco = entradas[inicio : inicio + ENTRADAS_POR_BLOCO]
+        primeiros.append(bloco[0].filename)
+        blocos.append(
+            b"".join(
+                _empacota_nome(i.filename)
+                + _ENTRADA.pack(
+                    i.header_offset,
+                    i.compress_size,
+                    i.file_size,
+                    i.CRC,
+                    i.compress_type,
+                )
+                for i in bloco
+            )
+        )
+    tamanho_sumario = sum(
+        len(_empacota_nome(p)) + _BLOCO.size for p in primeiros
+    )
+    posicao = _CABECALHO.size + tamanho_sumario
+    itens: list[bytes] = []
+    for primeiro, bloco in zip(primeiros, blocos):
+        itens.append(
+            _empacota_nome(primeiro) + _BLOCO.pack(posicao, len(bloco))
+        )
+        posicao += len(bloco)
+    sumario = b"".join(itens)
+    cabecalho = _CABECALHO.pack(
+        MAGICO_INDICE,
+        VERSAO_INDICE,
+        ENTRADAS_POR_BLOCO,
+        len(entradas),
+        *_assinatura_zip(caminho_zip),
+        len(sumario),
+    )
+    temporario = caminho_indice(caminho_zip) + ".tmp"
+    try:
+        with open(temporario, "wb") as arq:
+            arq.write(cabecalho + sumario + b"".join(blocos))
+        replace(temporario, caminho_indice(caminho_zip))
+    except BaseException:
+        remove(temporario)
+        raise
+
+
+def _desempacota_nome(dados: bytes, posicao: int) -> tuple[str, int]:
+    (tamanho,) = _NOME.unpack_from(dados, posicao)
+    posicao += _NOME.size
+    nome = dados[posicao : posicao + tamanho].decode("utf-8")
+    return nome, posicao + tamanho
+
+
+def _prefixo_literal(padrao: str) -> str:
+    for i, c in enumerate(padrao):
+        if c in "*?[":
+            return padrao[:i]
+    return padrao
+
+
+class LeitorZip:
+    """
+    Lê membros de um zip sem carregar o seu diretório central: o índice
+    lateral dá a posição do cabeçalho local de cada entrada, encontrada
+    com uma busca binária no sumário dos blocos e a leitura de um único
+    bloco. Se o zip não tem índice, ou foi alterado depois dele, as
+    entradas são lidas do diretório central, com a mesma interface.
+    """
+
+    def __init__(self, caminho_zip: str):
+        self.caminho_zip = caminho_zip
+        self._arquivo_zip = open(caminho_zip, "rb")  # noqa: SIM115
+        self._primeiros: list[str] = []
+        self._blocos: list[tuple[int, int]] = []
+        self._carregados: dict[int, list[EntradaIndice]] = {}
+        self._indice: BinaryIO | None = None
+        self._lock = Lock()
+        try:
+            if not self._abre_indice():
+                self._le_diretorio_central()
+        except BaseException:
+            self.close()
+            raise
+
+    def _abre_indice(self) -> bool:
+        caminho = caminho_indice(self.caminho_zip)
+        if not isfile(caminho):
+            return False
+        with ExitStack() as pilha:
+            indice = pilha.enter_context(open(caminho, "rb"))
+            cabecalho = indice.read(_CABECALHO.size)
+            if len(cabecalho) < _CABECALHO.size:
+                return False
+            magico, versao, _, _, tamanho_zip, mtime_zip, tamanho_sumario = (
+                _CABECALHO.unpack(cabecalho)
+            )
+            if (
+                magico != MAGICO_INDICE
+                or versao != VERSAO_INDICE
+                or (tamanho_zip, mtime_zip) != _assinatura_zip(self.caminho_zip)
+            ):
+                print(f"Índice de {self.caminho_zip} desatualizado, ignorando")
+                return False
+            sumario = indice.read(tamanho_sumario)
+            posicao = 0
+            while posicao < len(sumario):
+                primeiro, posicao = _desempacota_nome(sumario, posicao)
+                self._primeiros.append(primeiro)
+                self._blocos.append(_BLOCO.unpack_from(sumario, posicao))
+                posicao += _BLOCO.size
+            pilha.pop_all()
+        self._indice = indice
+        return True
+
+    def _le_diretorio_central(self):
+        with ZipFile(self._arquivo_zip) as z:
+            infos = sorted(
+                {i.filename: i for i in z.infolist()}.values(), key=_nome
+            )
+        carregados: dict[int, list[EntradaIndice]] = {}
+        primeiros: list[str] = []
+        for inicio in range(0, len(infos), ENTRADAS_POR_BLOCO):
+            bloco = [
+                EntradaIndice(
+                    i.filename,
+                    i.header_offset,
+                    i.compress_size,
+                    i.file_size,
+                    i.CRC,
+                    i.compress_type,
+                )
+                for i in infos[inicio : inicio + ENTRADAS_POR_BLOCO]
+            ]
+            carregados[len(primeiros)] = bloco
+            primeiros.append(bloco[0].nome)
+        self._carregados = carregados
+        self._primeiros = primeiros
+
+    def _descarta_indice(self):
+        """
+        Passa a ler as entradas do diretório central, quando o índice não
+        corresponde ao zip apesar do tamanho e da data de modificação.
+        """
+        with self._lock:
+            if self._indice is None:
+                return
+            print(
+                f"Índice de {self.caminho_zip} não corresponde ao zip, "
+                + "lendo o diretório central"
+            )
+            self._le_diretorio_central()
+            self._indice.close()
+            self._indice = None
+
+    def _bloco(self, i: int) -> list[EntradaIndice]:
+        if i not in self._carregados:
+            posicao, tamanho = self._blocos[i]
+            self._indice.seek(posicao)
+            dados = self._indice.read(tamanho)
+            entradas: list[EntradaIndice] = []
+            p = 0
+            while p < len(dados):
+                nome, p = _desempacota_nome(dados, p)
+                entradas.append(
+                    EntradaIndice(nome, *_ENTRADA.unpack_from(dados, p))
+                )
+                p += _ENTRADA.size
+            self._carregados[i] = entradas
+        return self._carregados[i]
+
+    def busca(self, nome: str) -> EntradaIndice | None:
+        i = bisect_right(self._primeiros, nome) - 1
+        if i < 0:
+            return None
+        for entrada in self._bloco(i):
+            if entrada.nome == nome:
+                return entrada
+        return None
+
+    def busca_padrao(self, padrao: str) -> Iterator[EntradaIndice]:
+        """
+        Entradas cujo nome casa com o padrão glob, em ordem alfabética.
+        Apenas os blocos que podem conter o prefixo literal do padrão
+        são lidos.
+        """
+        prefixo = _prefixo_literal(padrao)
+        inicio = max(0, bisect_right(self._primeiros, prefixo) - 1)
+        for i in range(inicio, len(self._primeiros)):
+            primeiro = self._primeiros[i]
+            if primeiro > prefixo and not primeiro.startswith(prefixo):
+                return
+            for entrada in self._bloco(i):
+                if entrada.nome.startswith(prefixo) and fnmatchcase(
+                    entrada.nome, padrao
+                ):
+                    yield entrada
+
+    def entradas(self) -> Iterator[EntradaIndice]:
+        for i in range(len(self._primeiros)):
+            yield from self._bloco(i)
+
+    def copia(self, entrada: EntradaIndice, destino: BinaryIO):
+        """
+        Descomprime a entrada em `destino`, em trechos de até CHUNK_SIZE
+        bytes, verificando o CRC e o tamanho. As leituras são
+        posicionais, de modo que várias threads podem copiar entradas do
+        mesmo zip ao mesmo tempo.
+        """
+        arq = _LeituraPosicional(self._arquivo_zip.fileno())
+        lido = read_local_header(arq, entrada.posicao)
+        if lido is None or lido[0].filename != entrada.nome:
+            self._descarta_indice()
+            atual = self.busca(entrada.nome)
+            if atual is not None and atual != entrada:
+                entrada = atual
+                lido = read_local_header(arq, entrada.posicao)
+        if lido is None or lido[0].filename != entrada.nome:
+            raise BadZipFile(
+                f"Entrada {entrada.nome} não encontrada em "
+                + f"{self.caminho_zip} na posição do índice"
+            )
+        arq.seek(lido[1])
+        descompressor = _get_decompressor(entrada.compress_type)
+        restante = entrada.tamanho_comprimido
+        crc = 0
+        tamanho = 0
+        while restante > 0:
+            trecho = arq.read(min(CHUNK_SIZE, restante))
+            if len(trecho) == 0:
+                raise BadZipFile(f"Entrada {entrada.nome} truncada")
+            restante -= len(trecho)
+            for dados in _descomprime(descompressor, trecho):
+                crc = crc32(dados, crc)
+                tamanho += len(dados)
+                destino.write(dados)
+        if descompressor is not None and hasattr(descompressor, "flush"):
+            dados = descompressor.flush()
+            crc = crc32(dados, crc)
+            tamanho += len(dados)
+            destino.write(dados)
+        if crc != entrada.crc or tamanho != entrada.tamanho:
+            raise BadZipFile(f"CRC inválido na entrada {entrada.nome}")
+
+    def extrai(self, entrada: EntradaIndice, diretorio: str = ".") -> str:
+        """
+        Extrai a entrada em `diretorio`, com o arquivo de saída alocado no
+        tamanho final antes da escrita, quando o sistema de arquivos
+        permite.
+        """
+        caminho = caminho_extracao(diretorio, entrada.nome)
+        if entrada.nome.endswith("/"):
+            makedirs(caminho, exist_ok=True)
+            return caminho
+        makedirs(dirname(caminho) or ".", exist_ok=True)
+        try:
+            with open(caminho, "wb") as arq:
+                _prealoca(arq, entrada.tamanho)
+                self.copia(entrada, arq)
+        except BaseException:
+            remove(caminho)
+            raise
+        return caminho
+
+    def close(self):
+        self._arquivo_zip.close()
+        if self._indice is not None:
+            self._indice.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _LeituraPosicional:
+    """
+    Leitura de um descritor com `pread`, sem alterar a posição do arquivo
+    compartilhada entre as threads.
+    """
+
+    def __init__(self, descritor: int):
+        self.descritor = descritor
+        self.posicao = 0
+
+    def seek(self, posicao: int):
+        self.posicao = posicao
+
+    def tell(self) -> int:
+        return self.posicao
+
+    def read(self, n: int) -> bytes:
+        dados = pread(self.descritor, n, self.posicao)
+        self.posicao += len(dados)
+        return dados
+
+
+def _descomprime(descompressor, dados: bytes) -> Iterator[bytes]:
+    # Limita a saída de cada chamada a CHUNK_SIZE bytes, para que um
+    # trecho muito comprimido não seja expandido inteiro em memória
+    if descompressor is None:
+        yield dados
+    elif hasattr(descompressor, "unconsumed_tail"):
+        while len(dados) > 0:
+            yield descompressor.decompress(dados, CHUNK_SIZE)
+            dados = descompressor.unconsumed_tail
+    elif hasattr(descompressor, "needs_input"):
+        yield descompressor.decompress(dados, CHUNK_SIZE)
+        while not descompressor.eof and not descompressor.needs_input:
+            yield descompressor.decompress(b"", CHUNK_SIZE)
+    else:
+        # O descompressor LZMA do zipfile não limita a saída
+        yield descompressor.decompress(dados)
+
+
+def _prealoca(arquivo: BinaryIO, tamanho: int):
+    if tamanho == 0:
+        return
+    try:
+        posix_fallocate(arquivo.fileno(), 0, tamanho)
+    except OSError:
+        # Sistemas de arquivos sem suporte, como alguns NFS
+        pass
+
+
+def caminho_extracao(diretorio: str, nome: str) -> str:
+    # Como no zipfile, nomes absolutos ou com ".." não saem do diretório
+    partes = [p for p in nome.split("/") if p not in ["", ".", ".."]]
+    if len(partes) == 0:
+        raise ValueError(f"Nome de entrada inválido: {nome}")
+    return join(diretorio, *partes)
+
+
+class LeitorZipPartes:
+    """
+    Lê um zip dividido em partes como um único zip lógico, com a mesma
+    interface do `LeitorZip`. A busca por nome consulta apenas a parte
+    dada pela regra do manifesto, e as buscas por padrão combinam as
+    entradas de todas as partes em ordem alfabética.
+    """
+
+    def __init__(self, caminho_manifesto: str):
+        with open(caminho_manifesto, "r") as arq:
+            manifesto = json.load(arq)
+        if manifesto.get("regra") != REGRA_PARTES:
+            raise ValueError(
+                f"Regra de partes não suportada em {caminho_manifesto}"
+            )
+        diretorio = dirname(caminho_manifesto)
+        self.caminho_zip = join(diretorio, manifesto["zip"])
+        self._partes: list[LeitorZip] = []
+        try:
+            for parte in manifesto["partes"]:
+                self._partes.append(LeitorZip(join(diretorio, parte)))
+        except BaseException:
+            self.close()
+            raise
+
+    def _parte(self, nome: str) -> LeitorZip:
+        return self._partes[parte_da_entrada(nome, len(self._partes))]
+
+    def busca(self, nome: str) -> EntradaIndice | None:
+        return self._parte(nome).busca(nome)
+
+    def busca_padrao(self, padrao: str) -> Iterator[EntradaIndice]:
+        return merge(
+            *[p.busca_padrao(padrao) for p in self._partes], key=_nome_entrada
+        )
+
+    def entradas(self) -> Iterator[EntradaIndice]:
+        return merge(*[p.entradas() for p in self._partes], key=_nome_entrada)
+
+    def copia(self, entrada: EntradaIndice, destino: BinaryIO):
+        self._parte(entrada.nome).copia(entrada, destino)
+
+    def extrai(self, entrada: EntradaIndice, diretorio: str = ".") -> str:
+        return self._parte(entrada.nome).extrai(entrada, diretorio)
+
+    def close(self):
+        for parte in self._partes:
+            parte.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _nome_entrada(entrada: EntradaIndice) -> str:
+    return entrada.nome
+
+
+def abre_leitor(caminho: str) -> LeitorZip | LeitorZipPartes:
+    """
+    Abre o zip em `caminho` ou, se é um manifesto ou o nome de um zip
+    dividido em partes, o zip lógico formado pelas partes.
+    """
+    if caminho.endswith(EXTENSAO_MANIFESTO):
+        return LeitorZipPartes(caminho)
+    if not isfile(caminho) and isfile(caminho_manifesto(caminho)):
+        return LeitorZipPartes(caminho_manifesto(caminho))
+    return LeitorZip(caminho)
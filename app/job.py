@@ -0,0 +1,292 @@
+import asyncio
+import sys
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from shutil import copy
+from time import perf_counter
+from typing import NamedTuple
+
+import click
+
+from app.cli import GrupoComandos
+from app.metricas import MetricaEtapa, Metricas
+from app.terminal import run_terminal_stream
+from app.utils import reporta_execucao
+
+ESTADO_SUCESSO = "sucesso"
+ESTADO_FALHA = "falha"
+ESTADO_NAO_EXECUTADA = "não executada"
+
+# Job de cada modelo, carregado apenas quando usado
+JOBS = {
+    "newave": "app.newave.job_newave",
+    "decomp": "app.decomp.job_decomp",
+    "dessem": "app.dessem.job_dessem",
+}
+
+
+class Etapa(NamedTuple):
+    nome: str
+    # Slots de CPU ocupados durante a execução
+    slots: int
+    # Retorna se a etapa foi bem sucedida, podendo preencher as medidas
+    # que conhece na métrica recebida
+    executa: Callable[[MetricaEtapa], Awaitable[bool]]
+    dependencias: tuple[str, ...] = ()
+    # Executa mesmo que alguma dependência tenha falhado
+    mesmo_com_falha: bool = False
+    # Dependências que devem ter sucesso mesmo com `mesmo_com_falha`
+    requer_sucesso: tuple[str, ...] = ()
+
+
+class TempoEtapa(NamedTuple):
+    nome: str
+    estado: str
+    slots: int
+    # Segundos desde o início do job
+    inicio: float | None
+    fim: float | None
+
+    @property
+    def duracao(self) -> float | None:
+        if self.inicio is None or self.fim is None:
+            return None
+        return self.fim - self.inicio
+
+
+class OrcamentoSlots:
+    """
+    Slots de CPU compartilhados pelas etapas do job. Uma etapa só inicia
+    quando os slots que pede estão livres.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.livres = total
+        self._condicao = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserva(self, n: int):
+        n = min(n, self.total)
+        async with self._condicao:
+            await self._condicao.wait_for(lambda: self.livres >= n)
+            self.livres -= n
+        try:
+            yield
+        finally:
+            async with self._condicao:
+                self.livres += n
+                self._condicao.notify_all()
+
+
+def _verifica_grafo(etapas: list[Etapa]):
+    nomes = [e.nome for e in etapas]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError("Etapas com nomes repetidos no job")
+    pendentes = {e.nome: set(e.dependencias) for e in etapas}
+    for e in etapas:
+        for d in e.dependencias:
+            if d not in pendentes:
+                raise ValueError(
+                    f"Dependência {d} da etapa {e.nome} inexistente"
+                )
+        for d in e.requer_sucesso:
+            if d not in e.dependencias:
+                raise ValueError(
+                    f"Etapa {e.nome} requer o sucesso de {d}, que não é "
+                    + "sua dependência"
+                )
+    while len(pendentes) > 0:
+        prontas = [n for n, deps in pendentes.items() if len(deps) == 0]
+        if len(prontas) == 0:
+            raise ValueError(f"Dependência circular entre {list(pendentes)}")
+        for n in prontas:
+            pendentes.pop(n)
+        for deps in pendentes.values():
+            deps.difference_update(prontas)
+
+
+async def executa_etapas(
+    etapas: list[Etapa], slots: int, metricas: Metricas | None = None
+) -> list[TempoEtapa]:
+    """
+    Executa as etapas do job assim que as suas dependências terminam,
+    com ramos independentes ao mesmo tempo, desde que os slots pedidos
+    pelas etapas em execução caibam em `slots`. Retorna o tempo de cada
+    etapa, na ordem em que foram declaradas, e as registra em `metricas`.
+    """
+    _verifica_grafo(etapas)
+    orcamento = OrcamentoSlots(max(1, slots))
+    tempos: dict[str, TempoEtapa] = {}
+    tarefas: dict[str, asyncio.Task] = {}
+    t0 = perf_counter()
+
+    async def executa(etapa: Etapa) -> bool:
+        sucessos = {d: await tarefas[d] for d in etapa.dependencias}
+        exigidas = etapa.requer_sucesso if etapa.mesmo_com_falha else sucessos
+        if not all(sucessos[d] for d in exigidas):
+            print(f"Etapa {etapa.nome} não executada: dependência com falha")
+            tempos[etapa.nome] = TempoEtapa(
+                etapa.nome, ESTADO_NAO_EXECUTADA, etapa.slots, None, None
+            )
+            if metricas is not None:
+                metrica = MetricaEtapa(etapa.nome)
+                metrica.estado = ESTADO_NAO_EXECUTADA
+                metricas.registra(metrica)
+            return False
+        metrica = MetricaEtapa(etapa.nome)
+        metrica.workers = etapa.slots
+        async with orcamento.reserva(etapa.slots):
+            print(f"Iniciando etapa {etapa.nome}")
+            inicio = perf_counter() - t0
+            try:
+                sucesso = await etapa.executa(metrica)
+            except Exception as e:  # noqa: BLE001
+                print(f"Erro na etapa {etapa.nome}: {e}")
+                sucesso = False
+            fim = perf_counter() - t0
+        print(f"Etapa {etapa.nome} concluída em {fim - inicio:.2f} segundos")
+        tempos[etapa.nome] = TempoEtapa(
+            etapa.nome,
+            ESTADO_SUCESSO if sucesso else ESTADO_FALHA,
+            etapa.slots,
+            inicio,
+            fim,
+        )
+        if metricas is not None:
+            metrica.tempo = fim - inicio
+            metrica.estado = tempos[etapa.nome].estado
+            metricas.registra(metrica)
+        return sucesso
+
+    for etapa in etapas:
+        tarefas[etapa.nome] = asyncio.create_task(executa(etapa))
+    await asyncio.gather(*tarefas.values())
+    return [tempos[e.nome] for e in etapas]
+
+
+def etapa_externa(
+    nome: str,
+    cmds: list[str],
+    slots: int = 1,
+    dependencias: list[str] | None = None,
+    mesmo_com_falha: bool = False,
+    requer_sucesso: list[str] | None = None,
+) -> Etapa:
+    """
+    Etapa que executa um programa, com as saídas identificadas pelo nome
+    da etapa.
+    """
+
+    async def executa(metrica: MetricaEtapa) -> bool:
+        prefixo = f"[{nome}] "
+        resultado = await run_terminal_stream(cmds, prefix=prefixo)
+        reporta_execucao(cmds, resultado, prefixo)
+        metrica.cpu = resultado.cpu_time
+        metrica.pico_rss = resultado.peak_rss
+        return resultado.returncode == 0
+
+    return Etapa(
+        nome,
+        slots,
+        executa,
+        tuple(dependencias or ()),
+        mesmo_com_falha,
+        tuple(requer_sucesso or ()),
+    )
+
+
+def _executa_comando(comando: click.Command, args: list[str]) -> bool:
+    try:
+        comando.main(args, standalone_mode=False)
+    except SystemExit as e:
+        return e.code in [0, None]
+    return True
+
+
+def etapa_comando(
+    nome: str,
+    comando: click.Command,
+    args: list[str],
+    slots: int = 1,
+    dependencias: list[str] | None = None,
+    mesmo_com_falha: bool = False,
+    requer_sucesso: list[str] | None = None,
+) -> Etapa:
+    """
+    Etapa que executa um comando deste pacote no próprio processo, em uma
+    thread, sem iniciar um novo interpretador.
+    """
+
+    async def executa(metrica: MetricaEtapa) -> bool:
+        return await asyncio.to_thread(_executa_comando, comando, args)
+
+    return Etapa(
+        nome,
+        slots,
+        executa,
+        tuple(dependencias or ()),
+        mesmo_com_falha,
+        tuple(requer_sucesso or ()),
+    )
+
+
+def etapa_licencas(licencas: list[str]) -> Etapa:
+    def copia():
+        for licenca in licencas:
+            copy(licenca, ".")
+
+    async def executa(metrica: MetricaEtapa) -> bool:
+        await asyncio.to_thread(copia)
+        return True
+
+    return Etapa("licenca", 1, executa)
+
+
+def comando_modelo(
+    executavel: str, numero_processadores: int, mpiexec: str | None
+) -> list[str]:
+    if not mpiexec or numero_processadores == 1:
+        return [executavel]
+    return [mpiexec, "-np", str(numero_processadores), executavel]
+
+
+def _reporta_tempos(tempos: list[TempoEtapa]):
+    print(
+        f"{'Etapa':<24}{'Slots':>6}{'Início':>10}{'Fim':>10}"
+        + f"{'Duração':>10}  Estado"
+    )
+    for t in tempos:
+        if t.inicio is None or t.fim is None:
+            print(
+                f"{t.nome:<24}{t.slots:>6}{'-':>10}{'-':>10}{'-':>10}"
+                + f"  {t.estado}"
+            )
+            continue
+        print(
+            f"{t.nome:<24}{t.slots:>6}{t.inicio:>9.1f}s{t.fim:>9.1f}s"
+            + f"{t.duracao:>9.1f}s  {t.estado}"
+        )
+
+
+def executa_grafo(etapas: list[Etapa], slots: int) -> list[TempoEtapa]:
+    """
+    Executa as etapas do job, reporta o tempo de cada uma, registrando-o
+    nas métricas do caso, e encerra com erro se alguma não foi bem
+    sucedida.
+    """
+    metricas = Metricas("executa_job")
+    tempos = asyncio.run(executa_etapas(etapas, slots, metricas))
+    _reporta_tempos(tempos)
+    metricas.salva()
+    if any(t.estado != ESTADO_SUCESSO for t in tempos):
+        sys.exit(1)
+    return tempos
+
+
+@click.group("executa_job", cls=GrupoComandos, comandos=JOBS)
+def executa_job():
+    """
+    Executa as etapas do job de um modelo como um grafo de dependências,
+    com etapas independentes ao mesmo tempo.
+    """
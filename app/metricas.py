@@ -0,0 +1,182 @@
+import json
+import resource
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from os import remove, replace
+from os.path import getsize, isfile, join
+from pathlib import Path
+from tempfile import mkstemp
+from threading import Lock
+from time import perf_counter
+from zipfile import ZipFile
+
+# Escrito no diretório do caso, com o nome do diretório
+ARQUIVO_METRICAS = "metricas_{caso}.json"
+
+# Comandos executados em threads pelo executa_job salvam no mesmo arquivo
+_lock_arquivo = Lock()
+
+
+def cpu_processo() -> float:
+    """
+    Tempo de CPU, em segundos, do processo e dos filhos já encerrados.
+    """
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime
+    )
+
+
+def pico_rss_processo() -> int:
+    """
+    Pico de memória residente, em bytes, do processo ou de um dos filhos
+    já encerrados.
+    """
+    return 1024 * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class MetricaEtapa:
+    """
+    Medidas de uma etapa. Os campos que não se aplicam à etapa ficam
+    como `None`.
+    """
+
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+        self.tempo: float | None = None
+        self.cpu: float | None = None
+        self.arquivos: int | None = None
+        self.bytes_entrada: int | None = None
+        self.bytes_saida: int | None = None
+        self.workers: int | None = None
+        self.pico_rss: int | None = None
+        self.estado: str | None = None
+
+    @property
+    def razao(self) -> float | None:
+        if not self.bytes_entrada or self.bytes_saida is None:
+            return None
+        return self.bytes_saida / self.bytes_entrada
+
+    @property
+    def utilizacao(self) -> float | None:
+        # Fração do tempo de parede em que os workers ocuparam a CPU
+        if not self.workers or not self.tempo or self.cpu is None:
+            return None
+        return self.cpu / (self.tempo * self.workers)
+
+    def mede_zip(self, caminho_zip: str):
+        """
+        Soma às medidas o número de arquivos e os tamanhos, original e
+        comprimido, das entradas de um zip.
+        """
+        with ZipFile(caminho_zip) as z:
+            infos = z.infolist()
+        self.arquivos = (self.arquivos or 0) + len(infos)
+        self.bytes_entrada = (self.bytes_entrada or 0) + sum(
+            i.file_size for i in infos
+        )
+        self.bytes_saida = (self.bytes_saida or 0) + getsize(caminho_zip)
+
+    def como_dict(self) -> dict:
+        return {
+            "etapa": self.etapa,
+            "tempo_s": self.tempo,
+            "cpu_s": self.cpu,
+            "arquivos": self.arquivos,
+            "bytes_entrada": self.bytes_entrada,
+            "bytes_saida": self.bytes_saida,
+            "razao": self.razao,
+            "workers": self.workers,
+            "utilizacao_workers": self.utilizacao,
+            "pico_rss_mb": (
+                self.pico_rss / (1 << 20) if self.pico_rss is not None else None
+            ),
+            "estado": self.estado,
+        }
+
+
+class Metricas:
+    """
+    Métricas das etapas de um comando, salvas em `metricas_<caso>.json`
+    no diretório do caso. Cada comando substitui, no arquivo, apenas as
+    suas próprias etapas, de modo que as métricas de todas as etapas do
+    job se acumulam no mesmo arquivo.
+    """
+
+    def __init__(self, comando: str, diretorio: str = "."):
+        self.comando = comando
+        self.diretorio = diretorio
+        self.etapas: list[MetricaEtapa] = []
+        self._lock = Lock()
+
+    @contextmanager
+    def etapa(
+        self, nome: str, workers: int | None = None
+    ) -> Iterator[MetricaEtapa]:
+        """
+        Mede o tempo de parede e de CPU do processo durante o bloco, e o
+        pico de memória do processo ao seu final.
+        """
+        metrica = MetricaEtapa(nome)
+        metrica.workers = workers
+        ti = perf_counter()
+        cpu = cpu_processo()
+        try:
+            yield metrica
+        finally:
+            metrica.tempo = perf_counter() - ti
+            metrica.cpu = cpu_processo() - cpu
+            metrica.pico_rss = pico_rss_processo()
+            self.registra(metrica)
+
+    def registra(self, metrica: MetricaEtapa):
+        with self._lock:
+            self.etapas.append(metrica)
+
+    def caminho(self) -> str:
+        caso = Path(self.diretorio).resolve().parts[-1]
+        return join(self.diretorio, ARQUIVO_METRICAS.format(caso=caso))
+
+    def salva(self):
+        caminho = self.caminho()
+        with self._lock:
+            etapas = [
+                dict(comando=self.comando, **e.como_dict()) for e in self.etapas
+            ]
+        nomes = {e["etapa"] for e in etapas}
+        with _lock_arquivo:
+            anteriores: list[dict] = []
+            if isfile(caminho):
+                try:
+                    with open(caminho, "r") as arq:
+                        anteriores = json.load(arq)["etapas"]
+                except (ValueError, KeyError):
+                    anteriores = []
+            anteriores = [
+                e
+                for e in anteriores
+                if e.get("comando") != self.comando
+                or e.get("etapa") not in nomes
+            ]
+            descritor, temporario = mkstemp(dir=self.diretorio, suffix=".tmp")
+            try:
+                with open(descritor, "w") as arq:
+                    json.dump(
+                        {
+                            "caso": Path(self.diretorio).resolve().parts[-1],
+                            "atualizado": datetime.now().isoformat(),
+                            "etapas": anteriores + etapas,
+                        },
+                        arq,
+                        indent=4,
+                    )
+                replace(temporario, caminho)
+            except BaseException:
+                remove(temporario)
+                raise
@@ -0,0 +1,30 @@
+from typing import TYPE_CHECKING
+
+from app.contexto_deck import ContextoDeck
+
+# A inewave só é importada ao ler um arquivo, para não atrasar o início
+# dos comandos que não leem o deck
+if TYPE_CHECKING:
+    from inewave.newave.arquivos import Arquivos
+    from inewave.newave.caso import Caso
+    from inewave.newave.dger import Dger
+
+
+class ContextoNewave(ContextoDeck):
+    @property
+    def caso(self) -> "Caso":
+        from inewave.newave.caso import Caso
+
+        return self.le(Caso, "caso.dat")
+
+    @property
+    def arquivos(self) -> "Arquivos":
+        from inewave.newave.arquivos import Arquivos
+
+        return self.le(Arquivos, self.caso.arquivos)
+
+    @property
+    def dger(self) -> "Dger":
+        from inewave.newave.dger import Dger
+
+        return self.le(Dger, self.arquivos.dger)
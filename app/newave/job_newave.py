@@ -0,0 +1,143 @@
+import shlex
+
+import click
+
+from app.job import (
+    comando_modelo,
+    etapa_comando,
+    etapa_externa,
+    etapa_licencas,
+    executa_grafo,
+)
+from app.newave.pos_processa_newave import pos_processa_newave
+from app.newave.programas_auxiliares_newave import programas_auxiliares_newave
+
+
+@click.command("newave")
+@click.argument("numero_processadores", type=int)
+@click.option("--executavel", required=True, help="Executável do NEWAVE")
+@click.option("--nwlistcf", required=True, help="Executável do NWLISTCF")
+@click.option("--nwlistop", required=True, help="Executável do NWLISTOP")
+@click.option(
+    "--conversor",
+    default=None,
+    help="Conversor de nomes de arquivos, executado antes do modelo",
+)
+@click.option(
+    "--licenca",
+    multiple=True,
+    help="Arquivo de licença copiado para o caso (pode ser repetido)",
+)
+@click.option("--mpiexec", default="mpiexec", help="Lançador MPI do modelo")
+@click.option(
+    "--sintetizador",
+    default="sintetizador-newave completa",
+    help="Comando do sintetizador",
+)
+@click.option(
+    "--args-sintetizador",
+    default="",
+    help="Argumentos adicionais do sintetizador",
+)
+@click.option(
+    "--plotador",
+    default="plotador report",
+    help="Comando do plotador (vazio para não executar)",
+)
+@click.option(
+    "--args-posproc",
+    default="",
+    help="Argumentos adicionais do pos_processa_newave",
+)
+@click.option(
+    "--slots",
+    type=int,
+    default=None,
+    help="Slots de CPU compartilhados pelas etapas (padrão: número de "
+    + "processadores mais um, para as etapas leves que acompanham o modelo)",
+)
+def newave(
+    numero_processadores,
+    executavel,
+    nwlistcf,
+    nwlistop,
+    conversor,
+    licenca,
+    mpiexec,
+    sintetizador,
+    args_sintetizador,
+    plotador,
+    args_posproc,
+    slots,
+):
+    """
+    Executa o job do NEWAVE: conversão de nomes, modelo, programas
+    auxiliares, sintetizador, plotador e pós-processamento. O deck é
+    zipado enquanto o modelo executa. Como no job script, cada etapa é
+    executada mesmo que as anteriores tenham falhado.
+    """
+    n = numero_processadores
+    args_posproc = [str(n)] + shlex.split(args_posproc)
+    preparo = ["licenca"]
+    etapas = [etapa_licencas(list(licenca))]
+    if conversor is not None:
+        etapas.append(etapa_externa("conversor", [conversor]))
+        preparo.append("conversor")
+    etapas += [
+        etapa_comando(
+            "deck",
+            pos_processa_newave,
+            args_posproc + ["--apenas-deck"],
+            dependencias=preparo[1:],
+            mesmo_com_falha=True,
+        ),
+        etapa_externa(
+            "newave",
+            comando_modelo(executavel, n, mpiexec),
+            n,
+            preparo,
+            mesmo_com_falha=True,
+        ),
+        etapa_comando(
+            "programas_auxiliares",
+            programas_auxiliares_newave,
+            [nwlistcf, nwlistop, "--numero-processadores", str(n)],
+            n,
+            ["newave"],
+            mesmo_com_falha=True,
+        ),
+        etapa_externa(
+            "sintetizador",
+            shlex.split(sintetizador)
+            + shlex.split(args_sintetizador)
+            + ["--processadores", str(n)],
+            n,
+            ["programas_auxiliares"],
+            mesmo_com_falha=True,
+        ),
+    ]
+    # O plotador lê as saídas do caso, que o pós-processamento move e
+    # apaga, e por isso termina antes dele
+    plotagem = []
+    if len(plotador) > 0:
+        etapas.append(
+            etapa_externa(
+                "plotador",
+                shlex.split(plotador),
+                1,
+                ["sintetizador"],
+                mesmo_com_falha=True,
+            )
+        )
+        plotagem.append("plotador")
+    etapas.append(
+        etapa_comando(
+            "pos_processamento",
+            pos_processa_newave,
+            args_posproc + ["--sem-deck"],
+            n,
+            ["sintetizador", "deck"] + plotagem,
+            mesmo_com_falha=True,
+        )
+    )
+    executa_grafo(etapas, slots if slots is not None else n + 1)
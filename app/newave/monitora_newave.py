@@ -0,0 +1,108 @@
+from os import kill
+from time import sleep, time
+
+import click
+
+from app.diario_compressao import DiarioCompressao
+from app.indice_diretorio import ArquivosEstaveis, IndiceDiretorio
+from app.newave.contexto_newave import ContextoNewave
+from app.newave.pos_processa_newave import (
+    classifica_saidas,
+    identifica_arquivos_entrada,
+)
+from app.politica_compressao import carrega_politica
+from app.utils import zip_categorias_paralelo
+
+
+def _processo_ativo(pid: int) -> bool:
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@click.command("monitora")
+@click.argument("numero_processadores", type=int)
+@click.option(
+    "--intervalo",
+    type=float,
+    default=30.0,
+    help="Segundos entre as varreduras do diretório do caso",
+)
+@click.option(
+    "--estabilidade",
+    type=float,
+    default=120.0,
+    help="Segundos sem alteração de tamanho e data de modificação para "
+    + "que um arquivo seja considerado final",
+)
+@click.option(
+    "--pid",
+    type=int,
+    default=None,
+    help="Processo que produz as saídas. Ao seu término, todos os "
+    + "arquivos são considerados finais e o monitoramento é encerrado",
+)
+@click.option(
+    "--politica-compressao",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Arquivo JSON com codec e nível por categoria e padrão de nome",
+)
+@click.option(
+    "--sonda-compressao",
+    is_flag=True,
+    help="Armazena sem compressão arquivos que comprimem mal em amostras",
+)
+def monitora(
+    numero_processadores,
+    intervalo,
+    estabilidade,
+    pid,
+    politica_compressao,
+    sonda_compressao,
+):
+    """
+    Zipa as saídas do NEWAVE à medida que se tornam finais, enquanto o
+    modelo e os programas auxiliares ainda executam. As entradas zipadas
+    são registradas no diário da retomada, de modo que o
+    `pos_processa_newave --retomada` zipa apenas os arquivos restantes.
+    Os arquivos não são apagados, pois podem ser lidos pelas etapas
+    seguintes.
+    """
+    politica = carrega_politica(politica_compressao, sonda_compressao)
+    contexto = ContextoNewave()
+    arquivos_entrada = identifica_arquivos_entrada(contexto)
+    diario = DiarioCompressao()
+    estaveis = ArquivosEstaveis(estabilidade)
+
+    while True:
+        encerrado = pid is not None and not _processo_ativo(pid)
+        indice = IndiceDiretorio()
+        categorias = classifica_saidas(contexto, arquivos_entrada, indice)
+        categorias.pop("apagar")
+        finais = estaveis.finais(indice, time(), encerrado)
+        novos = {
+            c: [a for a in lista if a in finais]
+            for c, lista in categorias.items()
+        }
+        novos = {c: lista for c, lista in novos.items() if len(lista) > 0}
+        if len(novos) > 0:
+            print(
+                f"Zipando {sum(len(a) for a in novos.values())} "
+                + "arquivos finalizados"
+            )
+            zip_categorias_paralelo(
+                novos,
+                numero_processadores,
+                politica=politica,
+                diario=diario,
+            )
+            estaveis.consome(finais, indice)
+        if encerrado:
+            print("Processo produtor encerrado. Monitoramento concluído.")
+            break
+        sleep(intervalo)
@@ -1,125 +1,100 @@
-from os import listdir
+from os.path import isfile
 from time import time
 
 import click
-import pandas as pd  # type: ignore
-from inewave.newave.arquivos import Arquivos
-from inewave.newave.caso import Caso
 
+from app.indice_diretorio import ClassificadorArquivos, IndiceDiretorio
+from app.metricas import Metricas
+from app.newave.contexto_newave import ContextoNewave
+from app.opcoes_compressao import opcoes_compressao
 from app.utils import (
-    identifica_arquivos_via_regex,
+    BACKEND_THREAD,
+    BACKENDS_COMPRESSAO,
+    LIMITE_ARQUIVOS_PEQUENOS,
+    LIMITE_DEFLATE_PARALELO,
+    le_arquivos_indice,
     limpa_arquivos_saida,
     traz_conteudo_para_raiz,
     zip_arquivos,
-    zip_arquivos_paralelo,
+    zip_categorias_paralelo,
 )
 
 
-@click.command("pos_processa_newave")
-@click.argument("numero_processadores", type=int)
-@click.option("-ppq", is_flag=True)
-def pos_processa_newave(numero_processadores, ppq):
-    caso = Caso.read("./caso.dat")
-    arquivos = Arquivos.read("./" + caso.arquivos)
-
-    def identifica_arquivos_entrada() -> list[str]:
-        caso = Caso.read("./caso.dat")
-        arquivos = Arquivos.read("./" + caso.arquivos)
-        arquivos_gerais = [
-            "caso.dat",
-            caso.arquivos,
-            arquivos.adterm,
-            arquivos.agrint,
-            arquivos.c_adic,
-            arquivos.cvar,
-            arquivos.sar,
-            arquivos.clast,
-            arquivos.confhd,
-            arquivos.conft,
-            arquivos.curva,
-            arquivos.dger,
-            arquivos.dsvagua,
-            arquivos.vazpast,
-            arquivos.exph,
-            arquivos.expt,
-            arquivos.ghmin,
-            arquivos.gtminpat,
-            "hidr.dat",
-            arquivos.perda,
-            arquivos.manutt,
-            arquivos.modif,
-            arquivos.patamar,
-            arquivos.penalid,
-            "postos.dat",
-            arquivos.shist,
-            arquivos.sistema,
-            arquivos.term,
-            "vazoes.dat",
-            arquivos.tecno,
-            "selcor.dat",
-            arquivos.re,
-            arquivos.ree,
-            arquivos.clasgas,
-            arquivos.abertura,
-            arquivos.gee,
-            "dbgcortes.dat",
-            "volref_saz.dat",
-            arquivos.cortesh_pos_estudo,
-            arquivos.cortes_pos_estudo,
-        ]
-        arquivo_indice = ["indices.csv"] if "indices.csv" in listdir() else []
-        arquivos_libs = (
-            pd.read_csv(
-                arquivo_indice[0], delimiter=";", comment="&", header=None
-            )[2]
-            .unique()
-            .tolist()
-            if len(arquivo_indice) == 1
-            else []
-        )
-
-        arquivos_entrada = (
-            arquivos_gerais
-            + arquivo_indice
-            + [a.strip() for a in arquivos_libs]
-        )
-        arquivos_entrada = [a for a in arquivos_entrada if a is not None]
-
-        return arquivos_entrada
-
-    if ppq:
-        print(
-            "Rodada de Pseudo Partida Quente (PPQ)."
-            + " Pós-processamento do NEWAVE cancelado."
-        )
-        exit(0)
+def identifica_arquivos_entrada(contexto: ContextoNewave) -> list[str]:
+    caso = contexto.caso
+    arquivos = contexto.arquivos
+    arquivos_gerais = [
+        "caso.dat",
+        caso.arquivos,
+        arquivos.adterm,
+        arquivos.agrint,
+        arquivos.c_adic,
+        arquivos.cvar,
+        arquivos.sar,
+        arquivos.clast,
+        arquivos.confhd,
+        arquivos.conft,
+        arquivos.curva,
+        arquivos.dger,
+        arquivos.dsvagua,
+        arquivos.vazpast,
+        arquivos.exph,
+        arquivos.expt,
+        arquivos.ghmin,
+        arquivos.gtminpat,
+        "hidr.dat",
+        arquivos.perda,
+        arquivos.manutt,
+        arquivos.modif,
+        arquivos.patamar,
+        arquivos.penalid,
+        "postos.dat",
+        arquivos.shist,
+        arquivos.sistema,
+        arquivos.term,
+        "vazoes.dat",
+        arquivos.tecno,
+        "selcor.dat",
+        arquivos.re,
+        arquivos.ree,
+        arquivos.clasgas,
+        arquivos.abertura,
+        arquivos.gee,
+        "dbgcortes.dat",
+        "volref_saz.dat",
+        arquivos.cortesh_pos_estudo,
+        arquivos.cortes_pos_estudo,
+    ]
+    arquivo_indice = ["indices.csv"] if isfile("indices.csv") else []
+    arquivos_libs = (
+        le_arquivos_indice(arquivo_indice[0])
+        if len(arquivo_indice) == 1
+        else []
+    )
 
-    ti = time()
+    arquivos_entrada = arquivos_gerais + arquivo_indice + arquivos_libs
+    arquivos_entrada = [a for a in arquivos_entrada if a is not None]
 
-    # Zipar deck de entrada
-    arquivos_entrada = identifica_arquivos_entrada()
-    zip_arquivos(arquivos_entrada, "deck")
+    return arquivos_entrada
 
-    # Traz arquivos LIBS e de outros diretorios para a raiz
-    for d in ["out", "evaporacao", "fpha", "log"]:
-        traz_conteudo_para_raiz(d)
 
-    # Zipar csvs de saida com resultados da operação
+def classifica_saidas(
+    contexto: ContextoNewave,
+    arquivos_entrada: list[str],
+    indice: IndiceDiretorio,
+) -> dict[str, list[str]]:
+    """
+    Classifica as saídas do NEWAVE nas categorias dos zips, além dos
+    arquivos temporários em `apagar`.
+    """
+    arquivos = contexto.arquivos
+    # Identifica csvs de saida com resultados da operação
     regex_arquivos_saida_nwlistop = [
         r"^.*\.CSV$",
         r"^.*\.out$",
     ]
-    arquivos_saida_nwlistop = ["nwlistop.dat"]
-    arquivos_saida_nwlistop += identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_saida_nwlistop
-    )
-    zip_arquivos_paralelo(
-        arquivos_saida_nwlistop,
-        "operacao",
-        numero_processadores,
-    )
 
-    # Zipar demais relatorios de saída
+    # Identifica demais relatorios de saída
     arquivos_saida_relatorios = [
         arquivos.pmo,
         arquivos.parp,
@@ -158,14 +133,8 @@ def pos_processa_newave(numero_processadores, ppq):
         r"^newave_.*\.log$",
         r"^nwv_.*\.rel$",
     ]
-    arquivos_saida_relatorios += identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_saida_relatorios
-    )
-    zip_arquivos_paralelo(
-        arquivos_saida_relatorios, "relatorios", numero_processadores
-    )
 
-    # Zipar recursos
+    # Identifica recursos
     regex_arquivos_saida_recursos = [
         r"^energiaf.*\.dat$",
         r"^energiaaf.*\.dat$",
@@ -218,36 +187,22 @@ def pos_processa_newave(numero_processadores, ppq):
         r"^eolp.*\.csv$",
         r"^eols.*\.csv$",
     ]
-    arquivos_saida_recursos = identifica_arquivos_via_regex(
-        arquivos_entrada, regex_arquivos_saida_recursos
-    )
-    zip_arquivos_paralelo(
-        arquivos_saida_recursos, "recursos", numero_processadores
-    )
 
-    # Zipar cortes e cabeçalhos
+    # Identifica cortes e cabeçalhos
     arquivos_saida_cortes = [
         arquivos.cortesh,
         arquivos.cortes,
         "arquivos-nwlistcf.dat",
         "nwlistcf.rel",
     ]
-    arquivos_saida_cortes += identifica_arquivos_via_regex(
-        arquivos_entrada, [r"^cortes\-[0-9]*.*\.dat$"]
-    )
     arquivos_saida_cortes = [a for a in arquivos_saida_cortes if a is not None]
-    zip_arquivos_paralelo(arquivos_saida_cortes, "cortes", numero_processadores)
+    regex_arquivos_saida_cortes = [r"^cortes\-[0-9]*.*\.dat$"]
 
-    # Zipar estados de construção dos cortes
+    # Identifica estados de construção dos cortes
     arquivos_saida_estados = ["cortese.dat", "estados.rel"]
-    arquivos_saida_estados += identifica_arquivos_via_regex(
-        arquivos_entrada, [r"^cortese\-[0-9]*.*\.dat$"]
-    )
-    zip_arquivos_paralelo(
-        arquivos_saida_estados, "estados", numero_processadores
-    )
+    regex_arquivos_saida_estados = [r"^cortese\-[0-9]*.*\.dat$"]
 
-    # Zipar arquivos de simulação
+    # Identifica arquivos de simulação
     arquivos_saida_simulacao = [
         arquivos.forward,
         arquivos.forwardh,
@@ -260,36 +215,149 @@ def pos_processa_newave(numero_processadores, ppq):
     arquivos_saida_simulacao = [
         a for a in arquivos_saida_simulacao if a is not None
     ]
-    zip_arquivos_paralelo(
-        arquivos_saida_simulacao, "simulacao", numero_processadores
+
+    # Arquivos temporários, apagados mesmo que não tenham sido zipados
+    arquivos_apagar_regex = [
+        r"^svc.*$",
+    ]
+
+    # Classifica os arquivos do diretório em uma única passada, na primeira
+    # categoria cujas regex casam com o nome
+    classificados = ClassificadorArquivos(
+        {
+            "operacao": regex_arquivos_saida_nwlistop,
+            "relatorios": regex_arquivos_saida_relatorios,
+            "recursos": regex_arquivos_saida_recursos,
+            "cortes": regex_arquivos_saida_cortes,
+            "estados": regex_arquivos_saida_estados,
+            "apagar": arquivos_apagar_regex,
+        }
+    ).classifica(indice, arquivos_entrada)
+    arquivos_saida_nwlistop = ["nwlistop.dat"] + classificados["operacao"]
+    arquivos_saida_relatorios += classificados["relatorios"]
+    arquivos_saida_recursos = classificados["recursos"]
+    arquivos_saida_cortes += classificados["cortes"]
+    arquivos_saida_estados += classificados["estados"]
+
+    return {
+        "operacao": arquivos_saida_nwlistop,
+        "relatorios": arquivos_saida_relatorios,
+        "recursos": arquivos_saida_recursos,
+        "cortes": arquivos_saida_cortes,
+        "estados": arquivos_saida_estados,
+        "simulacao": arquivos_saida_simulacao,
+        "apagar": classificados["apagar"],
+    }
+
+
+@click.command("pos_processa_newave")
+@click.argument("numero_processadores", type=int)
+@click.option("-ppq", is_flag=True)
+@click.option(
+    "--limite-arquivos-pequenos",
+    type=int,
+    default=LIMITE_ARQUIVOS_PEQUENOS,
+    help="Tamanho (bytes) abaixo do qual os arquivos são zipados em lotes",
+)
+@click.option(
+    "--limite-deflate-paralelo",
+    type=int,
+    default=LIMITE_DEFLATE_PARALELO,
+    help="Tamanho (bytes) a partir do qual um arquivo é comprimido em "
+    + "blocos por todos os processadores",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS_COMPRESSAO),
+    default=BACKEND_THREAD,
+    help="Executa a compressão em threads ou em processos filhos",
+)
+@opcoes_compressao
+def pos_processa_newave(
+    numero_processadores,
+    ppq,
+    limite_arquivos_pequenos,
+    limite_deflate_paralelo,
+    backend,
+    compressao,
+):
+    contexto = ContextoNewave()
+    arquivos = contexto.arquivos
+
+    if ppq:
+        print(
+            "Rodada de Pseudo Partida Quente (PPQ)."
+            + " Pós-processamento do NEWAVE cancelado."
+        )
+        exit(0)
+
+    ti = time()
+    metricas = Metricas("pos_processa_newave")
+
+    # Zipar deck de entrada
+    arquivos_entrada = identifica_arquivos_entrada(contexto)
+    if not compressao.sem_deck:
+        with metricas.etapa("deck") as metrica:
+            metrica.mede_zip(
+                zip_arquivos(
+                    arquivos_entrada,
+                    "deck",
+                    compressao.politica,
+                    compressao.cache,
+                )
+            )
+    if compressao.apenas_deck:
+        metricas.salva()
+        return
+
+    # Traz arquivos LIBS e de outros diretorios para a raiz
+    with metricas.etapa("traz_para_raiz"):
+        for d in ["out", "evaporacao", "fpha", "log"]:
+            traz_conteudo_para_raiz(d)
+
+    # Classifica as saídas nas categorias dos zips, em uma única passada
+    categorias = classifica_saidas(
+        contexto, arquivos_entrada, IndiceDiretorio()
     )
+    arquivos_apagar = categorias.pop("apagar")
 
-    # Apagar arquivos para limpar diretório pós execução com sucesso
-    arquivos_manter = arquivos_entrada + [
+    # Arquivos a apagar para limpar diretório pós execução com sucesso
+    arquivos_manter = set(arquivos_entrada) | {
         "newave.tim",
         arquivos.pmo,
         arquivos.dados_simulacao_final,
+    }
+    arquivos_zipados = arquivos_entrada + [
+        a for c in categorias.values() for a in c
     ]
-    arquivos_manter = [a for a in arquivos_manter if a is not None]
-    arquivos_zipados = (
-        arquivos_entrada
-        + arquivos_saida_nwlistop
-        + arquivos_saida_relatorios
-        + arquivos_saida_recursos
-        + arquivos_saida_cortes
-        + arquivos_saida_estados
-        + arquivos_saida_simulacao
-    )
     arquivos_limpar = [a for a in arquivos_zipados if a not in arquivos_manter]
-    limpa_arquivos_saida(arquivos_limpar)
+
+    # Zipar as saídas em um único pool, removendo os arquivos de cada zip
+    # assim que todos os zips que os contêm são concluídos
+    diario = compressao.diario()
+    with (
+        compressao.rastreador() as rastreador,
+        metricas.etapa("saidas", numero_processadores),
+    ):
+        zip_categorias_paralelo(
+            categorias,
+            numero_processadores,
+            limite_arquivos_pequenos,
+            limite_deflate_paralelo,
+            backend,
+            arquivos_limpar,
+            compressao.politica,
+            compressao.remocao_incremental,
+            compressao.max_memoria,
+            compressao.ordem_deterministica,
+            diario,
+            metricas,
+            rastreador,
+            compressao.partes,
+        )
 
     # Apagar arquivos temporários para limpar diretório pós execução
-    arquivos_apagar_regex = [
-        r"^svc.*$",
-    ]
-    arquivos_apagar = identifica_arquivos_via_regex(
-        arquivos_entrada, arquivos_apagar_regex
-    ) + [
+    arquivos_apagar += [
         "nwlistcf.dat",
         "nwlistop.dat",
         "format.tmp",
@@ -299,7 +367,12 @@ def pos_processa_newave(numero_processadores, ppq):
         "ETAPA.TMP",
         "LEITURA.TMP",
     ]
-    limpa_arquivos_saida(arquivos_apagar)
+    with metricas.etapa("limpeza") as metrica:
+        metrica.arquivos = len(arquivos_apagar)
+        limpa_arquivos_saida(arquivos_apagar)
+    if diario is not None:
+        diario.remove()
 
     tf = time()
     print(f"Pós-processamento do NEWAVE feito em {tf - ti:.2f} segundos!")
+    metricas.salva()
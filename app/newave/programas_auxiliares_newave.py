@@ -1,22 +1,37 @@
-import asyncio
-from shutil import move
+from functools import partial
+from os.path import join
 from time import time
 
 import click
-from inewave.newave.arquivos import Arquivos
-from inewave.newave.caso import Caso
-from inewave.newave.dger import Dger
 
-from app.utils import run_terminal
+from app.execucao_isolada import ExecucaoAuxiliar, executa_auxiliares_isolados
+from app.metricas import Metricas
+from app.newave.contexto_newave import ContextoNewave
+
+# Arquivos escritos pelos programas auxiliares, que não são ligados do caso
+# nos diretórios de trabalho, e os temporários, que não voltam para o caso
+SAIDAS_NWLISTCF = [r"^nwlistcf\.rel$", r"^estados\.rel$", r"^rsar\.rel$"]
+SAIDAS_NWLISTOP = [r"^.*\.CSV$", r"^.*\.out$", r"^nwlistop\.rel$"]
+TEMPORARIOS = ["format.tmp", "mensag.tmp"]
 
 
 @click.command("programas_auxiliares_newave")
 @click.argument("executavel_nwlistcf", type=str)
 @click.argument("executavel_nwlistop", type=str)
-def programas_auxiliares_newave(executavel_nwlistcf, executavel_nwlistop):
-    def gera_arquivosdat_nwlistcf():
-        arquivos = Arquivos.read("arquivos_bkp.dat")
-        dger = Dger.read("./" + arquivos.dger)
+@click.option(
+    "--numero-processadores",
+    type=int,
+    default=1,
+    help="Execuções dos programas auxiliares feitas ao mesmo tempo",
+)
+def programas_auxiliares_newave(
+    executavel_nwlistcf, executavel_nwlistop, numero_processadores
+):
+    contexto = ContextoNewave()
+    caso = contexto.caso
+
+    def gera_arquivosdat_nwlistcf(diretorio: str):
+        dger = contexto.dger
         mes = dger.mes_inicio_estudo + 1
         linhas = [
             "ARQUIVO DE DADOS GERAIS     : nwlistcf.dat\n",
@@ -35,10 +50,10 @@ def programas_auxiliares_newave(executavel_nwlistcf, executavel_nwlistop):
             "ARQUIVO DE VAZAO FORWARD    : vazaof.dat\n",
             "ARQUIVO DE VAZAO X FORWARD  : vazaoxf.dat\n",
         ]
-        with open("arquivos.dat", "w") as arq:
+        with open(join(diretorio, caso.arquivos), "w") as arq:
             arq.writelines(linhas)
 
-    def gera_nwlistcf_estagio(estagio: int, opcao: int):
+    def gera_nwlistcf_estagio(diretorio: str, estagio: int, opcao: int):
         linhas_anteriores = [
             " INI FIM FC (FC = 1: IMPRIME TODOS CORTES, FC = 0: IMPRIME APENAS CORTES VALIDOS NA ULTIMA ITERACAO)\n",
             " XXX XXX X\n",
@@ -48,23 +63,20 @@ def programas_auxiliares_newave(executavel_nwlistcf, executavel_nwlistop):
             " XX XX XX (SE 99 CONSIDERA TODAS)\n",
             f" {str(opcao).zfill(2)}\n",
         ]
-        arquivos = Arquivos.read("arquivos_bkp.dat")
-        dger = Dger.read("./" + arquivos.dger)
+        dger = contexto.dger
         if estagio < 0:
             estagio = (dger.num_anos_estudo * 12) - (estagio + 1)
         else:
             estagio = dger.mes_inicio_estudo + estagio - 1
         mes = str(estagio).zfill(2)
         print(f"Gerando nwlistcf.dat para o mês: {mes}")
-        with open("nwlistcf.dat", "w") as arq:
+        with open(join(diretorio, "nwlistcf.dat"), "w") as arq:
             arq.writelines(linhas_anteriores)
             arq.write(f"  {mes}  {mes} 1\n")
             arq.writelines(linhas_seguintes)
 
-    def gera_nwlistopdat_nwlistop(opcao: int):
-        caso = Caso.read("./caso.dat")
-        arquivos = Arquivos.read("./" + caso.arquivos)
-        dger = Dger.read("./" + arquivos.dger)
+    def gera_nwlistopdat_nwlistop(diretorio: str, opcao: int):
+        dger = contexto.dger
         estagio_inicial = dger.num_anos_pre_estudo * 12 + 1
         estagio_final = (
             dger.num_anos_estudo * 12
@@ -97,50 +109,49 @@ def programas_auxiliares_newave(executavel_nwlistcf, executavel_nwlistop):
             " XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX XXX  (SE 999 CONSIDERA TODAS AS USINAS)\n",
             " 999\n",
         ]
-        with open("nwlistop.dat", "w") as arq:
+        with open(join(diretorio, "nwlistop.dat"), "w") as arq:
             arq.writelines(linhas)
 
-    ti = time()
+    def gera_nwlistcf(diretorio: str, opcao: int):
+        gera_arquivosdat_nwlistcf(diretorio)
+        gera_nwlistcf_estagio(diretorio, 2, opcao)
 
-    # Executa o NWLISTCF para o 2º mês
-    try:
-        caso = Caso.read("./caso.dat")
-        move(caso.arquivos, "arquivos_bkp.dat")
-        gera_arquivosdat_nwlistcf()
-        for opcao in [1, 2]:
-            gera_nwlistcf_estagio(2, opcao)
-            print(f"Executando: {executavel_nwlistcf}")
-            cod, saida = asyncio.run(
-                run_terminal([executavel_nwlistcf], timeout=600.0)
-            )
-            for linha in saida.split("\n"):
-                print(linha)
+    ti = time()
 
-    except Exception as e:
-        print(f"Erro na execução do NWLISTCF: {str(e)}")
-    finally:
-        move(caso.arquivos, "arquivos-nwlistcf.dat")
-        move("arquivos_bkp.dat", caso.arquivos)
-    # Executa o NWLISTOP tabelas e médias
-    try:
-        gera_nwlistopdat_nwlistop(2)
-        print(f"Executando: {executavel_nwlistop}")
-        cod, saida = asyncio.run(
-            run_terminal([executavel_nwlistop], timeout=1200.0)
+    # Executa o NWLISTCF para o 2º mês e o NWLISTOP tabelas e médias
+    execucoes = [
+        ExecucaoAuxiliar(
+            f"NWLISTCF opção {opcao}",
+            executavel_nwlistcf,
+            600.0,
+            partial(gera_nwlistcf, opcao=opcao),
+            [caso.arquivos, "nwlistcf.dat"],
+            {caso.arquivos: "arquivos-nwlistcf.dat"},
+            f"nwlistcf_opcao{opcao}.log",
+            SAIDAS_NWLISTCF,
+            TEMPORARIOS,
+            f"nwlistcf{opcao}",
         )
-        for linha in saida.split("\n"):
-            print(linha)
-        gera_nwlistopdat_nwlistop(4)
-        print(f"Executando: {executavel_nwlistop}")
-        cod, saida = asyncio.run(
-            run_terminal([executavel_nwlistop], timeout=600.0)
+        for opcao in [1, 2]
+    ] + [
+        ExecucaoAuxiliar(
+            f"NWLISTOP opção {opcao}",
+            executavel_nwlistop,
+            timeout,
+            partial(gera_nwlistopdat_nwlistop, opcao=opcao),
+            ["nwlistop.dat"],
+            log=f"nwlistop_opcao{opcao}.log",
+            saidas=SAIDAS_NWLISTOP,
+            temporarios=TEMPORARIOS,
+            sufixo=f"nwlistop{opcao}",
         )
-        for linha in saida.split("\n"):
-            print(linha)
-    except Exception as e:
-        print(f"Erro na execução do NWLISTOP: {str(e)}")
+        for opcao, timeout in [(2, 1200.0), (4, 600.0)]
+    ]
+    metricas = Metricas("programas_auxiliares_newave")
+    executa_auxiliares_isolados(execucoes, numero_processadores, metricas)
 
     tf = time()
     print(
         f"Programas auxiliares do NEWAVE executados em {tf - ti:.2f} segundos!"
     )
+    metricas.salva()
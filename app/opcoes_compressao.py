@@ -0,0 +1,171 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import update_wrapper
+from inspect import signature
+from typing import NamedTuple
+
+import click
+
+from app.cache_compressao import CacheCompressao
+from app.diario_compressao import DiarioCompressao
+from app.politica_compressao import PoliticaCompressao, carrega_politica
+from app.utils import converte_partes, converte_tamanho
+from app.zipfileparallel import Tracer
+
+
+class OpcoesCompressao(NamedTuple):
+    politica: PoliticaCompressao
+    remocao_incremental: bool
+    max_memoria: int | None
+    ordem_deterministica: bool
+    retomada: bool
+    cache: CacheCompressao | None
+    apenas_deck: bool
+    sem_deck: bool
+    rastreamento: str | None
+    partes: dict[str, int]
+
+    def diario(self) -> DiarioCompressao | None:
+        """
+        Diário da retomada, aberto apenas quando as saídas são zipadas.
+        """
+        return DiarioCompressao() if self.retomada else None
+
+    @contextmanager
+    def rastreador(self) -> Iterator[Tracer | None]:
+        """
+        Rastreador das threads de compressão, salvo em `rastreamento` ao
+        final, mesmo que a compressão falhe.
+        """
+        if self.rastreamento is None:
+            yield None
+            return
+        rastreador = Tracer()
+        try:
+            yield rastreador
+        finally:
+            rastreador.dump(self.rastreamento)
+
+
+OPCOES = [
+    click.option(
+        "--politica-compressao",
+        type=click.Path(exists=True, dir_okay=False),
+        default=None,
+        help="Arquivo JSON com codec e nível por categoria e padrão de nome",
+    ),
+    click.option(
+        "--sonda-compressao",
+        is_flag=True,
+        help="Armazena sem compressão arquivos que comprimem mal em amostras",
+    ),
+    click.option(
+        "--remocao-incremental",
+        is_flag=True,
+        help="Apaga cada arquivo zipado assim que sua entrada é gravada em "
+        + "disco, reduzindo o pico de uso do disco",
+    ),
+    click.option(
+        "--max-memoria",
+        default=None,
+        help="Limite da memória em trânsito na compressão (ex: 8G)",
+    ),
+    click.option(
+        "--ordem-deterministica",
+        is_flag=True,
+        help="Escreve as entradas de cada zip em ordem alfabética",
+    ),
+    click.option(
+        "--retomada",
+        is_flag=True,
+        help="Registra as entradas zipadas em um diário, retomando a "
+        + "compressão caso uma execução anterior tenha sido interrompida",
+    ),
+    click.option(
+        "--cache-compressao",
+        type=click.Path(file_okay=False),
+        default=None,
+        help="Diretório de cache, compartilhado entre casos, dos arquivos "
+        + "do deck já comprimidos",
+    ),
+    click.option(
+        "--tamanho-cache",
+        default="20G",
+        help="Tamanho máximo do cache de compressão (ex: 20G)",
+    ),
+    click.option(
+        "--apenas-deck",
+        is_flag=True,
+        help="Apenas zipa o deck, o que pode ser feito enquanto o modelo "
+        + "executa",
+    ),
+    click.option(
+        "--sem-deck",
+        is_flag=True,
+        help="Não zipa o deck, já zipado com --apenas-deck",
+    ),
+    click.option(
+        "--rastreamento",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="Salva a linha do tempo das threads de compressão neste "
+        + "arquivo, no formato Chrome trace-event JSON (Perfetto, "
+        + "about:tracing)",
+    ),
+    click.option(
+        "--partes",
+        multiple=True,
+        help="Divide o zip de uma categoria em partes, cada uma com a sua "
+        + "thread de escrita, e um manifesto (ex: operacao=8)",
+    ),
+]
+
+
+def _constroi_opcoes(
+    politica_compressao: str | None,
+    sonda_compressao: bool,
+    remocao_incremental: bool,
+    max_memoria: str | None,
+    ordem_deterministica: bool,
+    retomada: bool,
+    cache_compressao: str | None,
+    tamanho_cache: str,
+    apenas_deck: bool,
+    sem_deck: bool,
+    rastreamento: str | None,
+    partes: tuple[str, ...],
+) -> OpcoesCompressao:
+    return OpcoesCompressao(
+        carrega_politica(politica_compressao, sonda_compressao),
+        remocao_incremental,
+        converte_tamanho(max_memoria) if max_memoria is not None else None,
+        ordem_deterministica,
+        retomada,
+        CacheCompressao(cache_compressao, converte_tamanho(tamanho_cache))
+        if cache_compressao is not None
+        else None,
+        apenas_deck,
+        sem_deck,
+        rastreamento,
+        converte_partes(list(partes)),
+    )
+
+
+PARAMETROS = list(signature(_constroi_opcoes).parameters)
+
+
+def opcoes_compressao(comando):
+    """
+    Adiciona ao comando de pós-processamento as opções de compressão
+    comuns aos modelos, que são recebidas já convertidas no argumento
+    `compressao`.
+    """
+
+    def constroi(*args, **kwargs):
+        opcoes = {o: kwargs.pop(o) for o in PARAMETROS}
+        return comando(*args, compressao=_constroi_opcoes(**opcoes), **kwargs)
+
+    constroi = update_wrapper(constroi, comando)
+    for opcao in reversed(OPCOES):
+        constroi = opcao(constroi)
+    return constroi
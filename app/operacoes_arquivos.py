@@ -0,0 +1,106 @@
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from os import curdir, remove, scandir
+from os.path import join
+from shutil import move
+from typing import NamedTuple
+
+# Threads para operações de metadados, que em sistemas de arquivos
+# de rede passam a maior parte do tempo esperando o servidor
+NUMERO_THREADS_ARQUIVOS = 16
+# Operações executadas por cada tarefa submetida ao pool
+TAMANHO_LOTE_OPERACOES = 64
+
+
+class ErroOperacao(NamedTuple):
+    caminho: str
+    erro: OSError
+
+
+def arquivos_regulares(diretorio: str = curdir) -> set[str]:
+    """
+    Nomes dos arquivos regulares de um diretório, usando o tipo
+    retornado pelo `os.scandir` em vez de um `stat` por arquivo.
+    """
+    try:
+        with scandir(diretorio) as it:
+            return {e.name for e in it if e.is_file()}
+    except FileNotFoundError:
+        return set()
+
+
+def _executa_lote(
+    operacao: Callable, argumentos: list[tuple]
+) -> list[ErroOperacao]:
+    erros: list[ErroOperacao] = []
+    for args in argumentos:
+        try:
+            operacao(*args)
+        except FileNotFoundError:
+            # Arquivo removido por outro processo após a listagem
+            continue
+        except OSError as e:
+            erros.append(ErroOperacao(args[0], e))
+    return erros
+
+
+def executa_operacoes(
+    operacao: Callable,
+    argumentos: list[tuple],
+    numero_threads: int = NUMERO_THREADS_ARQUIVOS,
+) -> list[ErroOperacao]:
+    """
+    Aplica `operacao` a cada tupla de `argumentos` em um pool de threads,
+    em lotes, sem interromper nos erros. Retorna os erros de cada
+    operação que falhou, identificados pelo primeiro argumento.
+    """
+    if len(argumentos) == 0:
+        return []
+    lotes = [
+        argumentos[i : i + TAMANHO_LOTE_OPERACOES]
+        for i in range(0, len(argumentos), TAMANHO_LOTE_OPERACOES)
+    ]
+    if numero_threads <= 1 or len(lotes) == 1:
+        return [e for lote in lotes for e in _executa_lote(operacao, lote)]
+    with ThreadPoolExecutor(numero_threads) as exe:
+        resultados = exe.map(lambda lote: _executa_lote(operacao, lote), lotes)
+        return [e for erros in resultados for e in erros]
+
+
+def remove_arquivos(
+    arquivos: list[str],
+    diretorio: str = curdir,
+    numero_threads: int = NUMERO_THREADS_ARQUIVOS,
+) -> list[ErroOperacao]:
+    """
+    Remove, dentre os `arquivos`, os que existem como arquivos regulares
+    em `diretorio`.
+    """
+    existentes = arquivos_regulares(diretorio)
+    return executa_operacoes(
+        remove,
+        [
+            (join(diretorio, a),)
+            for a in dict.fromkeys(arquivos)
+            if a in existentes
+        ],
+        numero_threads,
+    )
+
+
+def move_arquivos(
+    origem: str,
+    destino: str = curdir,
+    numero_threads: int = NUMERO_THREADS_ARQUIVOS,
+) -> list[ErroOperacao]:
+    """
+    Move os arquivos regulares do diretório `origem` para `destino`.
+    """
+    return executa_operacoes(
+        move,
+        [
+            (join(origem, a), join(destino, a))
+            for a in arquivos_regulares(origem)
+        ],
+        numero_threads,
+    )
@@ -0,0 +1,158 @@
+import json
+import re
+import zlib
+from os import stat
+from pathlib import Path
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED
+
+CODECS = {
+    "store": ZIP_STORED,
+    "deflate": ZIP_DEFLATED,
+    "bzip2": ZIP_BZIP2,
+    "lzma": ZIP_LZMA,
+}
+# Amostras lidas pela sonda de compressibilidade, espalhadas pelo arquivo
+TAMANHO_AMOSTRA = 64 << 10
+NUMERO_AMOSTRAS = 3
+# Arquivos menores que isso não passam pela sonda
+TAMANHO_MINIMO_SONDA = 256 << 10
+# Razão (comprimido / original) estimada acima da qual o arquivo é
+# armazenado sem compressão
+RAZAO_MAXIMA_SONDA = 0.9
+
+
+class RegraCompressao:
+    """
+    Codec e nível de compressão aplicados a um conjunto de arquivos.
+    """
+
+    def __init__(self, codec: str, nivel: int | None = None):
+        if codec not in CODECS:
+            raise ValueError(
+                f"Codec {codec} não suportado. Opções: {list(CODECS.keys())}"
+            )
+        self.codec = codec
+        self.nivel = nivel
+
+    @property
+    def compress_type(self) -> int:
+        return CODECS[self.codec]
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RegraCompressao":
+        return cls(d["codec"], d.get("nivel"))
+
+
+def razao_compressao_estimada(caminho: str) -> float:
+    """
+    Estima a razão de compressão de um arquivo comprimindo, com o nível
+    mais rápido do deflate, algumas amostras espalhadas pelo arquivo.
+    """
+    tamanho = stat(caminho).st_size
+    if tamanho == 0:
+        return 1.0
+    passo = max(tamanho // NUMERO_AMOSTRAS, TAMANHO_AMOSTRA)
+    bytes_originais = 0
+    bytes_comprimidos = 0
+    with open(caminho, "rb") as arq:
+        for inicio in range(0, tamanho, passo):
+            arq.seek(inicio)
+            amostra = arq.read(TAMANHO_AMOSTRA)
+            bytes_originais += len(amostra)
+            bytes_comprimidos += len(zlib.compress(amostra, 1))
+    return bytes_comprimidos / bytes_originais
+
+
+class PoliticaCompressao:
+    """
+    Define o codec e o nível usados para cada arquivo de um zip. Vale a
+    primeira regra de `padroes` cuja regex casa com o nome do arquivo,
+    depois a regra da categoria (nome do zip) e, por fim, a `padrao`.
+    Com `sonda` ativa, arquivos que comprimem mal nas amostras são
+    armazenados sem compressão.
+    """
+
+    def __init__(
+        self,
+        padrao: RegraCompressao | None = None,
+        categorias: dict[str, RegraCompressao] | None = None,
+        padroes: list[tuple[str, RegraCompressao]] | None = None,
+        sonda: bool = False,
+        razao_maxima_sonda: float = RAZAO_MAXIMA_SONDA,
+    ):
+        self.padrao = padrao or RegraCompressao("deflate")
+        self.categorias = categorias or {}
+        self.padroes = [(re.compile(r), regra) for r, regra in padroes or []]
+        self.sonda = sonda
+        self.razao_maxima_sonda = razao_maxima_sonda
+
+    def regra(self, categoria: str, nome_arquivo: str) -> RegraCompressao:
+        for regex, regra in self.padroes:
+            if regex.search(nome_arquivo) is not None:
+                return regra
+        return self.categorias.get(categoria, self.padrao)
+
+    def codec(self, categoria: str, caminho) -> tuple[int, int | None]:
+        """
+        Retorna o par (compress_type, compresslevel) de um arquivo.
+        """
+        regra = self.regra(categoria, Path(caminho).name)
+        if (
+            self.sonda
+            and regra.codec != "store"
+            and stat(caminho).st_size >= TAMANHO_MINIMO_SONDA
+            and razao_compressao_estimada(caminho) > self.razao_maxima_sonda
+        ):
+            return ZIP_STORED, None
+        return regra.compress_type, regra.nivel
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PoliticaCompressao":
+        return cls(
+            padrao=(
+                RegraCompressao.from_dict(d["padrao"])
+                if "padrao" in d
+                else None
+            ),
+            categorias={
+                c: RegraCompressao.from_dict(r)
+                for c, r in d.get("categorias", {}).items()
+            },
+            padroes=[
+                (r["regex"], RegraCompressao.from_dict(r))
+                for r in d.get("padroes", [])
+            ],
+            sonda=d.get("sonda", False),
+            razao_maxima_sonda=d.get("razao_maxima_sonda", RAZAO_MAXIMA_SONDA),
+        )
+
+    @classmethod
+    def read(cls, caminho: str) -> "PoliticaCompressao":
+        with open(caminho, "r") as arq:
+            return cls.from_dict(json.load(arq))
+
+
+# Sem uma política fornecida, todos os arquivos usam o deflate no nível
+# padrão do zipfile, como nos zips gerados antes das políticas. Níveis
+# ajustados por tipo de arquivo estão em
+# jobs/politica_compressao_ajustada.json.
+POLITICA_PADRAO = PoliticaCompressao(RegraCompressao("deflate"))
+
+
+def carrega_politica(caminho: str | None, sonda: bool) -> PoliticaCompressao:
+    """
+    Lê a política de um arquivo JSON, quando fornecido, ou usa a padrão,
+    ativando a sonda de compressibilidade se pedido.
+    """
+    politica = (
+        PoliticaCompressao.read(caminho)
+        if caminho is not None
+        else PoliticaCompressao(
+            POLITICA_PADRAO.padrao,
+            POLITICA_PADRAO.categorias,
+            [(r.pattern, regra) for r, regra in POLITICA_PADRAO.padroes],
+        )
+    )
+    if sonda:
+        politica.sonda = True
+    return politica
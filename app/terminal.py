@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+from typing import NamedTuple
+
+# Lines of output kept in memory for each invocation
+TAIL_LINES = 200
+# Longest line kept; longer lines are replaced by a marker
+LINE_LIMIT = 1 << 20
+# Size of each log file before it is rotated, and rotated files kept
+LOG_MAX_BYTES = 16 << 20
+LOG_BACKUPS = 3
+# Interval between samples of the CPU time and memory of the process
+# group
+SAMPLE_INTERVAL = 1.0
+# Time given to the process group to exit after SIGTERM on timeout
+KILL_GRACE = 5.0
+
+
+class TerminalResult(NamedTuple):
+    returncode: int | None
+    # Last lines of stdout and stderr, interleaved as they arrived
+    tail: str
+    timed_out: bool
+    wall_time: float
+    cpu_time: float
+    peak_rss: int
+
+
+class _GroupUsage:
+    """Samples, from /proc, the CPU time and resident memory of every
+    process in a process group. Processes that exit between samples
+    count with their last sample."""
+
+    def __init__(self, pgid: int):
+        self.pgid = pgid
+        self.cpu_ticks: dict[int, int] = {}
+        self.peak_rss = 0
+
+    def sample(self):
+        rss = 0
+        try:
+            pids = [int(p) for p in os.listdir("/proc") if p.isdigit()]
+        except OSError:
+            return
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/stat", "rb") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            fields = stat[stat.rfind(b")") + 2 :].split()
+            if int(fields[2]) != self.pgid:
+                continue
+            self.cpu_ticks[pid] = int(fields[11]) + int(fields[12])
+            rss += int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        self.peak_rss = max(self.peak_rss, rss)
+
+    @property
+    def cpu_time(self) -> float:
+        return sum(self.cpu_ticks.values()) / os.sysconf("SC_CLK_TCK")
+
+
+async def _pump(stream, out, tail, log, prefix):
+    while True:
+        try:
+            line = await stream.readline()
+        except ValueError:
+            # Line longer than LINE_LIMIT, already dropped from the buffer
+            line = b"[...]\n"
+        if not line:
+            break
+        text = line.decode("utf-8", errors="replace").rstrip("\n")
+        tail.append(text)
+        if out is not None:
+            print(prefix + text, file=out, flush=True)
+        if log is not None:
+            log.handle(logging.makeLogRecord({"msg": text}))
+
+
+async def _sample(usage: _GroupUsage):
+    while True:
+        usage.sample()
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+
+def _kill_group(pgid: int, sig: int):
+    try:
+        os.killpg(pgid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def run_terminal_stream(
+    cmds: list[str],
+    timeout: float | None = None,
+    cwd: str | None = None,
+    log_path: str | None = None,
+    prefix: str = "",
+    echo: bool = True,
+    tail_lines: int = TAIL_LINES,
+) -> TerminalResult:
+    """
+    Runs a command on the terminal in its own process group, streaming
+    stdout and stderr line by line to the console and to a rotating log
+    as they arrive, and keeping only the last lines in memory. On
+    timeout the whole process group is terminated.
+
+    :param cmds: Commands and args to be executed
+    :param timeout: Timeout for giving up on the command
+    :param cwd: Working directory of the command
+    :param log_path: Log file of the outputs, rotated by size
+    :param prefix: Prefix of the lines printed to the console
+    :param echo: Whether the outputs are printed to the console
+    :param tail_lines: Lines of output kept in the result
+    :return: Return code, output tail, wall and CPU times and peak RSS
+    :rtype: TerminalResult
+    """
+    log = None
+    if log_path is not None:
+        log = RotatingFileHandler(
+            log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS
+        )
+        log.setFormatter(logging.Formatter("%(message)s"))
+    tail: deque[str] = deque(maxlen=tail_lines)
+    ti = perf_counter()
+    proc = await asyncio.create_subprocess_shell(
+        " ".join(cmds),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        start_new_session=True,
+        limit=LINE_LIMIT,
+    )
+    usage = _GroupUsage(proc.pid)
+    sampler = asyncio.create_task(_sample(usage))
+    timed_out = False
+    try:
+        pumps = asyncio.gather(
+            _pump(proc.stdout, sys.stdout if echo else None, tail, log, prefix),
+            _pump(proc.stderr, sys.stderr if echo else None, tail, log, prefix),
+            proc.wait(),
+        )
+        try:
+            await asyncio.wait_for(asyncio.shield(pumps), timeout=timeout)
+        except TimeoutError:
+            timed_out = True
+            _kill_group(proc.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(asyncio.shield(pumps), KILL_GRACE)
+            except TimeoutError:
+                _kill_group(proc.pid, signal.SIGKILL)
+                await pumps
+    finally:
+        sampler.cancel()
+        if proc.returncode is None:
+            _kill_group(proc.pid, signal.SIGKILL)
+            await proc.wait()
+        if log is not None:
+            log.close()
+    usage.sample()
+    return TerminalResult(
+        proc.returncode,
+        "\n".join(tail),
+        timed_out,
+        perf_counter() - ti,
+        usage.cpu_time,
+        usage.peak_rss,
+    )
@@ -1,130 +1,1004 @@
-import asyncio
 import re
-from concurrent.futures import ThreadPoolExecutor, wait
-from os import curdir, listdir, remove
-from os.path import isdir, isfile, join
+from collections.abc import Iterable
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import ExitStack
+from functools import partial
+from os import curdir, listdir, remove, stat
+from os.path import basename, isdir, isfile, join
 from pathlib import Path
-from shutil import move, rmtree
-from zipfile import ZIP_DEFLATED, ZipFile
+from queue import Queue
+from shutil import rmtree
+from stat import S_ISREG
+from threading import Condition, Lock
+from time import perf_counter
+from typing import NamedTuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED
 
-from app.zipfileparallel import ZipFileParallel
+from app.cache_compressao import CacheCompressao
+from app.diario_compressao import DiarioCompressao
+from app.indice_diretorio import ClassificadorArquivos, IndiceDiretorio
+from app.indice_zip import (
+    caminho_indice,
+    caminho_manifesto,
+    caminhos_partes,
+    escreve_indice_zip,
+    escreve_manifesto,
+    parte_da_entrada,
+    partes_existentes,
+)
+from app.metricas import MetricaEtapa, Metricas
+from app.operacoes_arquivos import ErroOperacao, move_arquivos, remove_arquivos
+from app.politica_compressao import POLITICA_PADRAO, PoliticaCompressao
+from app.terminal import TerminalResult
+from app.zipfileparallel import (
+    BLOCK_SIZE,
+    CHUNK_SIZE,
+    SPOOL_MAX_SIZE,
+    SharedBatch,
+    Tracer,
+    ZipFileParallel,
+    compress_files_shared,
+    release_shared,
+)
 
-RETRY_DEFAULT = 3
-TIMEOUT_DEFAULT = 10
+# Arquivos menores que este limite (em bytes) são agrupados em lotes
+LIMITE_ARQUIVOS_PEQUENOS = 1 << 20
+# Arquivos a partir deste tamanho (em bytes) têm seus blocos comprimidos
+# por todos os processadores, dentro de uma mesma entrada do zip
+LIMITE_DEFLATE_PARALELO = 256 << 20
+# Backends de compressão: threads no próprio processo ou processos filhos
+BACKEND_THREAD = "thread"
+BACKEND_PROCESSO = "processo"
+BACKENDS_COMPRESSAO = [BACKEND_THREAD, BACKEND_PROCESSO]
+# Tempo máximo (em segundos) sem nenhuma memória liberada enquanto uma
+# reserva do orçamento aguarda
+ESPERA_MAXIMA_ORCAMENTO = 600.0
+
+
+def converte_tamanho(tamanho: str) -> int:
+    """
+    Converte um tamanho como `512`, `64k`, `8M` ou `1.5G` para bytes.
+    """
+    unidades = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    r = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?)B?\s*", tamanho.upper())
+    if r is None:
+        raise ValueError(f"Tamanho inválido: {tamanho}")
+    return int(float(r.group(1)) * unidades[r.group(2)])
+
+
+def converte_partes(valores: list[str]) -> dict[str, int]:
+    """
+    Converte as opções `categoria=n` no número de partes de cada
+    categoria.
+    """
+    partes: dict[str, int] = {}
+    for valor in valores:
+        categoria, _, n = valor.partition("=")
+        if not n.isdigit() or int(n) < 1:
+            raise ValueError(f"Número de partes inválido: {valor}")
+        partes[categoria] = int(n)
+    return partes
+
+
+def _reporta_erros_operacoes(acao: str, erros: list[ErroOperacao]):
+    for e in erros:
+        print(f"Erro ao {acao} {e.caminho}: {e.erro}")
 
 
 def traz_conteudo_para_raiz(diretorio: str):
     if isdir(diretorio):
-        for a in listdir(diretorio):
-            if isfile(join(diretorio, a)):
-                move(join(diretorio, a), a)
-        rmtree(diretorio)
+        erros = move_arquivos(diretorio)
+        _reporta_erros_operacoes("mover", erros)
+        # Mantém o diretório se algum arquivo não pôde ser movido
+        if len(erros) == 0:
+            rmtree(diretorio)
 
 
 def identifica_arquivos_via_regex(
-    arquivos_ignorar: list[str], lista_regex: list[str]
+    arquivos_ignorar: list[str],
+    lista_regex: list[str],
+    indice: IndiceDiretorio | None = None,
 ):
-    regex = r"|".join(lista_regex)
-    regex = r"(" + regex + r")"
-    arquivos: list[str] = []
-    for a in listdir(curdir):
-        if a not in arquivos_ignorar:
-            if re.search(regex, a) is not None:
-                arquivos.append(a)
+    nomes = indice if indice is not None else listdir(curdir)
+    return ClassificadorArquivos({"arquivos": lista_regex}).classifica(
+        nomes, arquivos_ignorar
+    )["arquivos"]
 
-    return arquivos
 
+def le_arquivos_indice(caminho: str) -> list[str]:
+    """
+    Lê os nomes dos arquivos de LIBS da terceira coluna de um arquivo de
+    índices (`indices.csv`), separado por `;` e com comentários iniciados
+    por `&`, sem repetições e na ordem em que aparecem.
+    """
+    arquivos: dict[str, None] = {}
+    with open(caminho, "r") as arq:
+        for linha in arq:
+            campos = linha.partition("&")[0].split(";")
+            if len(campos) < 3:
+                continue
+            nome = campos[2].strip()
+            if len(nome) > 0:
+                arquivos[nome] = None
+    return list(arquivos)
 
-def zip_arquivos(arquivos: list[str], nome_zip: str):
+
+def _adiciona_arquivo_cache(
+    handle: ZipFileParallel,
+    arquivo: str,
+    compress_type: int,
+    nivel: int | None,
+    cache: CacheCompressao,
+):
+    chave = cache.chave(arquivo, compress_type, nivel)
+    entrada = cache.busca(chave)
+    if entrada is None:
+        entrada = cache.armazena(chave, arquivo, compress_type, nivel)
+    zinfo = handle.zinfo_from_file(arquivo, None, compress_type, nivel)
+    zinfo.file_size = entrada.tamanho
+    handle.write_compressed(
+        zinfo,
+        entrada.crc,
+        entrada.dados,
+        entrada.tamanho_comprimido,
+        entrada.dados.close,
+    )
+
+
+def zip_arquivos(
+    arquivos: list[str],
+    nome_zip: str,
+    politica: PoliticaCompressao = POLITICA_PADRAO,
+    cache: CacheCompressao | None = None,
+) -> str:
+    """
+    Zipa os arquivos em ordem alfabética, escrevendo o índice lateral do
+    zip, e retorna o caminho do zip. Com um `cache`, o fluxo comprimido
+    dos arquivos já vistos em outros casos é copiado do cache, sem
+    comprimi-los novamente.
+    """
     diretorio_base = Path(curdir).resolve().parts[-1]
-    with ZipFile(
-        join(curdir, f"{nome_zip}_{diretorio_base}.zip"),
+    caminho_zip = join(curdir, f"{nome_zip}_{diretorio_base}.zip")
+    with ZipFileParallel(
+        caminho_zip,
         "w",
         compression=ZIP_DEFLATED,
     ) as arquivo_zip:
         print(f"Compactando arquivos para {nome_zip}_{diretorio_base}.zip")
         for a in sorted(arquivos):
             if isfile(join(curdir, a)):
-                arquivo_zip.write(a)
+                compress_type, nivel = politica.codec(nome_zip, a)
+                if cache is not None and compress_type != ZIP_STORED:
+                    _adiciona_arquivo_cache(
+                        arquivo_zip, a, compress_type, nivel, cache
+                    )
+                    continue
+                arquivo_zip.write(
+                    a, compress_type=compress_type, compresslevel=nivel
+                )
+    escreve_indice_zip(caminho_zip, arquivo_zip.infolist())
+    return caminho_zip
 
 
-def _adiciona_arquivo_zip_paralelo(handle: ZipFileParallel, filepath: Path):
-    data = filepath.read_bytes()
-    handle.writestr(str(filepath.name), data)
+def _adiciona_arquivo_zip_paralelo(
+    handle: ZipFileParallel,
+    filepath: Path,
+    politica: PoliticaCompressao,
+    categoria: str,
+):
+    compress_type, nivel = politica.codec(categoria, filepath)
+    handle.write_file(filepath, str(filepath.name), compress_type, nivel)
 
 
-def zip_arquivos_paralelo(
-    arquivos: list[str], nome_zip: str, numero_processadores: int
+def _adiciona_lote_zip_paralelo(
+    handle: ZipFileParallel,
+    caminhos_arquivos: list[Path],
+    politica: PoliticaCompressao,
+    categoria: str,
 ):
-    diretorio_base = Path(curdir).resolve().parts[-1]
-    print(f"Compactando arquivos para {nome_zip}_{diretorio_base}.zip")
-    print(f"Paralelizando em {numero_processadores} processos")
-    arquivos = [a for a in arquivos if a is not None]
-    caminhos_arquivos = [Path(a) for a in arquivos if isfile(a)]
-    # TODO - pegar os tamanhos totais dos arquivos e distribuir de maneira
-    # mais uniforme.
-    with ZipFileParallel(
-        join(curdir, f"{nome_zip}_{diretorio_base}.zip"),
-        "w",
-        compression=ZIP_DEFLATED,
-    ) as handle:
-        with ThreadPoolExecutor(numero_processadores) as exe:
-            fs = [
-                exe.submit(_adiciona_arquivo_zip_paralelo, handle, f)
-                for f in caminhos_arquivos
-            ]
+    for filepath in caminhos_arquivos:
+        _adiciona_arquivo_zip_paralelo(handle, filepath, politica, categoria)
 
-        wait(fs)
-        for future in fs:
-            future.result()
 
+def _comprime_lote_processo(
+    caminhos_arquivos: list[Path],
+    politica: PoliticaCompressao,
+    categoria: str,
+    rastreia: bool = False,
+) -> SharedBatch:
+    codecs = [politica.codec(categoria, c) for c in caminhos_arquivos]
+    return compress_files_shared(caminhos_arquivos, codecs, trace=rastreia)
 
-def limpa_arquivos_saida(arquivos: list[str]):
-    print("Excluindo arquivos...")
+
+def _tamanhos_arquivos(arquivos: list[str]) -> dict[Path, int]:
+    tamanhos: dict[Path, int] = {}
+    for a in dict.fromkeys(arquivos):
+        if a is None:
+            continue
+        try:
+            st = stat(a)
+        except OSError:
+            continue
+        if S_ISREG(st.st_mode):
+            tamanhos[Path(a)] = st.st_size
+    return tamanhos
+
+
+def _agenda_tarefas_zip(
+    tamanhos: dict[Path, int],
+    limite_arquivos_pequenos: int,
+    ordenado: bool = False,
+    cortes: Iterable[Path] = (),
+) -> list[tuple[int, list[Path]]]:
+    """
+    Agrupa os arquivos em tarefas para o pool de compressão: cada arquivo
+    grande é uma tarefa, enquanto os pequenos são empacotados em lotes de
+    até `limite_arquivos_pequenos` bytes. As tarefas são retornadas com
+    seus tamanhos, da maior para a menor (LPT), para que os arquivos
+    grandes não fiquem por último. Se `ordenado`, os lotes reúnem nomes
+    consecutivos e as tarefas seguem a ordem dos nomes, que é a ordem
+    de escrita no zip. Os lotes ordenados também são cortados nos nomes
+    de `cortes`, os arquivos comprimidos fora do pool: um lote que
+    atravessasse um deles só seria gravado depois dele, segurando o
+    orçamento de memória que a sua compressão espera.
+    """
+    tarefas: list[tuple[int, list[Path]]] = []
+    lote: list[Path] = []
+    tamanho_lote = 0
+    itens: list[tuple[Path, int | None]]
+    if ordenado:
+        itens = [*tamanhos.items(), *((c, None) for c in cortes)]
+        itens.sort(key=lambda t: t[0].name)
+    else:
+        itens = sorted(tamanhos.items(), key=lambda t: t[1], reverse=True)
+    for caminho, tamanho in itens:
+        if tamanho is None or tamanho >= limite_arquivos_pequenos:
+            if ordenado and len(lote) > 0:
+                tarefas.append((tamanho_lote, lote))
+                lote = []
+                tamanho_lote = 0
+            if tamanho is not None:
+                tarefas.append((tamanho, [caminho]))
+            continue
+        lote.append(caminho)
+        tamanho_lote += tamanho
+        if tamanho_lote >= limite_arquivos_pequenos:
+            tarefas.append((tamanho_lote, lote))
+            lote = []
+            tamanho_lote = 0
+    if len(lote) > 0:
+        tarefas.append((tamanho_lote, lote))
+    if not ordenado:
+        tarefas.sort(key=lambda t: t[0], reverse=True)
+    return tarefas
+
+
+class _ContadorRemocao:
+    """
+    Conta em quantos zips ainda em construção cada arquivo a ser limpo
+    está, removendo-o assim que todos eles forem concluídos.
+    """
+
+    def __init__(self, arquivos_limpar: set[str]):
+        self._arquivos_limpar = arquivos_limpar
+        self._referencias: dict[str, int] = {}
+        self._lock = Lock()
+
+    def registra(self, caminhos: list[Path]):
+        with self._lock:
+            for c in caminhos:
+                if str(c) in self._arquivos_limpar:
+                    self._referencias[str(c)] = (
+                        self._referencias.get(str(c), 0) + 1
+                    )
+
+    def libera(self, caminhos: list[Path]):
+        remover: list[str] = []
+        with self._lock:
+            for c in caminhos:
+                if str(c) not in self._referencias:
+                    continue
+                self._referencias[str(c)] -= 1
+                if self._referencias[str(c)] == 0:
+                    self._referencias.pop(str(c))
+                    remover.append(str(c))
+        for a in remover:
+            if isfile(a):
+                remove(a)
+
+
+class _ZipCategoria:
+    """
+    Zip de uma categoria sendo construído no pool compartilhado. É
+    fechado, com o seu índice lateral, quando sua última tarefa termina
+    e, se não houve erros, libera seus arquivos para remoção. Na remoção
+    incremental, os arquivos de cada tarefa são liberados assim que ela
+    é gravada e sincronizada em disco, e são registrados antes no
+    `diario`, se houver. Com `metricas`, registra ao ser fechado o tempo
+    desde o `inicio` do pool, os arquivos e os bytes do zip. Uma
+    categoria dividida em partes tem um `_ZipCategoria` por `parte`.
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        handle: ZipFileParallel,
+        caminhos: list[Path],
+        tarefas_pendentes: int,
+        contador: _ContadorRemocao,
+        remocao_incremental: bool = False,
+        diario: DiarioCompressao | None = None,
+        metricas: Metricas | None = None,
+        inicio: float | None = None,
+        parte: int | None = None,
+    ):
+        self.nome = nome
+        self.parte = parte
+        self.handle = handle
+        self.caminhos = caminhos
+        self.erro: BaseException | None = None
+        self._tarefas_pendentes = tarefas_pendentes
+        self._contador = contador
+        self._remocao_incremental = remocao_incremental
+        self._diario = diario
+        self._metricas = metricas
+        self._inicio = inicio if inicio is not None else perf_counter()
+        self._lock = Lock()
+        contador.registra(caminhos)
+        if tarefas_pendentes == 0:
+            self._conclui()
+
+    def conclui_tarefa(
+        self, caminhos: list[Path], erro: BaseException | None = None
+    ):
+        erro_sincronizacao: OSError | None = None
+        if erro is None and (
+            self._remocao_incremental or self._diario is not None
+        ):
+            try:
+                self.handle.after_written(
+                    [str(c.name) for c in caminhos],
+                    partial(self._libera_gravados, caminhos),
+                    durable=True,
+                )
+            except OSError as e:
+                erro = erro_sincronizacao = e
+        with self._lock:
+            if erro is not None and self.erro is None:
+                self.erro = erro
+            self._tarefas_pendentes -= 1
+            concluido = self._tarefas_pendentes == 0
+        if concluido:
+            self._conclui()
+        if erro_sincronizacao is not None:
+            raise erro_sincronizacao
+
+    def _libera_gravados(
+        self, caminhos: list[Path], erro: BaseException | None
+    ):
+        # Mantém os arquivos cujas entradas não chegaram ao disco
+        if erro is not None:
+            return
+        if self._diario is not None:
+            self._diario.registra(
+                self.handle.filename,
+                [
+                    self.handle.NameToInfo[c.name]
+                    for c in caminhos
+                    if c.name in self.handle.NameToInfo
+                ],
+                self._remocao_incremental,
+            )
+        if self._remocao_incremental:
+            self._contador.libera(caminhos)
+
+    def _conclui(self):
+        self.handle.close()
+        escreve_indice_zip(self.handle.filename, self.handle.infolist())
+        if self._metricas is not None:
+            metrica = MetricaEtapa(
+                f"zip_{self.nome}"
+                if self.parte is None
+                else f"zip_{self.nome}_parte{self.parte + 1}"
+            )
+            metrica.tempo = perf_counter() - self._inicio
+            metrica.mede_zip(self.handle.filename)
+            metrica.estado = "sucesso" if self.erro is None else "falha"
+            self._metricas.registra(metrica)
+        if self.erro is None and self._diario is not None:
+            self._diario.conclui(self.handle.filename)
+        if self.erro is None and not self._remocao_incremental:
+            self._contador.libera(self.caminhos)
+
+
+class OrcamentoMemoria:
+    """
+    Limita os bytes em trânsito na compressão (lidos ou comprimidos e
+    ainda não gravados nos zips). `reserva` bloqueia enquanto a reserva
+    ultrapassar o `limite`, exceto quando nada está em trânsito, para que
+    uma tarefa maior que o limite ainda possa ser executada sozinha.
+
+    Uma reserva só é liberada depois que as entradas da sua tarefa são
+    gravadas, o que não depende de quem a fez. Por isso, quem espera em
+    `reserva` não pode ser necessário à gravação das tarefas já
+    reservadas: no modo ordenado, todas elas precedem, na ordem do zip,
+    a tarefa que espera. Se, mesmo assim, nenhuma reserva for liberada
+    durante `espera_maxima` segundos, `reserva` falha com o estado do
+    orçamento em vez de esperar para sempre.
+    """
+
+    def __init__(
+        self,
+        limite: int | None = None,
+        espera_maxima: float | None = ESPERA_MAXIMA_ORCAMENTO,
+    ):
+        self.limite = limite
+        self.espera_maxima = espera_maxima
+        self.em_uso = 0
+        self.pico = 0
+        self._liberacoes = 0
+        self._condicao = Condition()
+
+    def reserva(self, n: int):
+        with self._condicao:
+            if self.limite is not None:
+                self._espera(n)
+            self.em_uso += n
+            self.pico = max(self.pico, self.em_uso)
+
+    def _espera(self, n: int):
+        def cabe() -> bool:
+            return self.em_uso == 0 or self.em_uso + n <= self.limite
+
+        while True:
+            liberacoes = self._liberacoes
+            if self._condicao.wait_for(cabe, self.espera_maxima):
+                return
+            if self._liberacoes == liberacoes:
+                raise RuntimeError(
+                    f"Nenhuma memória liberada em {self.espera_maxima} s "
+                    + f"para reservar {n} bytes: {self.em_uso} de "
+                    + f"{self.limite} bytes aguardam a gravação nos zips"
+                )
+
+    def libera(self, n: int):
+        with self._condicao:
+            self.em_uso -= n
+            self._liberacoes += 1
+            self._condicao.notify_all()
+
+
+def _custo_memoria_tarefa(tamanho: int) -> int:
+    # Um trecho lido e o fluxo comprimido, mantido em memória até
+    # SPOOL_MAX_SIZE antes de ir para um arquivo temporário
+    return CHUNK_SIZE + min(tamanho, SPOOL_MAX_SIZE)
+
+
+def _blocos_pendentes_enorme(
+    numero_processadores: int, orcamento: OrcamentoMemoria
+) -> int:
+    blocos = 2 * numero_processadores
+    if orcamento.limite is not None:
+        blocos = min(
+            blocos,
+            (orcamento.limite - SPOOL_MAX_SIZE) // (2 * BLOCK_SIZE) - 2,
+        )
+    return max(blocos, 1)
+
+
+def _custo_memoria_enorme(blocos_pendentes: int) -> int:
+    # Cada bloco pendente e os dois mantidos pela leitura têm a versão
+    # original e a comprimida, além do fluxo comprimido em memória
+    return (blocos_pendentes + 2) * 2 * BLOCK_SIZE + SPOOL_MAX_SIZE
+
+
+def _libera_orcamento_apos_gravacao(
+    zc: _ZipCategoria,
+    caminhos: list[Path],
+    orcamento: OrcamentoMemoria,
+    custo: int,
+):
+    # As entradas entregues ao escritor do zip continuam em memória até
+    # serem gravadas
+    zc.handle.after_written(
+        [str(c.name) for c in caminhos], lambda erro: orcamento.libera(custo)
+    )
+
+
+def _executa_tarefa_zip(
+    zc: _ZipCategoria,
+    caminhos: list[Path],
+    politica: PoliticaCompressao,
+    orcamento: OrcamentoMemoria,
+    custo: int,
+):
+    try:
+        _adiciona_lote_zip_paralelo(zc.handle, caminhos, politica, zc.nome)
+    except BaseException as e:
+        zc.conclui_tarefa(caminhos, e)
+        orcamento.libera(custo)
+        raise
+    _libera_orcamento_apos_gravacao(zc, caminhos, orcamento, custo)
+    zc.conclui_tarefa(caminhos)
+
+
+def _executa_tarefa_zip_enorme(
+    zc: _ZipCategoria,
+    caminho: Path,
+    nivel: int | None,
+    exe,
+    orcamento: OrcamentoMemoria,
+    numero_processadores: int,
+):
+    blocos_pendentes = _blocos_pendentes_enorme(numero_processadores, orcamento)
+    custo = _custo_memoria_enorme(blocos_pendentes)
+    orcamento.reserva(custo)
+    try:
+        zc.handle.write_file_parallel(
+            caminho,
+            exe,
+            str(caminho.name),
+            compresslevel=nivel,
+            max_pending=blocos_pendentes,
+        )
+    except BaseException as e:
+        zc.conclui_tarefa([caminho], e)
+        orcamento.libera(custo)
+        raise
+    _libera_orcamento_apos_gravacao(zc, [caminho], orcamento, custo)
+    zc.conclui_tarefa([caminho])
+
+
+class _DestinoZip(NamedTuple):
+    categoria: str
+    caminho_zip: str
+    # Índice da parte, nas categorias divididas em partes
+    parte: int | None
+    arquivos: list[str]
+
+
+def _remove_zip(caminho_zip: str):
+    for caminho in [caminho_zip, caminho_indice(caminho_zip)]:
+        if isfile(caminho):
+            remove(caminho)
+
+
+def _destinos_categoria(
+    categoria: str, arquivos: list[str], diretorio_base: str, partes: int
+) -> list[_DestinoZip]:
+    """
+    Zips de uma categoria: um único zip ou, com mais de uma parte, uma
+    parte por zip, com os arquivos repartidos pelo nome e um manifesto
+    que as reúne no zip lógico da categoria. Os zips de execuções
+    anteriores com outra divisão, e os seus índices, são removidos.
+    """
+    caminho_zip = join(curdir, f"{categoria}_{diretorio_base}.zip")
+    caminhos = caminhos_partes(caminho_zip, partes) if partes > 1 else []
+    for anterior in partes_existentes(caminho_zip):
+        if anterior not in caminhos:
+            _remove_zip(anterior)
+    if partes <= 1:
+        if isfile(caminho_manifesto(caminho_zip)):
+            remove(caminho_manifesto(caminho_zip))
+        return [_DestinoZip(categoria, caminho_zip, None, arquivos)]
+    _remove_zip(caminho_zip)
+    grupos: list[list[str]] = [[] for _ in range(partes)]
     for a in arquivos:
-        if isfile(join(curdir, a)):
-            remove(a)
+        if a is None:
+            continue
+        grupos[parte_da_entrada(Path(a).name, partes)].append(a)
+    escreve_manifesto(caminho_zip, caminhos)
+    return [
+        _DestinoZip(categoria, c, i, g)
+        for i, (c, g) in enumerate(zip(caminhos, grupos))
+    ]
+
+
+class _TarefaZip(NamedTuple):
+    tamanho: int
+    zc: _ZipCategoria
+    caminhos: list[Path]
+    # Arquivos enormes são uma tarefa de um único arquivo, cujos blocos
+    # são comprimidos pelo pool, com o nível de compressão dado
+    enorme: bool = False
+    nivel: int | None = None
 
 
-async def run_terminal_retry(
-    cmds: list[str],
-    num_retry: int = RETRY_DEFAULT,
-    timeout: float = TIMEOUT_DEFAULT,
-) -> tuple[int, str]:
+def zip_categorias_paralelo(
+    categorias: dict[str, list[str]],
+    numero_processadores: int,
+    limite_arquivos_pequenos: int = LIMITE_ARQUIVOS_PEQUENOS,
+    limite_deflate_paralelo: int = LIMITE_DEFLATE_PARALELO,
+    backend: str = BACKEND_THREAD,
+    arquivos_limpar: list[str] | None = None,
+    politica: PoliticaCompressao = POLITICA_PADRAO,
+    remocao_incremental: bool = False,
+    max_memoria: int | None = None,
+    ordenado: bool = False,
+    diario: DiarioCompressao | None = None,
+    metricas: Metricas | None = None,
+    rastreamento: Tracer | None = None,
+    partes: dict[str, int] | None = None,
+):
+    """
+    Constrói os zips de várias categorias ao mesmo tempo, com um único
+    pool de compressão alimentado pelas tarefas de todas elas (da maior
+    para a menor) e um zip, com sua própria thread de escrita, por
+    categoria. Os arquivos em `arquivos_limpar` são removidos assim que
+    todos os zips que os contêm são concluídos ou, com
+    `remocao_incremental`, assim que todas as suas entradas são gravadas
+    e sincronizadas em disco. O codec de cada arquivo é definido pela
+    `politica`, com o nome do zip como categoria. Novas tarefas só entram
+    no pool enquanto a memória estimada em trânsito está abaixo de
+    `max_memoria` bytes. Com `ordenado`, as entradas de cada zip são
+    escritas em ordem alfabética, como em `zip_arquivos`, e as tarefas
+    seguem essa ordem em vez da LPT. Com um `diario`, as entradas
+    gravadas são registradas e os zips interrompidos em uma execução
+    anterior são retomados, comprimindo apenas os arquivos que faltam.
+    Com `metricas`, cada zip registra uma etapa ao ser fechado. Com um
+    `rastreamento`, as etapas de leitura, compressão, espera e escrita
+    de cada arquivo são registradas por thread, para a linha do tempo.
+    As categorias em `partes` são divididas no número de zips dado, cada
+    um com a sua thread de escrita, e um manifesto.
     """
-    Runs a command on the terminal (with retries) and returns.
+    inicio = perf_counter()
+    diretorio_base = Path(curdir).resolve().parts[-1]
+    destinos = [
+        d
+        for nome_zip, arquivos in categorias.items()
+        for d in _destinos_categoria(
+            nome_zip, arquivos, diretorio_base, (partes or {}).get(nome_zip, 1)
+        )
+    ]
+    for d in destinos:
+        print(f"Compactando arquivos para {basename(d.caminho_zip)}")
+    print(f"Paralelizando em {numero_processadores} processos ({backend})")
+    contador = _ContadorRemocao(set(arquivos_limpar or []))
+    orcamento = OrcamentoMemoria(max_memoria)
+    tarefas: list[_TarefaZip] = []
+    enormes: list[_TarefaZip] = []
+    with ExitStack() as pilha:
+        for nome_zip, caminho_zip, parte, arquivos in destinos:
+            tamanhos = _tamanhos_arquivos(arquivos)
+            caminhos = list(tamanhos.keys())
+            retomada = (
+                diario.retoma(caminho_zip, [c.name for c in caminhos])
+                if diario is not None
+                else None
+            )
+            gravados: set[str] = set()
+            if retomada is not None:
+                gravados = {z.filename for z in retomada.entradas}
+                if retomada.concluido and all(
+                    c.name in gravados for c in caminhos
+                ):
+                    print(f"{basename(caminho_zip)} já concluído")
+                    diario.conclui(caminho_zip)
+                    contador.registra(caminhos)
+                    contador.libera(caminhos)
+                    continue
+                if len(gravados) > 0:
+                    print(
+                        f"Retomando {basename(caminho_zip)} com "
+                        + f"{len(gravados)} arquivos já gravados"
+                    )
+                tamanhos = {
+                    c: t for c, t in tamanhos.items() if c.name not in gravados
+                }
+            # Os arquivos enormes comprimidos com deflate são divididos em
+            # blocos, que entram na fila do pool depois das demais tarefas
+            # e equilibram o final.
+            enormes_categoria: dict[Path, int | None] = {}
+            if numero_processadores > 1:
+                for c, t in tamanhos.items():
+                    if t < limite_deflate_paralelo:
+                        continue
+                    compress_type, nivel = politica.codec(nome_zip, c)
+                    if compress_type == ZIP_DEFLATED:
+                        enormes_categoria[c] = nivel
+            tamanhos_enormes = {c: tamanhos.pop(c) for c in enormes_categoria}
+            tarefas_categoria = _agenda_tarefas_zip(
+                tamanhos, limite_arquivos_pequenos, ordenado, tamanhos_enormes
+            )
+            if len(gravados) > 0:
+                handle = ZipFileParallel.reopen(
+                    caminho_zip,
+                    retomada.entradas,
+                    retomada.fim,
+                    compression=ZIP_DEFLATED,
+                    tracer=rastreamento,
+                )
+            else:
+                handle = ZipFileParallel(
+                    caminho_zip,
+                    "w",
+                    compression=ZIP_DEFLATED,
+                    tracer=rastreamento,
+                )
+            pilha.enter_context(handle)
+            handle.start_writer(
+                sorted(str(c.name) for c in caminhos if c.name not in gravados)
+                if ordenado
+                else None
+            )
+            zc = _ZipCategoria(
+                nome_zip,
+                handle,
+                caminhos,
+                len(tarefas_categoria) + len(enormes_categoria),
+                contador,
+                remocao_incremental,
+                diario,
+                metricas,
+                inicio,
+                parte,
+            )
+            # As entradas mantidas já foram registradas no diário
+            if remocao_incremental:
+                contador.libera([c for c in caminhos if c.name in gravados])
+            tarefas += [_TarefaZip(t, zc, c) for t, c in tarefas_categoria]
+            enormes += [
+                _TarefaZip(t, zc, [c], True, enormes_categoria[c])
+                for c, t in tamanhos_enormes.items()
+            ]
+        # Os arquivos enormes são conduzidos após as demais tarefas ou,
+        # na escrita ordenada, na sua vez, para não reter as entradas
+        # seguintes
+        if ordenado:
+            sequencia = sorted(
+                tarefas + enormes, key=lambda t: t.caminhos[0].name
+            )
+        else:
+            tarefas.sort(key=lambda t: t.tamanho, reverse=True)
+            enormes.sort(key=lambda t: t.tamanho, reverse=True)
+            sequencia = tarefas + enormes
+        if backend == BACKEND_PROCESSO:
+            _zip_tarefas_processos(
+                sequencia,
+                numero_processadores,
+                politica,
+                orcamento,
+                rastreamento is not None,
+            )
+        else:
+            _zip_tarefas_threads(
+                sequencia, numero_processadores, politica, orcamento
+            )
+    print(f"Pico de memória em trânsito: {orcamento.pico / (1 << 20):.1f} MB")
 
-    :param cmds: Commands and args to be executed
-    :param num_retry: Max number of retries
-    :param timeout: Timeout for giving up on the command
-    :return: Return code and outputs
-    :rtype: Tuple[int, str]
+
+def _zip_tarefas_threads(
+    sequencia: list[_TarefaZip],
+    numero_processadores: int,
+    politica: PoliticaCompressao,
+    orcamento: OrcamentoMemoria,
+):
+    """
+    Comprime as tarefas em um pool de threads, que entregam as entradas
+    aos escritores dos zips. Esta thread só submete uma tarefa após
+    reservar a sua memória no `orcamento`, e conduz os arquivos enormes.
     """
-    for _ in range(num_retry):
-        cod, outputs = await run_terminal(cmds, timeout)
-        if cod == 0:
-            return cod, outputs
-    return -1, ""
+    fs = []
+    with ThreadPoolExecutor(
+        numero_processadores, thread_name_prefix="compressor"
+    ) as exe:
+        for t in sequencia:
+            if t.enorme:
+                _executa_tarefa_zip_enorme(
+                    t.zc,
+                    t.caminhos[0],
+                    t.nivel,
+                    exe,
+                    orcamento,
+                    numero_processadores,
+                )
+                continue
+            custo = _custo_memoria_tarefa(t.tamanho)
+            orcamento.reserva(custo)
+            fs.append(
+                exe.submit(
+                    _executa_tarefa_zip,
+                    t.zc,
+                    t.caminhos,
+                    politica,
+                    orcamento,
+                    custo,
+                )
+            )
 
+    wait(fs)
+    for future in fs:
+        future.result()
 
-async def run_terminal(
-    cmds: list[str], timeout: float = TIMEOUT_DEFAULT
-) -> tuple[int | None, str]:
+
+def zip_arquivos_paralelo(
+    arquivos: list[str],
+    nome_zip: str,
+    numero_processadores: int,
+    limite_arquivos_pequenos: int = LIMITE_ARQUIVOS_PEQUENOS,
+    limite_deflate_paralelo: int = LIMITE_DEFLATE_PARALELO,
+    backend: str = BACKEND_THREAD,
+    politica: PoliticaCompressao = POLITICA_PADRAO,
+    max_memoria: int | None = None,
+    ordenado: bool = False,
+    rastreamento: Tracer | None = None,
+    partes: int = 1,
+):
+    zip_categorias_paralelo(
+        {nome_zip: arquivos},
+        numero_processadores,
+        limite_arquivos_pequenos,
+        limite_deflate_paralelo,
+        backend,
+        politica=politica,
+        max_memoria=max_memoria,
+        ordenado=ordenado,
+        rastreamento=rastreamento,
+        partes={nome_zip: partes},
+    )
+
+
+def _zip_tarefas_processos(
+    sequencia: list[_TarefaZip],
+    numero_processadores: int,
+    politica: PoliticaCompressao,
+    orcamento: OrcamentoMemoria,
+    rastreia: bool = False,
+):
     """
-    Runs a command on the terminal and returns.
+    Comprime os lotes em processos filhos, que devolvem apenas CRC,
+    tamanhos e a referência da memória compartilhada com o conteúdo
+    comprimido (e, com `rastreia`, as etapas registradas no filho). Esta
+    thread entrega os lotes aos escritores dos zips, enquanto uma thread
+    auxiliar submete os lotes, reservando a sua memória no `orcamento`
+    até que sejam escritos, e conduz os arquivos enormes.
+    """
+    concluidos: Queue = Queue()
+    lotes = [t for t in sequencia if not t.enorme]
+
+    def conclui(t: _TarefaZip, custo: int, future):
+        concluidos.put((future, t, custo, None))
+
+    def submete_lotes():
+        submetidos = 0
+        try:
+            for t in sequencia:
+                if t.enorme:
+                    _executa_tarefa_zip_enorme(
+                        t.zc,
+                        t.caminhos[0],
+                        t.nivel,
+                        exe,
+                        orcamento,
+                        numero_processadores,
+                    )
+                    continue
+                custo = _custo_memoria_tarefa(t.tamanho)
+                orcamento.reserva(custo)
+                try:
+                    future = exe.submit(
+                        _comprime_lote_processo,
+                        t.caminhos,
+                        politica,
+                        t.zc.nome,
+                        rastreia,
+                    )
+                except BaseException:
+                    orcamento.libera(custo)
+                    raise
+                submetidos += 1
+                future.add_done_callback(partial(conclui, t, custo))
+        except BaseException as e:
+            # Marca os lotes restantes como não executados
+            for t in lotes[submetidos:]:
+                concluidos.put((None, t, 0, e))
+            raise
+
+    with (
+        ProcessPoolExecutor(numero_processadores) as exe,
+        ThreadPoolExecutor(1, thread_name_prefix="condutor") as condutor,
+    ):
+        f_condutor = condutor.submit(submete_lotes)
+        erros: list[BaseException] = []
+        for _ in range(len(lotes)):
+            future, t, custo, erro = concluidos.get()
+            zc, caminhos = t.zc, t.caminhos
+            try:
+                if erro is not None:
+                    raise erro
+                lote = future.result()
+            except BaseException as e:  # noqa: BLE001
+                erros.append(e)
+                zc.conclui_tarefa(caminhos, e)
+                orcamento.libera(custo)
+                continue
+            # Após um erro, apenas libera a memória compartilhada dos lotes
+            if len(erros) > 0:
+                release_shared(lote)
+                zc.conclui_tarefa(caminhos, erros[0])
+                orcamento.libera(custo)
+                continue
+            try:
+                zc.handle.write_shared(
+                    caminhos, [str(c.name) for c in caminhos], lote
+                )
+            except BaseException as e:  # noqa: BLE001
+                erros.append(e)
+                zc.conclui_tarefa(caminhos, e)
+                orcamento.libera(custo)
+                continue
+            _libera_orcamento_apos_gravacao(zc, caminhos, orcamento, custo)
+            zc.conclui_tarefa(caminhos)
+        f_condutor.result()
+        if len(erros) > 0:
+            raise erros[0]
 
-    :param cmds: Commands and args to be executed
-    :param timeout: Timeout for giving up on the command
-    :return: Return code and outputs
-    :rtype: Tuple[int, str]
+
+def zip_categorias(
+    categorias: dict[str, list[str]],
+    numero_processadores: int,
+    arquivos_limpar: list[str],
+    politica: PoliticaCompressao = POLITICA_PADRAO,
+    remocao_incremental: bool = False,
+    max_memoria: int | None = None,
+    ordenado: bool = False,
+    diario: DiarioCompressao | None = None,
+    metricas: Metricas | None = None,
+    rastreamento: Tracer | None = None,
+    partes: dict[str, int] | None = None,
+):
+    """
+    Zipa as categorias de saída e remove os `arquivos_limpar`, de maneira
+    serial (um zip após o outro) quando há um único processador, ou
+    com um pool compartilhado entre todos os zips caso contrário. A
+    remoção incremental, o diário, o rastreamento e a divisão em
+    `partes` sempre usam o pool compartilhado. Com `metricas`, cada zip
+    registra uma etapa.
     """
-    cmd = " ".join(cmds)
-    proc = await asyncio.create_subprocess_shell(
-        cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    if (
+        numero_processadores > 1
+        or remocao_incremental
+        or diario is not None
+        or rastreamento is not None
+        or any(n > 1 for n in (partes or {}).values())
+    ):
+        zip_categorias_paralelo(
+            categorias,
+            numero_processadores,
+            arquivos_limpar=arquivos_limpar,
+            politica=politica,
+            remocao_incremental=remocao_incremental,
+            max_memoria=max_memoria,
+            ordenado=ordenado,
+            diario=diario,
+            metricas=metricas,
+            rastreamento=rastreamento,
+            partes=partes,
+        )
+        return
+    for nome_zip, arquivos in categorias.items():
+        if metricas is None:
+            zip_arquivos(arquivos, nome_zip, politica)
+            continue
+        with metricas.etapa(f"zip_{nome_zip}") as metrica:
+            metrica.mede_zip(zip_arquivos(arquivos, nome_zip, politica))
+    limpa_arquivos_saida(arquivos_limpar)
+
+
+def limpa_arquivos_saida(arquivos: list[str]):
+    print("Excluindo arquivos...")
+    _reporta_erros_operacoes("excluir", remove_arquivos(arquivos))
+
+
+def reporta_execucao(
+    cmds: list[str], resultado: TerminalResult, prefix: str = ""
+):
+    print(
+        f"{prefix}{' '.join(cmds)}: {resultado.wall_time:.2f} s, "
+        + f"CPU {resultado.cpu_time:.2f} s, "
+        + f"pico de memória {resultado.peak_rss / (1 << 20):.0f} MB"
     )
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
-    if stdout:
-        return proc.returncode, stdout.decode("utf-8")
-    if stderr:
-        return proc.returncode, stderr.decode("utf-8")
-    return -1, ""
@@ -18,8 +18,274 @@ Usage Example:
 
 """
 
-import zipfile
+import concurrent.futures
+import json
+import os
+import queue
+import struct
+import tempfile
+import threading
 import time
+import zipfile
+import zlib
+from collections import deque
+from collections.abc import Callable
+from contextlib import ExitStack, contextmanager, nullcontext
+from functools import partial
+from multiprocessing import current_process, resource_tracker, shared_memory
+from typing import NamedTuple
+
+# Size of the chunks read and compressed at a time when streaming files
+CHUNK_SIZE = 1 << 20
+# Compressed bytes kept in memory before the spool rolls over to disk
+SPOOL_MAX_SIZE = 32 << 20
+# Size of the blocks deflated concurrently by write_file_parallel
+BLOCK_SIZE = 4 << 20
+# Deflate window carried over from the previous block as a dictionary
+DICT_SIZE = 32 << 10
+# Entries waiting for the writer thread before the compressors block
+WRITER_QUEUE_SIZE = 16
+# Early entries an ordered writer keeps in memory; further ones have
+# their spools rolled over to disk while they wait for their turn
+REORDER_WINDOW = 64
+# Durable callbacks that may wait for a single shared fsync
+DURABLE_BATCH = 64
+
+
+def _gf2_matrix_times(mat, vec):
+    total = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            total ^= mat[i]
+        vec >>= 1
+        i += 1
+    return total
+
+
+def _gf2_matrix_square(mat):
+    return [_gf2_matrix_times(mat, mat[n]) for n in range(32)]
+
+
+def crc32_combine(crc1, crc2, len2):
+    """CRC-32 of the concatenation of two buffers, given the CRC of each
+    one and the length of the second (port of zlib's crc32_combine)."""
+    if len2 <= 0:
+        return crc1
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_matrix_square(odd)
+    odd = _gf2_matrix_square(even)
+    while True:
+        even = _gf2_matrix_square(odd)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(even, crc1)
+        len2 >>= 1
+        if len2 == 0:
+            break
+        odd = _gf2_matrix_square(even)
+        if len2 & 1:
+            crc1 = _gf2_matrix_times(odd, crc1)
+        len2 >>= 1
+        if len2 == 0:
+            break
+    return crc1 ^ crc2
+
+
+def compress_stream(
+    src, dest, compress_type, compresslevel, chunk_size, trace=None
+):
+    """Copy 'src' into 'dest' compressing it in chunks of 'chunk_size'
+    bytes. Returns the CRC and the uncompressed and compressed sizes.
+    If given, 'trace(name, start, end)' is called with the read and
+    compress span of each chunk."""
+    compressor = zipfile._get_compressor(compress_type, compresslevel)
+    crc = 0
+    file_size = 0
+    compress_size = 0
+    while True:
+        if trace is not None:
+            start = time.perf_counter_ns()
+        chunk = src.read(chunk_size)
+        if trace is not None:
+            read = time.perf_counter_ns()
+            trace("read", start, read)
+        if not chunk:
+            break
+        file_size += len(chunk)
+        crc = zipfile.crc32(chunk, crc)
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        dest.write(chunk)
+        compress_size += len(chunk)
+        if trace is not None:
+            trace("compress", read, time.perf_counter_ns())
+    if compressor is not None:
+        chunk = compressor.flush()
+        dest.write(chunk)
+        compress_size += len(chunk)
+    return crc, file_size, compress_size
+
+
+class SharedEntry(NamedTuple):
+    compress_type: int
+    crc: int
+    file_size: int
+    compress_size: int
+    offset: int
+    temp_path: str | None
+
+
+class SharedBatch(NamedTuple):
+    shm_name: str | None
+    entries: list
+    # Spans recorded in the worker process, when traced
+    events: list | None = None
+
+
+class _SharedSpool:
+    """Gathers the compressed streams of a batch of files in one buffer,
+    handed over to the parent process as a single shared memory block.
+    Streams larger than SPOOL_MAX_SIZE go to a temporary file instead."""
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._buffer = bytearray()
+        self._start = 0
+        self._file = None
+        self.temp_paths = []
+
+    def begin(self):
+        self._start = len(self._buffer)
+        self._file = None
+
+    def write(self, data):
+        if (
+            self._file is None
+            and len(self._buffer) - self._start + len(data) > SPOOL_MAX_SIZE
+        ):
+            self._file = tempfile.NamedTemporaryFile(  # noqa: SIM115
+                dir=self._directory, prefix=".zfp", delete=False
+            )
+            self.temp_paths.append(self._file.name)
+            self._file.write(self._buffer[self._start :])
+            del self._buffer[self._start :]
+        if self._file is not None:
+            self._file.write(data)
+        else:
+            self._buffer += data
+
+    def end(self):
+        """Returns the offset of the stream in the buffer and the path of
+        its temporary file, when it was moved to one."""
+        if self._file is not None:
+            self._file.close()
+            return 0, self._file.name
+        return self._start, None
+
+    def export(self):
+        if len(self._buffer) == 0:
+            return None
+        shm = shared_memory.SharedMemory(create=True, size=len(self._buffer))
+        shm.buf[: len(self._buffer)] = self._buffer
+        name = shm.name
+        shm.close()
+        # the block now belongs to the parent process, which unlinks it
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return name
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+        for path in self.temp_paths:
+            os.remove(path)
+
+
+def compress_files_shared(
+    filenames, codecs, chunk_size=CHUNK_SIZE, trace=False
+):
+    """Compress a batch of files in a worker process, each one with its
+    (compress_type, compresslevel) pair from 'codecs'. Only a SharedBatch
+    goes back through the pipe: the compressed streams stay in one shared
+    memory block (or, for large outputs, temporary files next to the
+    sources), to be written by ZipFileParallel.write_shared. With
+    'trace', the batch carries the spans of the worker process."""
+    entries = []
+    tracer = Tracer() if trace else None
+    spool = _SharedSpool(os.path.dirname(os.path.abspath(filenames[0])))
+    try:
+        for filename, (compress_type, compresslevel) in zip(filenames, codecs):
+            spool.begin()
+            name = os.path.basename(filename)
+            with (
+                tracer.span(name, file=name) if tracer else nullcontext(),
+                open(filename, "rb") as src,
+            ):
+                crc, file_size, compress_size = compress_stream(
+                    src,
+                    spool,
+                    compress_type,
+                    compresslevel,
+                    chunk_size,
+                    _file_trace(tracer, name),
+                )
+            offset, temp_path = spool.end()
+            entries.append(
+                SharedEntry(
+                    compress_type,
+                    crc,
+                    file_size,
+                    compress_size,
+                    offset,
+                    temp_path,
+                )
+            )
+        shm_name = spool.export()
+    except BaseException:
+        spool.discard()
+        raise
+    return SharedBatch(
+        shm_name, entries, tracer.events() if tracer is not None else None
+    )
+
+
+def _file_trace(tracer, name):
+    if tracer is None:
+        return None
+    return partial(tracer.add, file=name)
+
+
+def release_shared(batch):
+    """Free the shared memory block and temporary files of a batch that
+    will not be written."""
+    if batch.shm_name is not None:
+        shm = shared_memory.SharedMemory(batch.shm_name)
+        shm.close()
+        shm.unlink()
+    for entry in batch.entries:
+        if entry.temp_path is not None and os.path.exists(entry.temp_path):
+            os.remove(entry.temp_path)
+
+
+def deflate_block(data, level, zdict, last):
+    """Raw-deflate one block of a larger stream. Blocks other than the
+    last end on a Z_SYNC_FLUSH boundary, so the outputs of consecutive
+    blocks concatenate into a single valid deflate stream. 'zdict' is
+    the tail of the previous block, which keeps the ratio close to the
+    one of a serial compression."""
+    if zdict:
+        compressor = zlib.compressobj(
+            level,
+            zlib.DEFLATED,
+            -zlib.MAX_WBITS,
+            zlib.DEF_MEM_LEVEL,
+            zlib.Z_DEFAULT_STRATEGY,
+            zdict,
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    out = compressor.compress(data)
+    out += compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return out, zlib.crc32(data), len(data)
 
 
 class EmptyCompressor(object):
@@ -27,7 +293,377 @@ class EmptyCompressor(object):
         return bytes(0)
 
 
+class Tracer:
+    """Collects timed spans of the threads (and worker processes) that
+    read, compress and write archive entries, to be dumped as Chrome
+    trace-event JSON and loaded in Perfetto or about:tracing. Spans are
+    'X' events on a monotonic clock, shared by the processes of the
+    host, with one track per thread."""
+
+    def __init__(self):
+        self._events = []
+        self._tracks = set()
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, **args):
+        """Record a span of the calling thread between 'start' and 'end',
+        given by time.perf_counter_ns."""
+        pid = os.getpid()
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": "zip",
+            "ph": "X",
+            "ts": start / 1000,
+            "dur": (end - start) / 1000,
+            "pid": pid,
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self._lock:
+            if (pid, thread.ident) not in self._tracks:
+                self._add_track(pid, thread)
+            self._events.append(event)
+
+    def _add_track(self, pid, thread):
+        if all(p != pid for p, _ in self._tracks):
+            self._events.append(
+                _metadata("process_name", pid, 0, current_process().name)
+            )
+        self._tracks.add((pid, thread.ident))
+        self._events.append(
+            _metadata("thread_name", pid, thread.ident, thread.name)
+        )
+
+    @contextmanager
+    def span(self, name, **args):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter_ns(), **args)
+
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def extend(self, events):
+        """Merge the events recorded by a Tracer in another process."""
+        with self._lock:
+            for event in events:
+                if event["ph"] == "M":
+                    track = (event["pid"], event["tid"])
+                    if event["name"] == "thread_name":
+                        if track in self._tracks:
+                            continue
+                        self._tracks.add(track)
+                self._events.append(event)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {"traceEvents": self.events(), "displayTimeUnit": "ms"}, f
+            )
+
+
+def _metadata(name, pid, tid, value):
+    return {
+        "name": name,
+        "ph": "M",
+        "pid": pid,
+        "tid": tid,
+        "args": {"name": value},
+    }
+
+
+def _traced(tracer, name, args, function, *fargs):
+    start = time.perf_counter_ns()
+    try:
+        return function(*fargs)
+    finally:
+        tracer.add(name, start, time.perf_counter_ns(), **args)
+
+
+class _Entry(NamedTuple):
+    zinfo: zipfile.ZipInfo
+    crc: int
+    data: object
+    compress_size: int
+    release: Callable | None
+
+
+class _Barrier(NamedTuple):
+    arcnames: list
+    callback: Callable
+    durable: bool
+
+
+def _release(entry):
+    if entry.release is not None:
+        entry.release()
+
+
+def _close_and_remove(fileobj, path):
+    fileobj.close()
+    os.remove(path)
+
+
+def _release_shared_memory(shm, error):
+    try:
+        shm.close()
+    except BufferError:
+        # Views still held by entries discarded after a writer error
+        pass
+    shm.unlink()
+
+
+class _Writer:
+    """Thread that writes the entries handed over by the compressors, so
+    that they never wait on the archive file. With 'order', a list of
+    arcnames, entries are written in that sequence: early ones are kept
+    aside (rolled over to disk beyond 'reorder_window') until the ones
+    before them arrive, and whatever is still waiting when the writer
+    stops is written in order, skipping the names that never came."""
+
+    def __init__(self, archive, queue_size, order, reorder_window):
+        self.archive = archive
+        self.queue = queue.Queue(queue_size)
+        self.order = order
+        self.index = (
+            {} if order is None else {n: i for i, n in enumerate(order)}
+        )
+        self.position = 0
+        self.reorder_window = reorder_window
+        self.early = {}
+        self.written = set()
+        self.waiting = {}
+        self.durable_ready = []
+        self.error = None
+        name = "writer"
+        if isinstance(archive.filename, (str, os.PathLike)):
+            name = f"writer {os.path.basename(archive.filename)}"
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        # Any error keeps the queue draining, with entries released and
+        # barriers failed, so that producers never block on a dead writer
+        while (item := self.queue.get()) is not None:
+            try:
+                if isinstance(item, _Barrier):
+                    self.register(item)
+                else:
+                    self.accept(item)
+                if (
+                    self.queue.empty()
+                    or len(self.durable_ready) >= DURABLE_BATCH
+                ):
+                    self.flush_durable()
+            except BaseException as e:  # noqa: BLE001
+                self.fail(e)
+        try:
+            for name in sorted(self.early, key=self.index.get):
+                self.write(self.early.pop(name))
+            self.flush_durable()
+        except BaseException as e:  # noqa: BLE001
+            self.fail(e)
+        self.fail_waiting(
+            self.error or ValueError("Entries never written to the archive")
+        )
+
+    def accept(self, entry):
+        name = entry.zinfo.filename
+        if self.error is not None:
+            _release(entry)
+        elif name not in self.index:
+            self.write(entry)
+        else:
+            self.early[name] = entry
+            if len(self.early) > self.reorder_window and hasattr(
+                entry.data, "rollover"
+            ):
+                entry.data.rollover()
+            while self.position < len(self.order):
+                name = self.order[self.position]
+                if name in self.early:
+                    self.write(self.early.pop(name))
+                elif name not in self.written:
+                    break
+                self.position += 1
+
+    def write(self, entry):
+        if self.error is not None:
+            _release(entry)
+            return
+        try:
+            self.archive._write_entry(
+                entry.zinfo, entry.crc, entry.data, entry.compress_size
+            )
+        except BaseException as e:  # noqa: BLE001
+            self.error = e
+        finally:
+            _release(entry)
+        if self.error is not None:
+            self.fail(self.error)
+            return
+        name = entry.zinfo.filename
+        self.written.add(name)
+        for barrier in self.waiting.pop(name, []):
+            barrier[0] -= 1
+            if barrier[0] == 0:
+                self.fire(barrier[1], barrier[2])
+
+    def fail(self, error):
+        """Record 'error', release the entries kept aside and fail the
+        barriers still waiting; later entries are released unwritten."""
+        if self.error is None:
+            self.error = error
+        for pending in self.early.values():
+            _release(pending)
+        self.early.clear()
+        self.flush_durable()
+        self.fail_waiting(self.error)
+
+    def register(self, barrier):
+        if self.error is not None:
+            self.call(barrier.callback, self.error)
+            return
+        pending = [n for n in barrier.arcnames if n not in self.written]
+        if len(pending) == 0:
+            self.fire(barrier.callback, barrier.durable)
+            return
+        state = [len(pending), barrier.callback, barrier.durable]
+        for name in pending:
+            self.waiting.setdefault(name, []).append(state)
+
+    def fire(self, callback, durable):
+        if durable:
+            self.durable_ready.append(callback)
+        else:
+            self.call(callback, None)
+
+    def flush_durable(self):
+        if len(self.durable_ready) == 0:
+            return
+        error = None
+        try:
+            self.archive.sync()
+        except OSError as e:
+            error = e
+            if self.error is None:
+                self.error = e
+        ready, self.durable_ready = self.durable_ready, []
+        for callback in ready:
+            self.call(callback, error)
+
+    def fail_waiting(self, error):
+        barriers = {id(b): b for bs in self.waiting.values() for b in bs}
+        self.waiting.clear()
+        for barrier in barriers.values():
+            self.call(barrier[1], error)
+
+    def call(self, callback, error):
+        try:
+            callback(error)
+        except BaseException as e:  # noqa: BLE001
+            if self.error is None:
+                self.error = e
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+def read_local_header(fp, offset):
+    """Read the local file header at 'offset', returning a ZipInfo with
+    the fields it holds and the offset where the entry data starts, or
+    None if there is no valid header there. Sizes stored in a zip64
+    extra field are not decoded."""
+    fp.seek(offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    if len(header) < zipfile.sizeFileHeader:
+        return None
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+        return None
+    name = fp.read(fields[zipfile._FH_FILENAME_LENGTH])
+    extra = fp.read(fields[zipfile._FH_EXTRA_FIELD_LENGTH])
+    if (
+        len(name) < fields[zipfile._FH_FILENAME_LENGTH]
+        or len(extra) < fields[zipfile._FH_EXTRA_FIELD_LENGTH]
+    ):
+        return None
+    flags = fields[zipfile._FH_GENERAL_PURPOSE_FLAG_BITS]
+    name = name.decode("utf-8" if flags & 0x800 else "cp437")
+    date = fields[zipfile._FH_LAST_MOD_DATE]
+    time = fields[zipfile._FH_LAST_MOD_TIME]
+    zinfo = zipfile.ZipInfo(
+        name,
+        (
+            (date >> 9) + 1980,
+            (date >> 5) & 0xF,
+            date & 0x1F,
+            time >> 11,
+            (time >> 5) & 0x3F,
+            (time & 0x1F) * 2,
+        ),
+    )
+    zinfo.extract_version = fields[zipfile._FH_EXTRACT_VERSION]
+    zinfo.flag_bits = flags
+    zinfo.compress_type = fields[zipfile._FH_COMPRESSION_METHOD]
+    zinfo.CRC = fields[zipfile._FH_CRC]
+    zinfo.compress_size = fields[zipfile._FH_COMPRESSED_SIZE]
+    zinfo.file_size = fields[zipfile._FH_UNCOMPRESSED_SIZE]
+    zinfo.header_offset = offset
+    return zinfo, fp.tell()
+
+
 class ZipFileParallel(zipfile.ZipFile):
+    def __init__(self, *args, tracer=None, **kwargs):
+        self._writer = None
+        # Records the spans of every thread writing into the archive
+        self.tracer = tracer
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def reopen(cls, file, entries, end, **kwargs):
+        """Reopen a partially written archive to append entries, keeping
+        the 'entries' already there, whose data ends at offset 'end',
+        and discarding everything after them, such as an entry cut short
+        or a stale central directory."""
+        with ExitStack() as stack:
+            fp = stack.enter_context(open(file, "r+b"))
+            fp.truncate(end)
+            fp.seek(end)
+            archive = cls(fp, "w", **kwargs)
+            stack.pop_all()
+        # Close the file with the archive, as if it had been opened by name
+        archive._filePassed = 0
+        for zinfo in entries:
+            archive.filelist.append(zinfo)
+            archive.NameToInfo[zinfo.filename] = zinfo
+        return archive
+
+    def start_writer(
+        self,
+        order=None,
+        queue_size=WRITER_QUEUE_SIZE,
+        reorder_window=REORDER_WINDOW,
+    ):
+        """Hand every entry written from now on to a dedicated writer
+        thread through a queue of at most 'queue_size' entries. If
+        'order' is given, the entries are written in that sequence of
+        arcnames, which makes the archive reproducible."""
+        self._writer = _Writer(self, queue_size, order, reorder_window)
+
+    def close(self):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.stop()
+        super().close()
+        if writer is not None and writer.error is not None:
+            raise writer.error
+
     def writestr(
         self, zinfo_or_arcname, data, compress_type=None, compresslevel=None
     ):
@@ -70,16 +706,282 @@ class ZipFileParallel(zipfile.ZipFile):
         compressor = zipfile._get_compressor(
             zinfo.compress_type, zinfo._compresslevel
         )
-        data = compressor.compress(data)
-        data += compressor.flush()
+        if compressor is not None:
+            data = compressor.compress(data)
+            data += compressor.flush()
+
+        self.write_compressed(zinfo, crc, data, len(data))
 
+    def write_file(
+        self,
+        filename,
+        arcname=None,
+        compress_type=None,
+        compresslevel=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        """Write the file named 'filename' into the archive, reading,
+        CRCing and compressing it in chunks of 'chunk_size' bytes.
+        The compressed stream is spooled (in memory up to SPOOL_MAX_SIZE,
+        then on a temporary file next to the archive), so the memory
+        used by each worker does not depend on the size of the file."""
+        if not self.fp:
+            raise ValueError(
+                "Attempt to write to ZIP archive that was already closed"
+            )
+        zinfo = self.zinfo_from_file(
+            filename, arcname, compress_type, compresslevel
+        )
+        if zinfo.is_dir():
+            self.write_compressed(zinfo, 0, b"", 0)
+            return
+
+        tracer = self.tracer
+        name = zinfo.filename
+        with tracer.span(name, file=name) if tracer else nullcontext():
+            spool = self.spool()
+            try:
+                with open(filename, "rb") as src:
+                    crc, file_size, compress_size = compress_stream(
+                        src,
+                        spool,
+                        zinfo.compress_type,
+                        zinfo._compresslevel,
+                        chunk_size,
+                        _file_trace(tracer, name),
+                    )
+                spool.seek(0)
+                zinfo.file_size = file_size
+            except BaseException:
+                spool.close()
+                raise
+            self.write_compressed(zinfo, crc, spool, compress_size, spool.close)
+
+    def write_shared(self, filenames, arcnames, batch, compresslevel=None):
+        """Write the entries of a batch compressed by compress_files_shared
+        in another process. The compressed streams are read from the
+        shared memory block (or temporary files) of 'batch', which are
+        released once all of them are written."""
+        if self.tracer is not None and batch.events is not None:
+            self.tracer.extend(batch.events)
+        shm = None
+        if batch.shm_name is not None:
+            shm = shared_memory.SharedMemory(batch.shm_name)
+        handed = []
+        try:
+            for filename, arcname, entry in zip(
+                filenames, arcnames, batch.entries
+            ):
+                zinfo = self.zinfo_from_file(
+                    filename, arcname, entry.compress_type, compresslevel
+                )
+                zinfo.file_size = entry.file_size
+                if entry.temp_path is not None:
+                    src = open(entry.temp_path, "rb")  # noqa: SIM115
+                    release = partial(_close_and_remove, src, entry.temp_path)
+                    data = src
+                elif entry.compress_size == 0:
+                    data, release = b"", None
+                else:
+                    end = entry.offset + entry.compress_size
+                    data = shm.buf[entry.offset : end]
+                    release = data.release
+                handed.append(zinfo.filename)
+                self.write_compressed(
+                    zinfo, entry.crc, data, entry.compress_size, release
+                )
+        finally:
+            for entry in batch.entries[len(handed) :]:
+                if entry.temp_path is not None and os.path.exists(
+                    entry.temp_path
+                ):
+                    os.remove(entry.temp_path)
+            if shm is not None:
+                self.after_written(handed, partial(_release_shared_memory, shm))
+
+    def zinfo_from_file(
+        self, filename, arcname=None, compress_type=None, compresslevel=None
+    ):
+        zinfo = zipfile.ZipInfo.from_file(filename, arcname)
+        zinfo.compress_type = (
+            compress_type if compress_type is not None else self.compression
+        )
+        zinfo._compresslevel = (
+            compresslevel if compresslevel is not None else self.compresslevel
+        )
+        return zinfo
+
+    def write_file_parallel(
+        self,
+        filename,
+        executor,
+        arcname=None,
+        compresslevel=None,
+        block_size=BLOCK_SIZE,
+        max_pending=None,
+    ):
+        """Write the file named 'filename' into the archive as a single
+        deflate entry whose blocks are compressed concurrently on
+        'executor' (pigz-style). The calling thread reads the file and
+        assembles the blocks in order, so it must not be one of the
+        executor workers. At most 'max_pending' blocks are in flight.
+        The entry is always ZIP_DEFLATED, whatever the archive default."""
+        if not self.fp:
+            raise ValueError(
+                "Attempt to write to ZIP archive that was already closed"
+            )
+        zinfo = self.zinfo_from_file(
+            filename, arcname, zipfile.ZIP_DEFLATED, compresslevel
+        )
+        level = zinfo._compresslevel
+        if level is None:
+            level = zlib.Z_DEFAULT_COMPRESSION
+        if max_pending is None:
+            max_pending = 2 * getattr(executor, "_max_workers", 1)
+
+        tracer = self.tracer
+        name = zinfo.filename
+        deflate = deflate_block
+        # Blocks deflated in other processes are only traced as a whole,
+        # in the span of the file
+        if tracer is not None and not isinstance(
+            executor, concurrent.futures.ProcessPoolExecutor
+        ):
+            deflate = partial(
+                _traced, tracer, "compress", {"file": name}, deflate_block
+            )
+        crc = 0
+        file_size = 0
+        pending = deque()
+        with tracer.span(name, file=name) if tracer else nullcontext():
+            spool = self.spool()
+            try:
+                with open(filename, "rb") as src:
+
+                    def read():
+                        if tracer is None:
+                            return src.read(block_size)
+                        with tracer.span("read", file=name):
+                            return src.read(block_size)
+
+                    def collect():
+                        nonlocal crc, file_size
+                        data, block_crc, length = pending.popleft().result()
+                        spool.write(data)
+                        crc = crc32_combine(crc, block_crc, length)
+                        file_size += length
+
+                    zdict = None
+                    block = read()
+                    while True:
+                        next_block = read()
+                        last = len(next_block) == 0
+                        pending.append(
+                            executor.submit(deflate, block, level, zdict, last)
+                        )
+                        if last:
+                            break
+                        zdict = block[-DICT_SIZE:]
+                        block = next_block
+                        while len(pending) >= max_pending:
+                            collect()
+                    while pending:
+                        collect()
+                compress_size = spool.tell()
+                spool.seek(0)
+                zinfo.file_size = file_size
+            except BaseException:
+                spool.close()
+                raise
+            self.write_compressed(zinfo, crc, spool, compress_size, spool.close)
+
+    def spool(self):
+        """Temporary buffer for a compressed stream, kept on the same
+        filesystem as the archive when it overflows SPOOL_MAX_SIZE."""
+        directory = None
+        if isinstance(self.filename, (str, os.PathLike)):
+            directory = os.path.dirname(os.path.abspath(self.filename))
+        return tempfile.SpooledTemporaryFile(
+            max_size=SPOOL_MAX_SIZE, dir=directory
+        )
+
+    def write_compressed(self, zinfo, crc, data, compress_size, release=None):
+        """Write an already compressed entry into the archive. 'data' is
+        either a bytes-like object or a binary file object positioned at
+        the start of the compressed stream. 'zinfo.file_size' must hold
+        the uncompressed size. With a writer thread the entry is only
+        queued; 'release' is called once 'data' is no longer needed."""
+        writer = self._writer
+        if writer is None:
+            try:
+                self._write_entry(zinfo, crc, data, compress_size)
+            finally:
+                if release is not None:
+                    release()
+            return
+        if writer.error is not None:
+            if release is not None:
+                release()
+            raise writer.error
+        entry = _Entry(zinfo, crc, data, compress_size, release)
+        if self.tracer is None:
+            writer.queue.put(entry)
+            return
+        # Time blocked on a full queue, waiting for the writer thread
+        with self.tracer.span("wait_queue", file=zinfo.filename):
+            writer.queue.put(entry)
+
+    def after_written(self, arcnames, callback, durable=False):
+        """Call 'callback(error)' once the entries named 'arcnames' are
+        written to the archive, after an fsync if 'durable'. 'error' is
+        None on success. Without a writer thread the entries are already
+        written and the callback runs right away."""
+        writer = self._writer
+        if writer is not None:
+            writer.queue.put(_Barrier(list(arcnames), callback, durable))
+            return
+        error = None
+        if durable:
+            try:
+                self.sync()
+            except OSError as e:
+                error = e
+        callback(error)
+        if error is not None:
+            raise error
+
+    def _write_entry(self, zinfo, crc, data, compress_size):
+        """Write an already compressed entry. Only this step takes the
+        archive lock."""
+        tracer = self.tracer
+        if tracer is not None:
+            start = time.perf_counter_ns()
         with self._lock:
+            if tracer is not None:
+                locked = time.perf_counter_ns()
             with self.open(zinfo, mode="w") as dest:
                 dest._compressor = (
                     None  # remove the compressor so it doesn't compress again
                 )
-                dest.write(data)
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    dest._fileobj.write(data)
+                else:
+                    while chunk := data.read(CHUNK_SIZE):
+                        dest._fileobj.write(chunk)
                 dest._crc = crc
                 dest._file_size = zinfo.file_size
-                dest._compress_size = len(data)
+                dest._compress_size = compress_size
                 dest._compressor = EmptyCompressor()  # use an empty compressor
+        if tracer is not None:
+            end = time.perf_counter_ns()
+            name = zinfo.filename
+            tracer.add("wait_lock", start, locked, file=name)
+            tracer.add("write", locked, end, file=name, bytes=compress_size)
+
+    def sync(self):
+        """Flush the entries written so far and fsync the archive, so that
+        their local headers and data survive a crash. The central
+        directory is only written on close."""
+        with self._lock:
+            self.fp.flush()
+            os.fsync(self.fp.fileno())
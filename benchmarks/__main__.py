@@ -0,0 +1,262 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from os.path import abspath, dirname, join
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import click
+
+from app.cli import COMANDOS
+from app.utils import converte_tamanho
+from benchmarks.estrategias import (
+    ESTRATEGIAS,
+    ESTRATEGIAS_ZIP,
+    mede_classificacao,
+    mede_identifica_regex,
+    mede_limpeza,
+    mede_zip,
+)
+from benchmarks.gerador import GERADORES, ParametrosGeracao
+
+
+def _intervalo_tamanhos(intervalo: str) -> tuple[int, int]:
+    minimo, _, maximo = intervalo.partition(":")
+    return converte_tamanho(minimo), converte_tamanho(maximo or minimo)
+
+
+@click.group()
+def benchmarks():
+    """
+    Benchmarks das etapas de pós-processamento sobre casos sintéticos.
+    """
+
+
+@benchmarks.command("gera")
+@click.argument("modelo", type=click.Choice(list(GERADORES.keys())))
+@click.argument("diretorio", type=click.Path(file_okay=False))
+@click.option("--csvs", type=int, default=5000, help="Número de CSVs")
+@click.option(
+    "--tamanho-csv",
+    default="1k:64k",
+    help="Intervalo de tamanhos dos CSVs (mínimo:máximo)",
+)
+@click.option("--relatorios", type=int, default=20)
+@click.option("--tamanho-relatorio", default="64k:8M")
+@click.option(
+    "--binarios",
+    type=int,
+    default=2,
+    help="Número de binários grandes (cortes, estados, forward)",
+)
+@click.option("--tamanho-binario", default="256M")
+@click.option("--temporarios", type=int, default=20)
+@click.option("--semente", type=int, default=0)
+def gera(
+    modelo,
+    diretorio,
+    csvs,
+    tamanho_csv,
+    relatorios,
+    tamanho_relatorio,
+    binarios,
+    tamanho_binario,
+    temporarios,
+    semente,
+):
+    """
+    Gera um caso sintético do MODELO em DIRETORIO.
+    """
+    parametros = ParametrosGeracao(
+        numero_csvs=csvs,
+        tamanho_csv=_intervalo_tamanhos(tamanho_csv),
+        numero_relatorios=relatorios,
+        tamanho_relatorio=_intervalo_tamanhos(tamanho_relatorio),
+        numero_binarios=binarios,
+        tamanho_binario=converte_tamanho(tamanho_binario),
+        numero_temporarios=temporarios,
+        semente=semente,
+    )
+    GERADORES[modelo](diretorio, parametros)
+    print(f"Caso sintético do {modelo.upper()} gerado em {diretorio}")
+
+
+@benchmarks.command("mede", hidden=True)
+@click.argument("estrategia", type=click.Choice(ESTRATEGIAS))
+@click.argument("diretorio", type=click.Path(exists=True, file_okay=False))
+@click.argument("numero_processadores", type=int)
+def mede(estrategia, diretorio, numero_processadores):
+    """
+    Executa uma única medição, escrevendo o resultado em JSON na última
+    linha da saída padrão.
+    """
+    diretorio = abspath(diretorio)
+    if estrategia == "limpeza":
+        with TemporaryDirectory(dir=diretorio) as tmp:
+            os.chdir(tmp)
+            resultado = mede_limpeza(diretorio)
+            os.chdir(diretorio)
+    else:
+        os.chdir(diretorio)
+        if estrategia in ESTRATEGIAS_ZIP:
+            resultado = mede_zip(estrategia, numero_processadores)
+        elif estrategia == "classificacao":
+            resultado = mede_classificacao()
+        else:
+            resultado = mede_identifica_regex()
+    print(json.dumps(resultado))
+
+
+def _compara_baseline(resultados: list[dict], baseline: list[dict]):
+    base = {r["estrategia"]: r for r in baseline}
+    print(f"{'Estratégia':<22}{'Tempo':>12}{'Base':>12}{'Variação':>10}")
+    for r in resultados:
+        if r["estrategia"] not in base:
+            continue
+        b = base[r["estrategia"]]
+        variacao = (
+            100 * (r["tempo_s"] - b["tempo_s"]) / b["tempo_s"]
+            if b["tempo_s"] > 0
+            else 0.0
+        )
+        print(
+            f"{r['estrategia']:<22}{r['tempo_s']:>11.3f}s"
+            + f"{b['tempo_s']:>11.3f}s{variacao:>+9.1f}%"
+        )
+
+
+@benchmarks.command("executa")
+@click.argument("diretorio", type=click.Path(exists=True, file_okay=False))
+@click.option("--processadores", type=int, default=os.cpu_count())
+@click.option(
+    "--estrategias",
+    default=",".join(ESTRATEGIAS),
+    help="Estratégias separadas por vírgula",
+)
+@click.option("--repeticoes", type=int, default=1)
+@click.option(
+    "--saida",
+    type=click.Path(dir_okay=False),
+    default="resultados_benchmark.json",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON de uma execução anterior para comparação",
+)
+def executa(diretorio, processadores, estrategias, repeticoes, saida, baseline):
+    """
+    Mede as estratégias sobre o caso em DIRETORIO. Cada medição roda em
+    um processo próprio, para que o pico de memória seja isolado.
+    """
+    resultados: list[dict] = []
+    for estrategia in estrategias.split(","):
+        if estrategia not in ESTRATEGIAS:
+            raise click.BadParameter(
+                f"Estratégia {estrategia} inválida. Opções: {ESTRATEGIAS}"
+            )
+        for _ in range(repeticoes):
+            r = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks",
+                    "mede",
+                    estrategia,
+                    diretorio,
+                    str(processadores),
+                ],
+                check=True,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            resultado = json.loads(r.stdout.strip().splitlines()[-1])
+            resultado["processadores"] = processadores
+            resultados.append(resultado)
+            print(
+                f"{estrategia:<22}{resultado['tempo_s']:>9.3f}s"
+                + f"{resultado['arquivos_s']:>12.0f} arq/s"
+                + f"{resultado['mb_s']:>10.1f} MB/s"
+                + f"{resultado['pico_rss_mb']:>9.0f} MB RSS"
+                + f"{resultado['razao']:>7.3f}"
+            )
+    with open(saida, "w") as arq:
+        json.dump(
+            {
+                "data": datetime.now().isoformat(),
+                "maquina": {
+                    "plataforma": platform.platform(),
+                    "python": platform.python_version(),
+                    "cpus": os.cpu_count(),
+                },
+                "caso": abspath(diretorio),
+                "resultados": resultados,
+            },
+            arq,
+            indent=4,
+        )
+    print(f"Resultados salvos em {saida}")
+    if baseline is not None:
+        with open(baseline, "r") as arq:
+            _compara_baseline(resultados, json.load(arq)["resultados"])
+
+
+@benchmarks.command("inicializacao")
+@click.option("--repeticoes", type=int, default=5)
+@click.option(
+    "--saida",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="JSON onde são salvos os tempos",
+)
+def inicializacao(repeticoes, saida):
+    """
+    Mede o tempo de início do `main.py`, com `--help` em cada comando,
+    cada chamada em um processo novo.
+    """
+    main = join(dirname(dirname(abspath(__file__))), "main.py")
+    resultados: list[dict] = []
+    for comando in [""] + list(COMANDOS):
+        tempos = []
+        for _ in range(repeticoes):
+            ti = perf_counter()
+            subprocess.run(
+                [sys.executable, main]
+                + ([comando] if comando else [])
+                + ["--help"],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            tempos.append(perf_counter() - ti)
+        resultados.append(
+            {
+                "comando": comando or "main.py",
+                "minimo_s": min(tempos),
+                "mediana_s": median(tempos),
+            }
+        )
+        print(
+            f"{comando or 'main.py':<30}{min(tempos):>9.3f}s"
+            + f"{median(tempos):>9.3f}s"
+        )
+    if saida is not None:
+        with open(saida, "w") as arq:
+            json.dump(
+                {
+                    "data": datetime.now().isoformat(),
+                    "python": platform.python_version(),
+                    "resultados": resultados,
+                },
+                arq,
+                indent=4,
+            )
+        print(f"Resultados salvos em {saida}")
+
+
+if __name__ == "__main__":
+    benchmarks()
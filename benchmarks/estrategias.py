@@ -0,0 +1,194 @@
+import os
+import resource
+from glob import glob
+from os import curdir, listdir, stat
+from os.path import getsize, join
+from time import perf_counter
+
+from app.indice_diretorio import ClassificadorArquivos, IndiceDiretorio
+from app.utils import (
+    BACKEND_PROCESSO,
+    BACKEND_THREAD,
+    identifica_arquivos_via_regex,
+    limpa_arquivos_saida,
+    zip_arquivos,
+    zip_arquivos_paralelo,
+    zip_categorias_paralelo,
+)
+from benchmarks.gerador import le_categorias
+
+# Categorias do caso que não são zipadas como saída
+CATEGORIAS_IGNORADAS = ["deck", "temporarios"]
+# Regex usadas na identificação das saídas, por categoria
+REGEX_SAIDAS = {
+    "operacao": [
+        r"^.*\.CSV$",
+        r"^.*\.out$",
+        r"^dec_oper_.*\.csv$",
+        r"^PDO_.*$",
+    ],
+    "relatorios": [
+        r"^alertainv.*\.rel$",
+        r"^cativo_.*\.rel$",
+        r"^newave_.*\.log$",
+        r"^nwv_.*\.rel$",
+    ],
+    "recursos": [
+        r"^energiaf.*\.dat$",
+        r"^energiab.*\.dat$",
+        r"^energias.*\.dat$",
+        r"^energiaf.*\.csv$",
+        r"^enavazf.*\.dat$",
+        r"^enavazb.*\.dat$",
+        r"^vazaof.*\.dat$",
+        r"^vazaob.*\.dat$",
+        r"^vazaof.*\.csv$",
+        r"^eolicaf.*\.dat$",
+    ],
+    "cortes": [r"^cortes\-[0-9]*.*\.dat$"],
+    "estados": [r"^cortese\-[0-9]*.*\.dat$"],
+    "apagar": [r"^svc.*$"],
+}
+
+
+def _categorias_saida() -> dict[str, list[str]]:
+    return {
+        c: arquivos
+        for c, arquivos in le_categorias(curdir).items()
+        if c not in CATEGORIAS_IGNORADAS
+    }
+
+
+def _zips_gerados() -> list[str]:
+    return glob(join(curdir, "*.zip"))
+
+
+def _zip_serial(numero_processadores: int, backend: str):
+    for nome_zip, arquivos in _categorias_saida().items():
+        zip_arquivos(arquivos, nome_zip)
+
+
+def _zip_paralelo(numero_processadores: int, backend: str):
+    for nome_zip, arquivos in _categorias_saida().items():
+        zip_arquivos_paralelo(
+            arquivos, nome_zip, numero_processadores, backend=backend
+        )
+
+
+def _zip_categorias(numero_processadores: int, backend: str):
+    zip_categorias_paralelo(
+        _categorias_saida(), numero_processadores, backend=backend
+    )
+
+
+ESTRATEGIAS_ZIP = {
+    "zip_serial": (_zip_serial, BACKEND_THREAD),
+    "paralelo_thread": (_zip_paralelo, BACKEND_THREAD),
+    "paralelo_processo": (_zip_paralelo, BACKEND_PROCESSO),
+    "categorias_thread": (_zip_categorias, BACKEND_THREAD),
+    "categorias_processo": (_zip_categorias, BACKEND_PROCESSO),
+}
+ESTRATEGIAS = list(ESTRATEGIAS_ZIP.keys()) + [
+    "identifica_regex",
+    "classificacao",
+    "limpeza",
+]
+
+
+def _pico_rss_mb() -> float:
+    # ru_maxrss é dado em kB no Linux
+    pico = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return pico / 1024
+
+
+def _resultado(
+    estrategia: str,
+    tempo: float,
+    arquivos: int,
+    bytes_entrada: int,
+    bytes_saida: int,
+) -> dict:
+    return {
+        "estrategia": estrategia,
+        "tempo_s": tempo,
+        "arquivos": arquivos,
+        "bytes_entrada": bytes_entrada,
+        "bytes_saida": bytes_saida,
+        "arquivos_s": arquivos / tempo if tempo > 0 else 0.0,
+        "mb_s": bytes_entrada / (1 << 20) / tempo if tempo > 0 else 0.0,
+        "razao": bytes_saida / bytes_entrada if bytes_entrada > 0 else 0.0,
+        "pico_rss_mb": _pico_rss_mb(),
+    }
+
+
+def mede_zip(estrategia: str, numero_processadores: int) -> dict:
+    """
+    Mede uma estratégia de compactação das saídas do caso no diretório
+    corrente, removendo os zips gerados ao final.
+    """
+    funcao, backend = ESTRATEGIAS_ZIP[estrategia]
+    arquivos = {a for c in _categorias_saida().values() for a in c}
+    bytes_entrada = sum(stat(a).st_size for a in arquivos)
+    for z in _zips_gerados():
+        os.remove(z)
+    ti = perf_counter()
+    funcao(numero_processadores, backend)
+    tf = perf_counter()
+    zips = _zips_gerados()
+    bytes_saida = sum(getsize(z) for z in zips)
+    for z in zips:
+        os.remove(z)
+    return _resultado(
+        estrategia, tf - ti, len(arquivos), bytes_entrada, bytes_saida
+    )
+
+
+def mede_identifica_regex(repeticoes: int = 10) -> dict:
+    """
+    Mede a identificação de arquivos por regex sobre o diretório corrente,
+    com uma listagem por categoria e ignorando os arquivos do deck.
+    """
+    ignorar = le_categorias(curdir)["deck"]
+    arquivos = len(listdir(curdir))
+    ti = perf_counter()
+    for _ in range(repeticoes):
+        for lista_regex in REGEX_SAIDAS.values():
+            identifica_arquivos_via_regex(ignorar, lista_regex)
+    tf = perf_counter()
+    return _resultado(
+        "identifica_regex", (tf - ti) / repeticoes, arquivos, 0, 0
+    )
+
+
+def mede_classificacao(repeticoes: int = 10) -> dict:
+    """
+    Mede a indexação do diretório corrente em uma passada e a sua
+    classificação em todas as categorias de saída.
+    """
+    ignorar = le_categorias(curdir)["deck"]
+    classificador = ClassificadorArquivos(REGEX_SAIDAS)
+    ti = perf_counter()
+    for _ in range(repeticoes):
+        indice = IndiceDiretorio()
+        classificador.classifica(indice, ignorar)
+    tf = perf_counter()
+    return _resultado(
+        "classificacao", (tf - ti) / repeticoes, len(indice.entradas), 0, 0
+    )
+
+
+def mede_limpeza(diretorio_caso: str) -> dict:
+    """
+    Mede a exclusão, no diretório corrente, de arquivos vazios com os
+    mesmos nomes dos arquivos do caso.
+    """
+    nomes = [a for c in le_categorias(diretorio_caso).values() for a in c]
+    for a in nomes:
+        open(a, "wb").close()
+    ti = perf_counter()
+    limpa_arquivos_saida(nomes)
+    tf = perf_counter()
+    return _resultado("limpeza", tf - ti, len(nomes), 0, 0)
@@ -0,0 +1,415 @@
+import json
+import os
+import random
+import struct
+from os.path import join
+
+# Arquivo com as categorias dos arquivos gerados, usado pelos benchmarks
+ARQUIVO_CATEGORIAS = ".categorias_benchmark.json"
+# Bloco de conteúdo binário repetido nos arquivos grandes. Repetições a
+# esta distância não são aproveitadas pelo deflate (janela de 32 kB).
+TAMANHO_BLOCO_BINARIO = 8 << 20
+
+ARQUIVOS_NEWAVE = [
+    ("dger", "dger.dat"),
+    ("sistema", "sistema.dat"),
+    ("confhd", "confhd.dat"),
+    ("modif", "modif.dat"),
+    ("conft", "conft.dat"),
+    ("term", "term.dat"),
+    ("clast", "clast.dat"),
+    ("exph", "exph.dat"),
+    ("expt", "expt.dat"),
+    ("patamar", "patamar.dat"),
+    ("cortes", "cortes.dat"),
+    ("cortesh", "cortesh.dat"),
+    ("pmo", "pmo.dat"),
+    ("parp", "parp.dat"),
+    ("forward", "forward.dat"),
+    ("forwardh", "forwarh.dat"),
+    ("shist", "shist.dat"),
+    ("manutt", "manutt.dat"),
+    ("newdesp", "newdesp.dat"),
+    ("vazpast", "vazpast.dat"),
+    ("itaipu", "itaipu.dat"),
+    ("bid", "bid.dat"),
+    ("c_adic", "c_adic.dat"),
+    ("perda", "loss.dat"),
+    ("gtminpat", "gtminpat.dat"),
+    ("elnino", "elnino.dat"),
+    ("ensoaux", "ensoaux.dat"),
+    ("dsvagua", "dsvagua.dat"),
+    ("penalid", "penalid.dat"),
+    ("curva", "curva.dat"),
+    ("agrint", "agrint.dat"),
+    ("adterm", "adterm.dat"),
+    ("ghmin", "ghmin.dat"),
+    ("sar", "sar.dat"),
+    ("cvar", "cvar.dat"),
+    ("ree", "ree.dat"),
+    ("re", "re.dat"),
+    ("tecno", "tecno.dat"),
+    ("abertura", "abertura.dat"),
+    ("gee", "gee.dat"),
+    ("clasgas", "clasgas.dat"),
+]
+
+TABELAS_NWLISTOP = [
+    "cmarg",
+    "earmfp",
+    "earmfpm",
+    "ghidr",
+    "gtert",
+    "intercambio",
+    "mercl",
+    "vagua",
+    "vertuh",
+    "qturuh",
+    "varmuh",
+    "defic",
+]
+RECURSOS_NEWAVE = [
+    "energiaf",
+    "energiab",
+    "energias",
+    "enavazf",
+    "enavazb",
+    "vazaof",
+    "vazaob",
+    "eolicaf",
+]
+TABELAS_DECOMP = [
+    "dec_oper_usih",
+    "dec_oper_usit",
+    "dec_oper_ree",
+    "dec_oper_sist",
+    "balsub",
+    "cmar",
+    "qtur",
+    "vutil",
+    "vert",
+    "pdef",
+]
+TABELAS_DESSEM = [
+    "PDO_OPERACAO",
+    "PDO_HIDR",
+    "PDO_TERM",
+    "PDO_SIST",
+    "PDO_CMOBAR",
+    "PDO_EOLICA",
+    "PDO_SUMAOPER",
+    "PDO_FLUXLIN",
+]
+
+
+class GeradorConteudo:
+    """
+    Gera conteúdos com compressibilidade próxima à das saídas reais:
+    tabelas textuais de números (CSVs, relatórios) e binários de
+    ponto flutuante (cortes, estados, forward).
+    """
+
+    def __init__(self, semente: int):
+        self._random = random.Random(semente)
+        valores = [self._random.gauss(0.0, 1e3) for _ in range(1 << 16)]
+        bloco = struct.pack(f"<{len(valores)}d", *valores)
+        self._bloco_binario = (bloco * (TAMANHO_BLOCO_BINARIO // len(bloco)))[
+            :TAMANHO_BLOCO_BINARIO
+        ]
+
+    def texto(self, tamanho: int) -> bytes:
+        linhas: list[str] = []
+        total = 0
+        while total < tamanho:
+            valores = ";".join(
+                f"{self._random.uniform(0, 5e4):10.2f}" for _ in range(8)
+            )
+            linha = (
+                f"{self._random.randint(1, 60):4d};"
+                + f"{self._random.randint(1, 2000):6d};{valores}\n"
+            )
+            linhas.append(linha)
+            total += len(linha)
+        return "".join(linhas).encode()[:tamanho]
+
+    def escreve_texto(self, caminho: str, tamanho: int):
+        with open(caminho, "wb") as arq:
+            arq.write(self.texto(tamanho))
+
+    def escreve_binario(self, caminho: str, tamanho: int):
+        deslocamento = self._random.randrange(0, TAMANHO_BLOCO_BINARIO)
+        bloco = (
+            self._bloco_binario[deslocamento:]
+            + self._bloco_binario[:deslocamento]
+        )
+        with open(caminho, "wb") as arq:
+            restante = tamanho
+            while restante > 0:
+                arq.write(bloco[: min(restante, len(bloco))])
+                restante -= len(bloco)
+
+    def tamanho(self, minimo: int, maximo: int) -> int:
+        """
+        Sorteia um tamanho com distribuição log-uniforme entre os limites.
+        """
+        if minimo >= maximo:
+            return minimo
+        return int(minimo * (maximo / max(minimo, 1)) ** self._random.random())
+
+
+class ParametrosGeracao:
+    """
+    Quantidades e tamanhos (em bytes) dos arquivos de um caso sintético.
+    """
+
+    def __init__(
+        self,
+        numero_csvs: int = 5000,
+        tamanho_csv: tuple[int, int] = (1 << 10, 64 << 10),
+        numero_relatorios: int = 20,
+        tamanho_relatorio: tuple[int, int] = (64 << 10, 8 << 20),
+        numero_binarios: int = 2,
+        tamanho_binario: int = 256 << 20,
+        numero_temporarios: int = 20,
+        semente: int = 0,
+    ):
+        self.numero_csvs = numero_csvs
+        self.tamanho_csv = tamanho_csv
+        self.numero_relatorios = numero_relatorios
+        self.tamanho_relatorio = tamanho_relatorio
+        self.numero_binarios = numero_binarios
+        self.tamanho_binario = tamanho_binario
+        self.numero_temporarios = numero_temporarios
+        self.semente = semente
+
+
+def _escreve_categorias(diretorio: str, categorias: dict[str, list[str]]):
+    with open(join(diretorio, ARQUIVO_CATEGORIAS), "w") as arq:
+        json.dump(categorias, arq, indent=4)
+
+
+def gera_caso_newave(diretorio: str, p: ParametrosGeracao):
+    os.makedirs(diretorio, exist_ok=True)
+    g = GeradorConteudo(p.semente)
+    categorias: dict[str, list[str]] = {
+        "deck": [],
+        "operacao": [],
+        "relatorios": [],
+        "recursos": [],
+        "cortes": [],
+        "estados": [],
+        "simulacao": [],
+        "temporarios": [],
+    }
+
+    def texto(categoria: str, nome: str, tamanho: int):
+        g.escreve_texto(join(diretorio, nome), tamanho)
+        categorias[categoria].append(nome)
+
+    def binario(categoria: str, nome: str, tamanho: int):
+        g.escreve_binario(join(diretorio, nome), tamanho)
+        categorias[categoria].append(nome)
+
+    # Deck de entrada
+    with open(join(diretorio, "caso.dat"), "w") as arq:
+        arq.write("arquivos.dat\n")
+    with open(join(diretorio, "arquivos.dat"), "w") as arq:
+        arq.writelines(
+            f"{legenda.upper():<30}{nome}\n"
+            for legenda, nome in ARQUIVOS_NEWAVE
+        )
+    categorias["deck"] += ["caso.dat", "arquivos.dat"]
+    nomes_saida = {"cortes", "cortesh", "pmo", "parp", "forward", "forwardh"}
+    for legenda, nome in ARQUIVOS_NEWAVE:
+        if legenda not in nomes_saida and legenda != "newdesp":
+            texto("deck", nome, g.tamanho(4 << 10, 256 << 10))
+    texto("deck", "hidr.dat", 300 << 10)
+    binario("deck", "vazoes.dat", 2 << 20)
+    texto("deck", "postos.dat", 30 << 10)
+    libs = [f"polinjus_{i}.dat" for i in range(4)]
+    with open(join(diretorio, "indices.csv"), "w") as arq:
+        arq.write("& indices dos arquivos LIBS\n")
+        for i, nome in enumerate(libs):
+            arq.write(f"ARQ-{i:02d} ; LIBS ; {nome}\n")
+    categorias["deck"].append("indices.csv")
+    for nome in libs:
+        texto("deck", nome, g.tamanho(4 << 10, 64 << 10))
+
+    # Saídas do NWLISTOP
+    texto("operacao", "nwlistop.dat", 4 << 10)
+    for i in range(p.numero_csvs):
+        tabela = TABELAS_NWLISTOP[i % len(TABELAS_NWLISTOP)]
+        indice = i // len(TABELAS_NWLISTOP) + 1
+        texto(
+            "operacao", f"{tabela}{indice:03d}.CSV", g.tamanho(*p.tamanho_csv)
+        )
+    for tabela in TABELAS_NWLISTOP:
+        texto("operacao", f"{tabela}.out", g.tamanho(*p.tamanho_csv))
+
+    # Relatórios
+    texto("relatorios", "pmo.dat", p.tamanho_relatorio[1])
+    texto("relatorios", "parp.dat", p.tamanho_relatorio[1] // 2)
+    texto("relatorios", "newave.tim", 2 << 10)
+    texto("relatorios", "runtrace.dat", 64 << 10)
+    for i in range(p.numero_relatorios):
+        nome = ["alertainv", "nwv_avl", "newave_"][i % 3] + f"{i:03d}"
+        nome += ".log" if nome.startswith("newave_") else ".rel"
+        texto("relatorios", nome, g.tamanho(*p.tamanho_relatorio))
+
+    # Recursos
+    for recurso in RECURSOS_NEWAVE:
+        binario("recursos", f"{recurso}.dat", g.tamanho(1 << 20, 32 << 20))
+        texto("recursos", f"{recurso}.csv", g.tamanho(64 << 10, 4 << 20))
+
+    # Cortes, estados e simulação (binários grandes)
+    for i in range(p.numero_binarios):
+        sufixo = "" if i == 0 else f"-{i:03d}"
+        binario("cortes", f"cortes{sufixo}.dat", p.tamanho_binario)
+        binario("estados", f"cortese{sufixo}.dat", p.tamanho_binario // 4)
+    binario("cortes", "cortesh.dat", 64 << 10)
+    texto("cortes", "nwlistcf.rel", 1 << 20)
+    texto("estados", "estados.rel", 1 << 20)
+    binario("simulacao", "forward.dat", p.tamanho_binario)
+    binario("simulacao", "forwarh.dat", 64 << 10)
+    binario("simulacao", "newdesp.dat", 1 << 20)
+    binario("simulacao", "planej.dat", 1 << 20)
+
+    # Temporários
+    for i in range(p.numero_temporarios):
+        texto("temporarios", f"svc{i:04d}", 1 << 10)
+
+    _escreve_categorias(diretorio, categorias)
+
+
+def gera_caso_decomp(diretorio: str, p: ParametrosGeracao):
+    os.makedirs(diretorio, exist_ok=True)
+    g = GeradorConteudo(p.semente)
+    extensao = "rv0"
+    categorias: dict[str, list[str]] = {
+        "deck": [],
+        "operacao": [],
+        "relatorios": [],
+        "cortes": [],
+        "temporarios": [],
+    }
+
+    def texto(categoria: str, nome: str, tamanho: int):
+        g.escreve_texto(join(diretorio, nome), tamanho)
+        categorias[categoria].append(nome)
+
+    def binario(categoria: str, nome: str, tamanho: int):
+        g.escreve_binario(join(diretorio, nome), tamanho)
+        categorias[categoria].append(nome)
+
+    # Deck de entrada
+    with open(join(diretorio, "caso.dat"), "w") as arq:
+        arq.write(f"{extensao}\n")
+    deck = [
+        f"dadger.{extensao}",
+        f"vazoes.{extensao}",
+        "hidr.dat",
+        "mlt.dat",
+        "perdas.dat",
+        f"dadgnl.{extensao}",
+    ]
+    with open(join(diretorio, extensao), "w") as arq:
+        arq.writelines([f"{a}\n" for a in deck])
+    categorias["deck"] += ["caso.dat", extensao]
+    with open(join(diretorio, deck[0]), "w") as arq:
+        arq.write("TE  CASO SINTETICO PARA BENCHMARK\n")
+    categorias["deck"].append(deck[0])
+    for nome in deck[1:]:
+        texto("deck", nome, g.tamanho(16 << 10, 1 << 20))
+
+    # Saídas
+    for i in range(p.numero_csvs):
+        tabela = TABELAS_DECOMP[i % len(TABELAS_DECOMP)]
+        indice = i // len(TABELAS_DECOMP) + 1
+        texto(
+            "operacao", f"{tabela}_{indice:03d}.csv", g.tamanho(*p.tamanho_csv)
+        )
+    for nome in ["relato", "sumario", "relato2", "inviab_unic", "custos"]:
+        texto(
+            "relatorios", f"{nome}.{extensao}", g.tamanho(*p.tamanho_relatorio)
+        )
+    texto("relatorios", "decomp.tim", 2 << 10)
+    for i in range(p.numero_relatorios):
+        texto("relatorios", f"osl_{i:03d}", g.tamanho(*p.tamanho_relatorio))
+    for i in range(p.numero_binarios):
+        nome = f"cortdeco.{extensao}" if i == 0 else f"cortdeco{i}.{extensao}"
+        binario("cortes", nome, p.tamanho_binario)
+    binario("cortes", f"mapcut.{extensao}", 1 << 20)
+    for i in range(p.numero_temporarios):
+        texto("temporarios", f"dimpl_{i:04d}", 1 << 10)
+
+    _escreve_categorias(diretorio, categorias)
+
+
+def gera_caso_dessem(diretorio: str, p: ParametrosGeracao):
+    os.makedirs(diretorio, exist_ok=True)
+    g = GeradorConteudo(p.semente)
+    extensao = "PMO"
+    categorias: dict[str, list[str]] = {
+        "deck": [],
+        "operacao": [],
+        "relatorios": [],
+        "temporarios": [],
+    }
+
+    def texto(categoria: str, nome: str, tamanho: int):
+        g.escreve_texto(join(diretorio, nome), tamanho)
+        categorias[categoria].append(nome)
+
+    # Deck de entrada
+    registros = [
+        ("VAZOES", "dadvaz.dat"),
+        ("DADGER", "entdados.dat"),
+        ("CADUSIH", "hidr.dat"),
+        ("OPERUH", "operuh.dat"),
+        ("CADTERM", "termdat.dat"),
+        ("OPERUT", "operut.dat"),
+        ("MLT", "mlt.dat"),
+        ("PTOPER", "ptoper.dat"),
+    ]
+    with open(join(diretorio, "dessem.arq"), "w") as arq:
+        arq.write(f"{'CASO':<10}{'EXTENSAO':<39}{extensao}\n")
+        arq.writelines(
+            f"{registro:<10}{'ARQUIVO':<39}{nome}\n"
+            for registro, nome in registros
+        )
+    categorias["deck"].append("dessem.arq")
+    for _, nome in registros:
+        texto("deck", nome, g.tamanho(16 << 10, 1 << 20))
+
+    # Saídas
+    for i in range(p.numero_csvs):
+        tabela = TABELAS_DESSEM[i % len(TABELAS_DESSEM)]
+        indice = i // len(TABELAS_DESSEM) + 1
+        texto(
+            "operacao",
+            f"{tabela}_{indice:03d}.{extensao}",
+            g.tamanho(*p.tamanho_csv),
+        )
+    for i in range(p.numero_relatorios):
+        prefixo = ["DES_LOG_", "AVL_", "LOG_"][i % 3]
+        texto(
+            "relatorios",
+            f"{prefixo}{i:03d}.{extensao}",
+            g.tamanho(*p.tamanho_relatorio),
+        )
+    for i in range(p.numero_temporarios):
+        texto("temporarios", f"fort.{i}", 1 << 10)
+
+    _escreve_categorias(diretorio, categorias)
+
+
+GERADORES = {
+    "newave": gera_caso_newave,
+    "decomp": gera_caso_decomp,
+    "dessem": gera_caso_dessem,
+}
+
+
+def le_categorias(diretorio: str) -> dict[str, list[str]]:
+    with open(join(diretorio, ARQUIVO_CATEGORIAS), "r") as arq:
+        return json.load(arq)
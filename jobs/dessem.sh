@@ -24,20 +24,8 @@ OPCAO=completa
 echo Mudando o diretorio para $WORKDIR
 cd $WORKDIR
 
-echo Configurando o numero de processadores
-$INTERPRETADOR $INSTALLDIR/main.py pre_processa_dessem $SLOTS
-
-echo Executando o DESSEM
-$DESSEM
-
-if [ $? -eq 0 ]
-then
-    echo Sintetizando
-    $SINTETIZADOR $OPCAO
-
-    # Pos processamento dessem
-    $INTERPRETADOR $INSTALLDIR/main.py pos_processa_dessem
-else
-    echo Erro na execução do DESSEM: $?
-fi
-
+# Numero de processadores, DESSEM, sintetizador e pos-processamento,
+# com o deck zipado enquanto o modelo executa
+$INTERPRETADOR $INSTALLDIR/main.py executa_job dessem $SLOTS \
+    --executavel $DESSEM \
+    --sintetizador "$SINTETIZADOR $OPCAO"
@@ -0,0 +1,93 @@
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from app import cache_compressao
+from app.cache_compressao import CABECALHO_CACHE, CacheCompressao
+from app.utils import zip_arquivos
+
+
+def _cria_arquivos(diretorio, quantidade: int) -> list[str]:
+    nomes = []
+    for i in range(quantidade):
+        caminho = diretorio / f"deck{i}.dat"
+        caminho.write_bytes(f"registro {i}\n".encode() * (200 + i))
+        nomes.append(caminho.name)
+    return nomes
+
+
+def test_busca_e_armazena(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (nome,) = _cria_arquivos(tmp_path, 1)
+    cache = CacheCompressao(str(tmp_path / "cache"), 1 << 20)
+    chave = cache.chave(nome, ZIP_DEFLATED, None)
+    assert cache.busca(chave) is None
+    armazenada = cache.armazena(chave, nome, ZIP_DEFLATED, None)
+    armazenada.dados.close()
+    entrada = cache.busca(chave)
+    assert entrada is not None
+    with entrada.dados:
+        assert entrada.tamanho == (tmp_path / nome).stat().st_size
+        assert len(entrada.dados.read()) == entrada.tamanho_comprimido
+    assert cache.total == CABECALHO_CACHE.size + entrada.tamanho_comprimido
+    # Outro nível é outra entrada
+    assert cache.busca(cache.chave(nome, ZIP_DEFLATED, 9)) is None
+
+
+def test_zip_com_cache_identico_ao_sem_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 5)
+    cache = CacheCompressao(str(tmp_path / "cache"), 1 << 20)
+    caminho = zip_arquivos(nomes, "deck")
+    with open(caminho, "rb") as arq:
+        sem_cache = arq.read()
+    # Na primeira vez as entradas são armazenadas, na segunda copiadas
+    for _ in range(2):
+        zip_arquivos(nomes, "deck", cache=cache)
+        with open(caminho, "rb") as arq:
+            assert arq.read() == sem_cache
+    with ZipFile(caminho) as z:
+        assert z.testzip() is None
+
+
+def test_descarta_as_entradas_usadas_ha_mais_tempo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 3)
+    cache = CacheCompressao(str(tmp_path / "cache"), 1 << 20)
+    chaves = [cache.chave(n, ZIP_DEFLATED, None) for n in nomes]
+    for chave, nome in zip(chaves[:2], nomes):
+        cache.armazena(chave, nome, ZIP_DEFLATED, None).dados.close()
+    # Cabe apenas nas duas entradas usadas mais recentemente
+    cache.tamanho_maximo = cache.total + 50
+    cache.busca(chaves[0]).dados.close()
+    cache.armazena(chaves[2], nomes[2], ZIP_DEFLATED, None).dados.close()
+    assert cache.busca(chaves[1]) is None
+    for chave in [chaves[0], chaves[2]]:
+        entrada = cache.busca(chave)
+        assert entrada is not None
+        entrada.dados.close()
+    assert cache.total <= cache.tamanho_maximo
+    # Uma nova instância lê as entradas e o total do diretório
+    assert CacheCompressao(cache.diretorio, cache.tamanho_maximo).total == (
+        cache.total
+    )
+
+
+def test_entrada_descartada_apos_ser_aberta_e_fechada(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (nome,) = _cria_arquivos(tmp_path, 1)
+    cache = CacheCompressao(str(tmp_path / "cache"), 1 << 20)
+    chave = cache.chave(nome, ZIP_DEFLATED, None)
+    cache.armazena(chave, nome, ZIP_DEFLATED, None).dados.close()
+    abertas = []
+    abre = CacheCompressao._abre
+    monkeypatch.setattr(
+        CacheCompressao,
+        "_abre",
+        lambda self, c: abertas.append(abre(self, c)) or abertas[-1],
+    )
+
+    def utime(caminho):
+        raise FileNotFoundError(caminho)
+
+    monkeypatch.setattr(cache_compressao, "utime", utime)
+    assert cache.busca(chave) is None
+    assert abertas[0].dados.closed
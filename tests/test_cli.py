@@ -0,0 +1,82 @@
+import subprocess
+import sys
+from ast import literal_eval
+
+import click
+from click.testing import CliRunner
+
+from app.cli import COMANDOS, cli
+from app.job import JOBS, executa_job
+from app.utils import le_arquivos_indice
+
+
+def _modulos_importados(args: list[str]) -> list[str]:
+    codigo = (
+        "import sys\n"
+        + "from app.cli import cli\n"
+        + f"cli.main({args!r}, standalone_mode=False)\n"
+        + "print(sorted(m for m in sys.modules if m.split('.')[0] in "
+        + "('inewave', 'idecomp', 'idessem', 'pandas', 'app')))\n"
+    )
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return literal_eval(saida.splitlines()[-1])
+
+
+def test_comando_carrega_apenas_o_seu_modulo():
+    assert _modulos_importados(["extrai", "--help"]) == [
+        "app",
+        "app.cli",
+        "app.extracao",
+        "app.indice_zip",
+        "app.zipfileparallel",
+    ]
+
+
+def test_bibliotecas_dos_modelos_carregadas_sob_demanda():
+    # A ajuda resolve todos os comandos, sem ler nenhum deck
+    modulos = _modulos_importados(["--help"])
+    assert "app.newave.pos_processa_newave" in modulos
+    assert not any(
+        m.startswith(("inewave", "idecomp", "idessem", "pandas"))
+        for m in modulos
+    )
+
+
+def test_todos_os_comandos_existem():
+    ctx = click.Context(cli)
+    assert cli.list_commands(ctx) == list(COMANDOS)
+    for nome in COMANDOS:
+        comando = cli.get_command(ctx, nome)
+        assert isinstance(comando, click.Command)
+        assert comando.name == nome
+    assert cli.get_command(ctx, "inexistente") is None
+    ctx = click.Context(executa_job)
+    for nome in JOBS:
+        assert executa_job.get_command(ctx, nome).name == nome
+
+
+def test_comando_inexistente():
+    resultado = CliRunner().invoke(cli, ["inexistente"])
+    assert resultado.exit_code != 0
+    assert "inexistente" in resultado.output
+
+
+def test_le_arquivos_indice(tmp_path):
+    caminho = tmp_path / "indices.csv"
+    caminho.write_text(
+        "& comentário; com; separadores\n"
+        + "1 ; HIDR ; hidr_libs.csv\n"
+        + "2;TERM;  term_libs.csv  & comentário\n"
+        + "3;HIDR;hidr_libs.csv\n"
+        + "linha sem campos\n"
+        + "4;VAZIO;\n"
+    )
+    assert le_arquivos_indice(str(caminho)) == [
+        "hidr_libs.csv",
+        "term_libs.csv",
+    ]
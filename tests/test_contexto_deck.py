@@ -0,0 +1,56 @@
+import os
+
+from app.contexto_deck import ContextoDeck
+from app.newave.contexto_newave import ContextoNewave
+
+
+class _Arquivo:
+    leituras: list[str] = []
+
+    def __init__(self, conteudo: str):
+        self.conteudo = conteudo
+
+    @classmethod
+    def read(cls, caminho: str):
+        cls.leituras.append(caminho)
+        with open(caminho) as arq:
+            return cls(arq.read())
+
+
+class _OutroArquivo(_Arquivo):
+    leituras: list[str] = []
+
+
+def test_arquivo_lido_uma_vez_enquanto_nao_e_modificado(tmp_path):
+    caminho = tmp_path / "dger.dat"
+    caminho.write_text("a")
+    contexto = ContextoDeck(str(tmp_path))
+    lido = contexto.le(_Arquivo, "dger.dat")
+    assert contexto.le(_Arquivo, "dger.dat") is lido
+    assert _Arquivo.leituras == [str(caminho)]
+    # Outra classe lê o mesmo arquivo separadamente
+    assert contexto.le(_OutroArquivo, "dger.dat").conteudo == "a"
+    assert _Arquivo.leituras == [str(caminho)]
+
+    # Mesmo tamanho, outra data de modificação
+    caminho.write_text("b")
+    st = caminho.stat()
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert contexto.le(_Arquivo, "dger.dat").conteudo == "b"
+    # Mesma data de modificação, outro tamanho
+    st = caminho.stat()
+    caminho.write_text("cc")
+    os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert contexto.le(_Arquivo, "dger.dat").conteudo == "cc"
+    assert len(_Arquivo.leituras) == 3
+
+
+def test_contexto_newave_segue_o_caso(tmp_path):
+    (tmp_path / "caso.dat").write_text("arquivos.dat\n")
+    (tmp_path / "arquivos.dat").write_text(f"{'DGER':<30}dger.dat\n")
+    contexto = ContextoNewave(str(tmp_path))
+    assert contexto.caso.arquivos == "arquivos.dat"
+    assert contexto.arquivos is contexto.arquivos
+    assert contexto.arquivos.dger == "dger.dat"
+    (tmp_path / "arquivos.dat").write_text(f"{'DGER':<30}dger2.dat\n")
+    assert contexto.arquivos.dger == "dger2.dat"
@@ -0,0 +1,69 @@
+from zipfile import ZipFile
+
+from app.diario_compressao import ARQUIVO_DIARIO, DiarioCompressao
+from app.utils import zip_categorias_paralelo
+
+
+def test_retomadas_sucessivas_nao_revalidam_nem_repetem_registros(
+    tmp_path, monkeypatch
+):
+    # Como no monitora: a cada varredura, novos arquivos no mesmo zip
+    monkeypatch.chdir(tmp_path)
+    diario = DiarioCompressao()
+    validacoes = []
+    valida = DiarioCompressao._valida
+    monkeypatch.setattr(
+        DiarioCompressao,
+        "_valida",
+        lambda self, c: validacoes.append(c) or valida(self, c),
+    )
+    nomes: list[str] = []
+    for varredura in range(5):
+        novos = []
+        for i in range(10):
+            caminho = tmp_path / f"a{varredura}_{i}.csv"
+            caminho.write_text(f"{varredura} {i}\n" * 100)
+            novos.append(caminho.name)
+        nomes += novos
+        zip_categorias_paralelo({"operacao": novos}, 2, diario=diario)
+    diario._arquivo.close()
+
+    assert len(validacoes) == 0
+    with open(ARQUIVO_DIARIO) as arq:
+        linhas = arq.readlines()
+    # Cada varredura: retomada, registro de cada arquivo e conclusão
+    assert len(linhas) == 5 * (1 + 10 + 1)
+    with ZipFile(f"operacao_{tmp_path.name}.zip") as z:
+        assert sorted(z.namelist()) == sorted(nomes)
+        assert z.testzip() is None
+    # Uma nova instância valida o zip inteiro a partir do diário
+    retomada = DiarioCompressao().retoma(f"./operacao_{tmp_path.name}.zip")
+    assert len(validacoes) == 1
+    assert sorted(z.filename for z in retomada.entradas) == sorted(nomes)
+    assert retomada.concluido
+
+
+def test_arquivo_alterado_depois_de_zipado_e_comprimido_novamente(
+    tmp_path, monkeypatch
+):
+    # Como no monitora: um arquivo já zipado é alterado e volta a ser final
+    monkeypatch.chdir(tmp_path)
+    diario = DiarioCompressao()
+    (tmp_path / "a.csv").write_text("antigo\n" * 100)
+    (tmp_path / "b.csv").write_text("b\n" * 100)
+    zip_categorias_paralelo({"operacao": ["a.csv", "b.csv"]}, 2, diario=diario)
+    (tmp_path / "a.csv").write_text("novo\n" * 200)
+    zip_categorias_paralelo({"operacao": ["a.csv"]}, 2, diario=diario)
+    diario._arquivo.close()
+
+    with ZipFile(f"operacao_{tmp_path.name}.zip") as z:
+        assert sorted(z.namelist()) == ["a.csv", "b.csv"]
+        assert z.read("a.csv") == b"novo\n" * 200
+        assert z.read("b.csv") == b"b\n" * 100
+        assert z.testzip() is None
+    # A retomada do pos_processa mantém as duas entradas
+    retomada = DiarioCompressao().retoma(
+        f"./operacao_{tmp_path.name}.zip", ["a.csv", "b.csv"]
+    )
+    assert sorted(z.filename for z in retomada.entradas) == ["a.csv", "b.csv"]
+    assert retomada.concluido
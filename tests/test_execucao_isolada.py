@@ -0,0 +1,59 @@
+import stat
+
+from app.execucao_isolada import ExecucaoAuxiliar, executa_auxiliares_isolados
+
+
+def _programa(diretorio, nome: str, script: str) -> str:
+    caminho = diretorio / nome
+    caminho.write_text("#!/bin/sh\n" + script)
+    caminho.chmod(caminho.stat().st_mode | stat.S_IXUSR)
+    return str(caminho)
+
+
+def _execucao(nome: str, executavel: str, sufixo: str) -> ExecucaoAuxiliar:
+    def gera(diretorio: str):
+        with open(f"{diretorio}/controle.dat", "w") as arq:
+            arq.write(nome)
+
+    return ExecucaoAuxiliar(
+        nome,
+        executavel,
+        10.0,
+        gera,
+        ["controle.dat"],
+        saidas=[r"^saida\.rel$"],
+        temporarios=["format.tmp"],
+        sufixo=sufixo,
+    )
+
+
+def test_saidas_com_o_mesmo_nome_nao_se_sobrescrevem(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Saída de uma execução anterior, já presente no caso
+    (tmp_path / "saida.rel").write_text("anterior\n")
+    (tmp_path / "entrada.dat").write_text("dado\n")
+    a = _programa(
+        tmp_path,
+        "a.sh",
+        "cat entrada.dat > lido.txt\n"
+        + "echo a > saida.rel\necho a > format.tmp\n"
+        + "sleep 0.3\necho a >> saida.rel\n",
+    )
+    b = _programa(
+        tmp_path,
+        "b.sh",
+        "sleep 0.1\necho b > saida.rel\necho b > format.tmp\nsleep 0.3\n",
+    )
+    executa_auxiliares_isolados(
+        [_execucao("A", a, "a"), _execucao("B", b, "b")], 2
+    )
+
+    # A última execução fica com o nome, as anteriores com o sufixo
+    assert (tmp_path / "saida.rel").read_text() == "b\n"
+    assert (tmp_path / "saida_a.rel").read_text() == "a\na\n"
+    assert (tmp_path / "lido.txt").read_text() == "dado\n"
+    assert (tmp_path / "controle.dat").read_text() == "B"
+    assert (tmp_path / "entrada.dat").read_text() == "dado\n"
+    assert not (tmp_path / "format.tmp").exists()
+    assert not (tmp_path / "controle_a.dat").exists()
+    assert not any(p.name.startswith(".auxiliar_") for p in tmp_path.iterdir())
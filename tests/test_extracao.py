@@ -0,0 +1,128 @@
+from zipfile import ZIP_STORED, BadZipFile, ZipFile
+
+import pytest
+from click.testing import CliRunner
+
+from app.extracao import _agenda_extracao, extrai, extrai_zips_paralelo
+from app.indice_zip import abre_leitor
+from app.utils import zip_categorias_paralelo
+
+CONTEUDOS = {
+    f"a{i:03d}.csv": bytes([65 + i % 26]) * (50 + i) for i in range(40)
+}
+
+
+def _cria_arquivos(diretorio, conteudos: dict[str, bytes]) -> list[str]:
+    for nome, conteudo in conteudos.items():
+        (diretorio / nome).write_bytes(conteudo)
+    return list(conteudos)
+
+
+def _confere(diretorio, nomes):
+    extraidos = sorted(p.name for p in diretorio.iterdir())
+    assert extraidos == sorted(nomes)
+    for nome in nomes:
+        assert (diretorio / nome).read_bytes() == CONTEUDOS[nome]
+
+
+def test_extrai_por_nome_e_padrao(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    zip_categorias_paralelo(
+        {"operacao": _cria_arquivos(tmp_path, CONTEUDOS)}, 2
+    )
+    destino = tmp_path / "destino"
+    resultado = CliRunner().invoke(
+        extrai,
+        [
+            f"operacao_{tmp_path.name}.zip",
+            "a005.csv",
+            "a03*.csv",
+            "--destino",
+            str(destino),
+        ],
+    )
+    assert resultado.exit_code == 0, resultado.output
+    _confere(destino, ["a005.csv", *[f"a03{i}.csv" for i in range(10)]])
+
+
+def test_extrai_sem_entradas_encontradas_falha(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    zip_categorias_paralelo(
+        {"operacao": _cria_arquivos(tmp_path, CONTEUDOS)}, 2
+    )
+    resultado = CliRunner().invoke(
+        extrai, [f"operacao_{tmp_path.name}.zip", "b*.csv"]
+    )
+    assert resultado.exit_code == 1
+    assert "Nenhuma entrada" in resultado.output
+
+
+def test_extrai_paralelo_de_zips_e_partes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, CONTEUDOS)
+    zip_categorias_paralelo(
+        {"operacao": nomes[:25], "entrada": nomes[25:]},
+        2,
+        partes={"operacao": 3},
+    )
+    destino = tmp_path / "destino"
+    entradas = extrai_zips_paralelo(
+        [
+            f"operacao_{tmp_path.name}.manifesto.json",
+            f"entrada_{tmp_path.name}.zip",
+        ],
+        str(destino),
+        2,
+        limite_entradas_pequenas=500,
+    )
+    assert sorted(e.nome for e in entradas) == sorted(nomes)
+    _confere(destino, nomes)
+
+
+def test_extrai_paralelo_com_padroes_de_zip_sem_indice(tmp_path):
+    caminho = tmp_path / "operacao.zip"
+    with ZipFile(caminho, "w") as z:
+        for nome, conteudo in CONTEUDOS.items():
+            z.writestr(nome, conteudo)
+    destino = tmp_path / "destino"
+    extrai_zips_paralelo(
+        [str(caminho)], str(destino), 2, ["a00*.csv", "a039.csv"]
+    )
+    _confere(destino, [*[f"a00{i}.csv" for i in range(10)], "a039.csv"])
+
+
+def test_extrai_paralelo_verifica_o_crc(tmp_path):
+    caminho = tmp_path / "operacao.zip"
+    with ZipFile(caminho, "w", ZIP_STORED) as z:
+        for nome, conteudo in CONTEUDOS.items():
+            z.writestr(nome, conteudo)
+    # Corrompe apenas o conteúdo de uma entrada, mantendo o tamanho
+    dados = caminho.read_bytes()
+    original = CONTEUDOS["a010.csv"]
+    posicao = dados.index(original)
+    corrompido = b"x" + original[1:]
+    caminho.write_bytes(
+        dados[:posicao] + corrompido + dados[posicao + len(original) :]
+    )
+    destino = tmp_path / "destino"
+    with pytest.raises(BadZipFile):
+        extrai_zips_paralelo([str(caminho)], str(destino), 2)
+    # As demais entradas são extraídas mesmo com o erro
+    assert (destino / "a039.csv").read_bytes() == CONTEUDOS["a039.csv"]
+
+
+def test_agenda_entradas_grandes_sozinhas_e_pequenas_em_lotes(tmp_path):
+    caminho = tmp_path / "operacao.zip"
+    with ZipFile(caminho, "w") as z:
+        for nome, conteudo in CONTEUDOS.items():
+            z.writestr(nome, conteudo)
+    with abre_leitor(str(caminho)) as leitor:
+        entradas = [(leitor, e) for e in leitor.entradas()]
+        tarefas = _agenda_extracao(entradas, 85)
+    tamanhos = [sum(e.tamanho for _, e in t) for t in tarefas]
+    assert tamanhos == sorted(tamanhos, reverse=True)
+    for tarefa in tarefas:
+        if any(e.tamanho >= 85 for _, e in tarefa):
+            assert len(tarefa) == 1
+    nomes = [e.nome for t in tarefas for _, e in t]
+    assert sorted(nomes) == sorted(CONTEUDOS)
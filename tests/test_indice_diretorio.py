@@ -0,0 +1,30 @@
+from app.indice_diretorio import ClassificadorArquivos
+
+CATEGORIAS = {
+    "operacao": [r"^PDO_OPER.*$", r"^PDO_AVAL_.*$"],
+    "relatorios": [r"LOG_.*$", r"PDO_AVAL.*$"],
+    "vazia": [],
+}
+NOMES = ["PDO_OPER_TERM.DAT", "PDO_AVAL_X.DAT", "PDO_AVALIA.DAT", "LOG_A.DAT"]
+
+
+def test_arquivo_entra_apenas_na_primeira_categoria():
+    classificados = ClassificadorArquivos(CATEGORIAS).classifica(
+        NOMES + ["entrada.dat"], ["LOG_A.DAT"]
+    )
+    assert classificados == {
+        "operacao": ["PDO_OPER_TERM.DAT", "PDO_AVAL_X.DAT"],
+        "relatorios": ["PDO_AVALIA.DAT"],
+        "vazia": [],
+    }
+
+
+def test_arquivo_entra_em_todas_as_categorias():
+    classificados = ClassificadorArquivos(CATEGORIAS, todas=True).classifica(
+        NOMES
+    )
+    assert classificados == {
+        "operacao": ["PDO_OPER_TERM.DAT", "PDO_AVAL_X.DAT"],
+        "relatorios": ["PDO_AVAL_X.DAT", "PDO_AVALIA.DAT", "LOG_A.DAT"],
+        "vazia": [],
+    }
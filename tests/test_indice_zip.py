@@ -0,0 +1,65 @@
+import io
+from os import stat, utime
+from zipfile import ZIP_STORED, ZipFile
+
+from app.indice_zip import LeitorZip, escreve_indice_zip
+
+CONTEUDOS = {f"a{i:03d}.csv": bytes([i]) * (100 + i) for i in range(200)}
+
+
+def _escreve_zip(caminho, nomes: list[str], conteudos: dict[str, bytes]):
+    with ZipFile(caminho, "w", ZIP_STORED) as z:
+        for nome in nomes:
+            z.writestr(nome, conteudos[nome])
+
+
+def _zip_indexado(tmp_path):
+    caminho = tmp_path / "operacao.zip"
+    _escreve_zip(caminho, list(CONTEUDOS), CONTEUDOS)
+    with ZipFile(caminho) as z:
+        escreve_indice_zip(str(caminho), z.infolist())
+    return caminho
+
+
+def _copia(leitor: LeitorZip, nome: str) -> bytes:
+    destino = io.BytesIO()
+    leitor.copia(leitor.busca(nome), destino)
+    return destino.getvalue()
+
+
+def test_busca_pelo_indice(tmp_path):
+    caminho = _zip_indexado(tmp_path)
+    with LeitorZip(str(caminho)) as leitor:
+        assert leitor._indice is not None
+        assert [e.nome for e in leitor.entradas()] == sorted(CONTEUDOS)
+        assert leitor.busca("inexistente.csv") is None
+        assert [e.nome for e in leitor.busca_padrao("a19*.csv")] == [
+            f"a19{i}.csv" for i in range(10)
+        ]
+        for nome in ["a000.csv", "a064.csv", "a199.csv"]:
+            assert _copia(leitor, nome) == CONTEUDOS[nome]
+
+
+def test_zip_substituido_com_o_mesmo_tamanho_ignora_o_indice(tmp_path):
+    caminho = _zip_indexado(tmp_path)
+    mtime = stat(caminho).st_mtime_ns
+    # Mesmas entradas em outra ordem: o zip tem o mesmo tamanho, mas as
+    # entradas mudam de posição
+    _escreve_zip(caminho, sorted(CONTEUDOS, reverse=True), CONTEUDOS)
+    utime(caminho, ns=(mtime + 10**9, mtime + 10**9))
+    with LeitorZip(str(caminho)) as leitor:
+        assert leitor._indice is None
+        assert _copia(leitor, "a000.csv") == CONTEUDOS["a000.csv"]
+
+
+def test_entrada_fora_da_posicao_do_indice_le_o_diretorio_central(tmp_path):
+    caminho = _zip_indexado(tmp_path)
+    mtime = stat(caminho).st_mtime_ns
+    # Entradas em outra ordem, com o tamanho e a data do zip mantidos
+    _escreve_zip(caminho, sorted(CONTEUDOS, reverse=True), CONTEUDOS)
+    utime(caminho, ns=(mtime, mtime))
+    with LeitorZip(str(caminho)) as leitor:
+        assert leitor._indice is not None
+        assert _copia(leitor, "a010.csv") == CONTEUDOS["a010.csv"]
+        assert leitor._indice is None
+        assert [e.nome for e in leitor.entradas()] == sorted(CONTEUDOS)
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from app.job import (
+    ESTADO_FALHA,
+    ESTADO_NAO_EXECUTADA,
+    ESTADO_SUCESSO,
+    Etapa,
+    OrcamentoSlots,
+    executa_etapas,
+)
+
+
+def _etapa(
+    nome: str,
+    dependencias: tuple[str, ...] = (),
+    sucesso: bool = True,
+    slots: int = 1,
+    duracao: float = 0.0,
+    **kwargs,
+) -> Etapa:
+    async def executa(metrica) -> bool:
+        await asyncio.sleep(duracao)
+        return sucesso
+
+    return Etapa(nome, slots, executa, dependencias, **kwargs)
+
+
+def test_dependencia_circular():
+    etapas = [_etapa("a", ("b",)), _etapa("b", ("a",))]
+    with pytest.raises(ValueError, match="circular"):
+        asyncio.run(executa_etapas(etapas, 2))
+
+
+def test_dependencia_inexistente():
+    with pytest.raises(ValueError, match="inexistente"):
+        asyncio.run(executa_etapas([_etapa("a", ("b",))], 2))
+
+
+def test_requer_sucesso_fora_das_dependencias():
+    etapas = [
+        _etapa("a"),
+        _etapa("b", mesmo_com_falha=True, requer_sucesso=("a",)),
+    ]
+    with pytest.raises(ValueError, match="não é sua dependência"):
+        asyncio.run(executa_etapas(etapas, 2))
+
+
+def test_propagacao_de_falha():
+    etapas = [
+        _etapa("modelo", sucesso=False),
+        _etapa("sintetizador", ("modelo",)),
+        _etapa("posterior", ("sintetizador",)),
+        _etapa("mesmo_com_falha", ("modelo",), mesmo_com_falha=True),
+        _etapa(
+            "requer",
+            ("mesmo_com_falha", "modelo"),
+            mesmo_com_falha=True,
+            requer_sucesso=("modelo",),
+        ),
+        _etapa("independente"),
+    ]
+    tempos = asyncio.run(executa_etapas(etapas, 2))
+    assert [t.nome for t in tempos] == [e.nome for e in etapas]
+    assert [t.estado for t in tempos] == [
+        ESTADO_FALHA,
+        ESTADO_NAO_EXECUTADA,
+        ESTADO_NAO_EXECUTADA,
+        ESTADO_SUCESSO,
+        ESTADO_NAO_EXECUTADA,
+        ESTADO_SUCESSO,
+    ]
+    assert tempos[1].inicio is None and tempos[1].duracao is None
+
+
+def test_excecao_na_etapa_e_falha():
+    async def executa(metrica) -> bool:
+        raise RuntimeError("erro")
+
+    tempos = asyncio.run(executa_etapas([Etapa("a", 1, executa)], 1))
+    assert tempos[0].estado == ESTADO_FALHA
+
+
+def test_etapas_respeitam_os_slots():
+    em_execucao = 0
+    maximo = 0
+
+    def etapa(nome: str, slots: int) -> Etapa:
+        async def executa(metrica) -> bool:
+            nonlocal em_execucao, maximo
+            em_execucao += slots
+            maximo = max(maximo, em_execucao)
+            await asyncio.sleep(0.05)
+            em_execucao -= slots
+            return True
+
+        return Etapa(nome, slots, executa)
+
+    etapas = [etapa("a", 2), etapa("b", 2), etapa("c", 1), etapa("d", 1)]
+    tempos = asyncio.run(executa_etapas(etapas, 3))
+    assert maximo == 3
+    assert all(t.estado == ESTADO_SUCESSO for t in tempos)
+
+
+def test_orcamento_limita_pedido_ao_total():
+    async def reserva():
+        orcamento = OrcamentoSlots(2)
+        # Um pedido maior que o total ocupa todos os slots, sem travar
+        async with orcamento.reserva(8):
+            assert orcamento.livres == 0
+        return orcamento.livres
+
+    assert asyncio.run(asyncio.wait_for(reserva(), 5)) == 2
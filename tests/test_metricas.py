@@ -0,0 +1,93 @@
+import json
+from zipfile import ZIP_DEFLATED, ZipFile
+
+import pytest
+
+from app.metricas import MetricaEtapa, Metricas
+
+
+def _le(metricas: Metricas) -> list[dict]:
+    with open(metricas.caminho()) as arq:
+        dados = json.load(arq)
+    return dados["etapas"]
+
+
+def test_etapa_mede_tempo_cpu_e_memoria(tmp_path):
+    metricas = Metricas("comando", str(tmp_path))
+    with metricas.etapa("soma", workers=2) as metrica:
+        sum(i * i for i in range(200_000))
+    assert metricas.etapas == [metrica]
+    assert metrica.tempo > 0
+    assert metrica.cpu >= 0
+    assert metrica.pico_rss > 0
+    assert metrica.utilizacao == pytest.approx(
+        metrica.cpu / (metrica.tempo * 2)
+    )
+
+
+def test_etapa_registrada_mesmo_com_erro(tmp_path):
+    metricas = Metricas("comando", str(tmp_path))
+    with pytest.raises(RuntimeError), metricas.etapa("falha"):
+        raise RuntimeError
+    assert [e.etapa for e in metricas.etapas] == ["falha"]
+    assert metricas.etapas[0].tempo is not None
+
+
+def test_mede_zip(tmp_path):
+    caminho = tmp_path / "saidas.zip"
+    with ZipFile(caminho, "w", ZIP_DEFLATED) as z:
+        z.writestr("a.csv", "a" * 10_000)
+        z.writestr("b.csv", "b" * 5_000)
+    metrica = MetricaEtapa("zip")
+    metrica.mede_zip(str(caminho))
+    metrica.mede_zip(str(caminho))
+    assert metrica.arquivos == 4
+    assert metrica.bytes_entrada == 30_000
+    assert metrica.bytes_saida == 2 * caminho.stat().st_size
+    assert metrica.razao == pytest.approx(metrica.bytes_saida / 30_000)
+    # Sem medidas, as razões ficam nulas
+    assert MetricaEtapa("vazia").como_dict()["razao"] is None
+    assert MetricaEtapa("vazia").como_dict()["utilizacao_workers"] is None
+
+
+def test_cada_comando_substitui_apenas_as_suas_etapas(tmp_path):
+    caso = tmp_path / "caso"
+    caso.mkdir()
+    deck = Metricas("pos_processa_newave", str(caso))
+    with deck.etapa("deck"):
+        pass
+    deck.salva()
+    job = Metricas("executa_job", str(caso))
+    with job.etapa("deck"):
+        pass
+    job.salva()
+    saidas = Metricas("pos_processa_newave", str(caso))
+    with saidas.etapa("saidas"):
+        pass
+    saidas.salva()
+    assert deck.caminho() == str(caso / "metricas_caso.json")
+    assert [(e["comando"], e["etapa"]) for e in _le(deck)] == [
+        ("pos_processa_newave", "deck"),
+        ("executa_job", "deck"),
+        ("pos_processa_newave", "saidas"),
+    ]
+
+    # Uma nova execução do mesmo comando substitui as etapas repetidas
+    deck = Metricas("pos_processa_newave", str(caso))
+    with deck.etapa("deck") as metrica:
+        metrica.arquivos = 7
+    deck.salva()
+    etapas = _le(deck)
+    assert len(etapas) == 3
+    assert etapas[-1]["etapa"] == "deck" and etapas[-1]["arquivos"] == 7
+    assert not any(p.suffix == ".tmp" for p in caso.iterdir())
+
+
+def test_arquivo_corrompido_e_substituido(tmp_path):
+    metricas = Metricas("comando", str(tmp_path))
+    with open(metricas.caminho(), "w") as arq:
+        arq.write("{")
+    with metricas.etapa("etapa"):
+        pass
+    metricas.salva()
+    assert [e["etapa"] for e in _le(metricas)] == ["etapa"]
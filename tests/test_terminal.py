@@ -0,0 +1,79 @@
+import asyncio
+import signal
+from time import perf_counter, sleep
+
+from app import terminal
+from app.terminal import run_terminal_stream
+
+
+def _running(pid: int) -> bool:
+    # Zombies, not reaped in some containers, have already exited
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except FileNotFoundError:
+        return False
+    return stat[stat.rfind(")") + 2] != "Z"
+
+
+def test_streams_outputs_with_prefix_and_keeps_the_tail(tmp_path, capsys):
+    log = tmp_path / "saida.log"
+    result = asyncio.run(
+        run_terminal_stream(
+            ["for i in $(seq 1 50); do echo linha $i; done; echo erro >&2"],
+            log_path=str(log),
+            prefix="[teste] ",
+            tail_lines=10,
+        )
+    )
+    assert result.returncode == 0
+    assert not result.timed_out
+    assert result.tail.splitlines()[-1] == "erro"
+    assert len(result.tail.splitlines()) == 10
+    outputs = capsys.readouterr()
+    assert outputs.out.splitlines()[0] == "[teste] linha 1"
+    assert len(outputs.out.splitlines()) == 50
+    assert outputs.err == "[teste] erro\n"
+    assert len(log.read_text().splitlines()) == 51
+
+
+def test_returncode_of_failed_command():
+    result = asyncio.run(run_terminal_stream(["exit 3"], echo=False))
+    assert result.returncode == 3
+    assert not result.timed_out
+
+
+def test_long_line_is_replaced_by_marker(monkeypatch):
+    monkeypatch.setattr(terminal, "LINE_LIMIT", 1024)
+    result = asyncio.run(
+        run_terminal_stream(
+            ["head -c 10000 /dev/zero | tr '\\0' x; echo; echo fim"],
+            echo=False,
+        )
+    )
+    assert result.returncode == 0
+    assert "[...]" in result.tail
+    assert result.tail.splitlines()[-1] == "fim"
+
+
+def test_timeout_terminates_the_process_group(tmp_path):
+    pid_file = tmp_path / "pid"
+    ti = perf_counter()
+    result = asyncio.run(
+        run_terminal_stream(
+            [f"sleep 60 & echo $! > {pid_file}; wait"],
+            timeout=0.5,
+            echo=False,
+        )
+    )
+    assert result.timed_out
+    assert result.returncode == -signal.SIGTERM
+    assert perf_counter() - ti < terminal.KILL_GRACE
+    # The background child, in the same group, was terminated as well
+    child = int(pid_file.read_text())
+    for _ in range(50):
+        if not _running(child):
+            break
+        sleep(0.1)
+    else:
+        raise AssertionError("child process still running")
@@ -0,0 +1,184 @@
+import json
+from threading import Thread
+from time import sleep
+from zipfile import ZipFile
+
+import pytest
+
+from app.indice_zip import abre_leitor, parte_da_entrada
+from app.utils import (
+    BACKEND_PROCESSO,
+    BACKEND_THREAD,
+    OrcamentoMemoria,
+    zip_arquivos_paralelo,
+    zip_categorias_paralelo,
+)
+from app.zipfileparallel import Tracer
+
+
+def _cria_arquivos(diretorio, quantidade: int, tamanho: int) -> list[str]:
+    nomes = []
+    for i in range(quantidade):
+        caminho = diretorio / f"a{i:04d}.csv"
+        caminho.write_bytes(b"x" * tamanho)
+        nomes.append(caminho.name)
+    return nomes
+
+
+@pytest.mark.parametrize("backend", [BACKEND_THREAD, BACKEND_PROCESSO])
+def test_ordenado_com_enorme_e_max_memoria_nao_trava(
+    tmp_path, monkeypatch, backend
+):
+    # Um lote de arquivos pequenos que atravessasse o nome do arquivo
+    # enorme seguraria o orçamento até a gravação do próprio enorme.
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 600, 1000)
+    enorme = tmp_path / "a0300_enorme.bin"
+    enorme.write_bytes(bytes(range(256)) * (3 << 12))
+    nomes.append(enorme.name)
+    erros: list[BaseException] = []
+
+    def comprime():
+        try:
+            zip_arquivos_paralelo(
+                nomes,
+                "operacao",
+                4,
+                limite_deflate_paralelo=1 << 20,
+                backend=backend,
+                max_memoria=80 << 20,
+                ordenado=True,
+            )
+        except BaseException as e:  # noqa: BLE001
+            erros.append(e)
+
+    t = Thread(target=comprime, daemon=True)
+    t.start()
+    t.join(60)
+    assert not t.is_alive(), "compressão travada"
+    assert erros == []
+    with ZipFile(tmp_path / f"operacao_{tmp_path.name}.zip") as z:
+        assert z.namelist() == sorted(nomes)
+        assert z.testzip() is None
+
+
+def test_partes_ignora_entradas_nulas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 20, 100)
+    zip_categorias_paralelo(
+        {"operacao": [*nomes, None, "inexistente.csv"]},
+        2,
+        partes={"operacao": 3},
+    )
+    with abre_leitor(f"operacao_{tmp_path.name}.zip") as leitor:
+        assert [e.nome for e in leitor.entradas()] == sorted(nomes)
+
+
+def test_partes_roteadas_pelo_nome_com_manifesto(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 30, 100)
+    zip_categorias_paralelo({"operacao": nomes}, 2, partes={"operacao": 3})
+    base = f"operacao_{tmp_path.name}"
+    with open(tmp_path / f"{base}.manifesto.json") as arq:
+        manifesto = json.load(arq)
+    assert manifesto["zip"] == f"{base}.zip"
+    assert manifesto["partes"] == [f"{base}.parte{i}.zip" for i in (1, 2, 3)]
+    for i, parte in enumerate(manifesto["partes"]):
+        with ZipFile(tmp_path / parte) as z:
+            for nome in z.namelist():
+                assert parte_da_entrada(nome, 3) == i
+    with abre_leitor(f"{base}.zip") as leitor:
+        assert [e.nome for e in leitor.entradas()] == sorted(nomes)
+        entrada = leitor.busca(nomes[7])
+        assert entrada is not None and entrada.tamanho == 100
+
+
+def test_mudanca_no_numero_de_partes_remove_zips_anteriores(
+    tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    base = f"operacao_{tmp_path.name}"
+
+    def zips() -> list[str]:
+        return sorted(
+            p.name for p in tmp_path.iterdir() if p.name.startswith(base)
+        )
+
+    for partes in [12, 3]:
+        nomes = _cria_arquivos(tmp_path, 30, 100)
+        zip_categorias_paralelo(
+            {"operacao": nomes}, 2, partes={"operacao": partes}
+        )
+    assert zips() == [f"{base}.manifesto.json"] + [
+        f"{base}.parte{i}.zip{e}" for i in (1, 2, 3) for e in ("", ".idx")
+    ]
+    zip_categorias_paralelo({"operacao": nomes}, 2)
+    assert zips() == [f"{base}.zip", f"{base}.zip.idx"]
+    with abre_leitor(f"{base}.zip") as leitor:
+        assert [e.nome for e in leitor.entradas()] == sorted(nomes)
+
+
+@pytest.mark.parametrize("remocao_incremental", [False, True])
+def test_arquivo_em_duas_categorias_vai_para_os_dois_zips(
+    tmp_path, monkeypatch, remocao_incremental
+):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 10, 100)
+    zip_categorias_paralelo(
+        {"operacao": nomes[:6], "relatorios": nomes[4:]},
+        2,
+        arquivos_limpar=nomes,
+        remocao_incremental=remocao_incremental,
+    )
+    with ZipFile(tmp_path / f"operacao_{tmp_path.name}.zip") as z:
+        assert sorted(z.namelist()) == nomes[:6]
+    with ZipFile(tmp_path / f"relatorios_{tmp_path.name}.zip") as z:
+        assert sorted(z.namelist()) == nomes[4:]
+    assert not any((tmp_path / n).exists() for n in nomes)
+
+
+@pytest.mark.parametrize("backend", [BACKEND_THREAD, BACKEND_PROCESSO])
+def test_rastreamento_registra_cada_arquivo(tmp_path, monkeypatch, backend):
+    monkeypatch.chdir(tmp_path)
+    nomes = _cria_arquivos(tmp_path, 20, 1000)
+    rastreador = Tracer()
+    zip_categorias_paralelo(
+        {"operacao": nomes},
+        2,
+        limite_arquivos_pequenos=4000,
+        backend=backend,
+        rastreamento=rastreador,
+    )
+    spans = [e for e in rastreador.events() if e["ph"] == "X"]
+    # Um intervalo por arquivo, com o seu nome, e a escrita da entrada
+    por_arquivo = [e for e in spans if e["name"] == e["args"].get("file")]
+    escritas = [e for e in spans if e["name"] == "write"]
+    assert sorted(e["name"] for e in por_arquivo) == nomes
+    assert sorted(e["args"]["file"] for e in escritas) == nomes
+    # Compressão e escrita em trilhas diferentes
+    trilhas = {(e["name"] == "write", e["pid"], e["tid"]) for e in spans}
+    assert len({(p, t) for _, p, t in trilhas}) >= 2
+
+
+def test_orcamento_falha_se_nada_e_liberado():
+    orcamento = OrcamentoMemoria(100, espera_maxima=0.1)
+    orcamento.reserva(80)
+    with pytest.raises(RuntimeError, match="80 de 100 bytes"):
+        orcamento.reserva(50)
+
+
+def test_orcamento_continua_esperando_enquanto_ha_liberacoes():
+    orcamento = OrcamentoMemoria(100, espera_maxima=0.2)
+    for _ in range(5):
+        orcamento.reserva(20)
+
+    def libera():
+        for _ in range(5):
+            sleep(0.1)
+            orcamento.libera(20)
+
+    t = Thread(target=libera)
+    t.start()
+    orcamento.reserva(100)
+    t.join()
+    assert orcamento.em_uso == 100
@@ -0,0 +1,91 @@
+import io
+import json
+import zipfile
+from threading import Thread
+
+import pytest
+
+from app.zipfileparallel import WRITER_QUEUE_SIZE, Tracer, ZipFileParallel
+
+
+class _FailingSpool(io.BytesIO):
+    def rollover(self):
+        raise OSError("No space left on device")
+
+
+def test_writer_error_outside_write_does_not_block_producers(tmp_path):
+    names = [f"f{i:03d}" for i in range(4 * WRITER_QUEUE_SIZE)]
+    released = []
+    handed = []
+    callbacks = []
+
+    def produce():
+        with pytest.raises(OSError, match="No space left"):
+            archive = ZipFileParallel(tmp_path / "a.zip", "w")
+            # Every entry arrives early, so the writer rolls it over
+            archive.start_writer(order=names[::-1], reorder_window=0)
+            try:
+                for name in names:
+                    data = b"data"
+                    handed.append(name)
+                    archive.write_compressed(
+                        zipfile.ZipInfo(name),
+                        zipfile.crc32(data),
+                        _FailingSpool(data),
+                        len(data),
+                        lambda name=name: released.append(name),
+                    )
+            except OSError:
+                pass
+            archive.after_written(handed, callbacks.append)
+            archive.close()
+
+    t = Thread(target=produce, daemon=True)
+    t.start()
+    t.join(30)
+    assert not t.is_alive(), "producer blocked on the writer queue"
+    assert sorted(released) == sorted(handed)
+    assert len(callbacks) == 1 and isinstance(callbacks[0], OSError)
+
+
+def test_tracer_records_spans_with_one_track_per_thread(tmp_path):
+    tracer = Tracer()
+    with tracer.span("main", file="a"):
+        pass
+    worker = Thread(target=lambda: tracer.add("write", 1000, 3000), name="w")
+    worker.start()
+    worker.join()
+    events = tracer.events()
+    spans = [e for e in events if e["ph"] == "X"]
+    assert [(e["name"], e["args"]) for e in spans] == [
+        ("main", {"file": "a"}),
+        ("write", {}),
+    ]
+    assert spans[1]["ts"] == 1 and spans[1]["dur"] == 2
+    assert spans[0]["tid"] != spans[1]["tid"]
+    metadata = [e for e in events if e["ph"] == "M"]
+    assert [e["name"] for e in metadata] == [
+        "process_name",
+        "thread_name",
+        "thread_name",
+    ]
+    assert metadata[2]["args"] == {"name": "w"}
+
+    path = tmp_path / "trace.json"
+    tracer.dump(path)
+    with open(path) as f:
+        assert json.load(f)["traceEvents"] == events
+
+
+def test_tracer_extend_merges_tracks_of_other_processes():
+    worker = Tracer()
+    worker.add("compress", 0, 10)
+    worker.add("compress", 10, 20)
+    tracer = Tracer()
+    tracer.add("write", 20, 30)
+    tracer.extend(worker.events())
+    # The same track from a second batch is not named twice
+    tracer.extend(worker.events())
+    events = tracer.events()
+    assert sum(e["ph"] == "X" for e in events) == 5
+    assert sum(e["name"] == "thread_name" for e in events) == 1